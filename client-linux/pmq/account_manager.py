@@ -3,35 +3,50 @@
 """账号管理模块"""
 import json
 import os
+import threading
+import time
+from datetime import datetime
 from typing import List, Dict, Optional
 try:
     from .config import ACCOUNTS_FILE
+    from .account_stats import merge_stats
 except ImportError:
     from config import ACCOUNTS_FILE
+    from account_stats import merge_stats
 
 class AccountManager:
     """账号管理器"""
     
     def __init__(self):
         self.accounts_file = ACCOUNTS_FILE
+        # Flask 请求线程与调度器（统计写入）都会修改账号并保存，所有修改与保存在锁内进行
+        self._lock = threading.RLock()
         self._load_accounts()
     
     def _load_accounts(self):
         """加载账号数据"""
-        if os.path.exists(self.accounts_file):
-            try:
-                with open(self.accounts_file, 'r', encoding='utf-8') as f:
-                    self.accounts = json.load(f)
-            except:
-                self.accounts = []
-        else:
-            self.accounts = []
-        self._save_accounts()
+        self.accounts = []
+        if not os.path.exists(self.accounts_file):
+            self._save_accounts()
+            return
+        try:
+            with open(self.accounts_file, 'r', encoding='utf-8') as f:
+                self.accounts = json.load(f)
+        except Exception as e:
+            # 文件损坏时另存原文件（其中包含私钥），不用空列表覆盖
+            backup = f"{self.accounts_file}.corrupt-{int(time.time())}"
+            os.replace(self.accounts_file, backup)
+            print(f"账号文件无法解析，已另存为 {backup}: {e}")
     
-    def _save_accounts(self):
-        """保存账号数据"""
-        with open(self.accounts_file, 'w', encoding='utf-8') as f:
-            json.dump(self.accounts, f, ensure_ascii=False, indent=2)
+    def _save_accounts(self, accounts: Optional[List[Dict]] = None):
+        """保存账号数据（先写临时文件再原子替换，写入途中退出也不会损坏原文件）"""
+        tmp_path = f"{self.accounts_file}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.accounts if accounts is None else accounts, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.accounts_file)
     
     def add_account(self, account_data: Dict) -> Dict:
         """添加账号
@@ -45,54 +60,60 @@ class AccountManager:
                 - builder_api_secret: Builder API Secret
                 - builder_api_passphrase: Builder API Passphrase
                 - proxy_ip: 代理IP（格式：http://ip:port 或 http://user:pass@ip:port）
+                - group: 账号分组（可选，用于分配策略配置档）
                 - notes: 备注信息（可选）
         
         Returns:
             添加结果
         """
-        # 生成账号ID
-        if self.accounts:
-            account_id = max([acc.get('id', 0) for acc in self.accounts]) + 1
-        else:
-            account_id = 1
-        
-        account = {
-            'id': account_id,
-            'name': account_data.get('name', f'账号{account_id}'),
-            'private_key': account_data.get('private_key', ''),
-            'proxy_wallet_address': account_data.get('proxy_wallet_address', ''),
-            'builder_api_key': account_data.get('builder_api_key', ''),
-            'builder_api_secret': account_data.get('builder_api_secret', ''),
-            'builder_api_passphrase': account_data.get('builder_api_passphrase', ''),
-            'proxy_ip': account_data.get('proxy_ip', ''),
-            'notes': account_data.get('notes', ''),
-            'status': 'active',  # active, paused, error
-            'created_at': account_data.get('created_at', ''),
-            'balance_usdc': 0.0,
-            'total_orders': 0,
-            'total_profit': 0.0
-        }
-        
-        self.accounts.append(account)
-        self._save_accounts()
-        return {'success': True, 'account_id': account_id, 'message': '账号添加成功'}
+        with self._lock:
+            # 生成账号ID
+            if self.accounts:
+                account_id = max([acc.get('id', 0) for acc in self.accounts]) + 1
+            else:
+                account_id = 1
+            
+            account = {
+                'id': account_id,
+                'name': account_data.get('name', f'账号{account_id}'),
+                'private_key': account_data.get('private_key', ''),
+                'proxy_wallet_address': account_data.get('proxy_wallet_address', ''),
+                'builder_api_key': account_data.get('builder_api_key', ''),
+                'builder_api_secret': account_data.get('builder_api_secret', ''),
+                'builder_api_passphrase': account_data.get('builder_api_passphrase', ''),
+                'proxy_ip': account_data.get('proxy_ip', ''),
+                'group': account_data.get('group', ''),
+                'notes': account_data.get('notes', ''),
+                'status': 'active',  # active, paused, error
+                'created_at': account_data.get('created_at', ''),
+                'balance_usdc': 0.0,
+                'total_orders': 0,
+                'total_profit': 0.0,
+                'stats': {}
+            }
+            
+            self.accounts.append(account)
+            self._save_accounts()
+            return {'success': True, 'account_id': account_id, 'message': '账号添加成功'}
     
     def update_account(self, account_id: int, account_data: Dict) -> Dict:
         """更新账号信息"""
-        for i, acc in enumerate(self.accounts):
-            if acc.get('id') == account_id:
-                # 更新字段（保留原有字段）
-                for key, value in account_data.items():
-                    if key != 'id':  # 不允许修改ID
-                        self.accounts[i][key] = value
-                self._save_accounts()
-                return {'success': True, 'message': '账号更新成功'}
+        with self._lock:
+            for i, acc in enumerate(self.accounts):
+                if acc.get('id') == account_id:
+                    # 更新字段（保留原有字段）
+                    for key, value in account_data.items():
+                        if key != 'id':  # 不允许修改ID
+                            self.accounts[i][key] = value
+                    self._save_accounts()
+                    return {'success': True, 'message': '账号更新成功'}
         return {'success': False, 'message': '账号不存在'}
     
     def delete_account(self, account_id: int) -> Dict:
         """删除账号"""
-        self.accounts = [acc for acc in self.accounts if acc.get('id') != account_id]
-        self._save_accounts()
+        with self._lock:
+            self.accounts = [acc for acc in self.accounts if acc.get('id') != account_id]
+            self._save_accounts()
         return {'success': True, 'message': '账号删除成功'}
     
     def get_account(self, account_id: int) -> Optional[Dict]:
@@ -112,19 +133,50 @@ class AccountManager:
     
     def update_account_status(self, account_id: int, status: str) -> Dict:
         """更新账号状态"""
-        for i, acc in enumerate(self.accounts):
-            if acc.get('id') == account_id:
-                self.accounts[i]['status'] = status
-                self._save_accounts()
-                return {'success': True, 'message': '状态更新成功'}
+        with self._lock:
+            for i, acc in enumerate(self.accounts):
+                if acc.get('id') == account_id:
+                    self.accounts[i]['status'] = status
+                    self._save_accounts()
+                    return {'success': True, 'message': '状态更新成功'}
         return {'success': False, 'message': '账号不存在'}
     
+    def apply_stats(self, deltas: Dict[int, Dict]) -> int:
+        """合并各账号的统计增量（AccountStats.drain() 的结果），一次保存；返回更新的账号数
+        
+        total_orders / total_profit 与 stats 中的下单数 / 已实现盈亏同步累加。
+        更新后的账号以新字典替换（正在序列化旧字典的请求线程不受影响），
+        保存成功后才生效；保存失败时抛出异常，内存中的账号数据保持不变。
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            accounts = list(self.accounts)
+            updated = 0
+            for i, acc in enumerate(accounts):
+                delta = deltas.get(acc.get('id'))
+                if not delta:
+                    continue
+                stats = merge_stats(acc.get('stats') or {}, delta)
+                stats['updated_at'] = now
+                accounts[i] = dict(
+                    acc,
+                    stats=stats,
+                    total_orders=acc.get('total_orders', 0) + delta.get('orders', 0),
+                    total_profit=round(acc.get('total_profit', 0.0) + delta.get('realized_pnl', 0.0), 6)
+                )
+                updated += 1
+            if updated:
+                self._save_accounts(accounts)
+                self.accounts = accounts
+        return updated
+    
     def update_account_balance(self, account_id: int, balance: float) -> Dict:
         """更新账号余额"""
-        for i, acc in enumerate(self.accounts):
-            if acc.get('id') == account_id:
-                self.accounts[i]['balance_usdc'] = balance
-                self._save_accounts()
-                return {'success': True}
+        with self._lock:
+            for i, acc in enumerate(self.accounts):
+                if acc.get('id') == account_id:
+                    self.accounts[i]['balance_usdc'] = balance
+                    self._save_accounts()
+                    return {'success': True}
         return {'success': False}
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""单账号运行统计（增量累计）
+
+按本账号自己的下单结果与索取结果累计：下单数、成交数、成交额、已实现盈亏，
+以及按市场系列（slug 前缀，见 MARKET_DATA_FAMILIES）统计的盈亏次数与胜率。
+不回查交易所历史：每个结果到达时只更新计数器，调度器定期取出增量（drain），
+由 AccountManager.apply_stats 合并进账号数据并随账号一起保存。
+
+成本按 token 的平均成本计算（进程内维护）；重启后没有本地成本的持仓在索取时
+使用 /positions 返回的 avgPrice。
+"""
+import threading
+from typing import Dict, Iterable, Optional
+
+try:
+    from .position_book import filled_from_result
+    from .config import MARKET_DATA_FAMILIES
+except ImportError:
+    from position_book import filled_from_result
+    from config import MARKET_DATA_FAMILIES
+
+# 无法识别市场系列时归入的系列名
+OTHER_FAMILY = 'other'
+
+
+def market_family(slug: Optional[str]) -> str:
+    """按 slug 前缀识别市场系列"""
+    if slug:
+        for family in MARKET_DATA_FAMILIES:
+            if slug.startswith(family):
+                return family
+    return OTHER_FAMILY
+
+
+def _amount(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def merge_stats(base: Dict, delta: Dict) -> Dict:
+    """把 drain() 取出的增量合并到已保存的统计中（返回新字典）"""
+    merged = {
+        'orders': base.get('orders', 0) + delta.get('orders', 0),
+        'fills': base.get('fills', 0) + delta.get('fills', 0),
+        'volume': round(base.get('volume', 0.0) + delta.get('volume', 0.0), 6),
+        'realized_pnl': round(base.get('realized_pnl', 0.0) + delta.get('realized_pnl', 0.0), 6),
+        'families': {}
+    }
+    families = set(base.get('families', {})) | set(delta.get('families', {}))
+    for family in families:
+        old = base.get('families', {}).get(family, {})
+        new = delta.get('families', {}).get(family, {})
+        wins = old.get('wins', 0) + new.get('wins', 0)
+        losses = old.get('losses', 0) + new.get('losses', 0)
+        merged['families'][family] = {
+            'wins': wins,
+            'losses': losses,
+            'pnl': round(old.get('pnl', 0.0) + new.get('pnl', 0.0), 6),
+            'win_rate': round(wins / (wins + losses), 4) if wins + losses else None
+        }
+    return merged
+
+
+class AccountStats:
+    """单账号统计累加器（线程安全，下单线程调用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # token -> [持仓份额, 持仓成本]
+        self._lots: Dict[str, list] = {}
+        # token -> 市场系列（从 /positions 的 slug 学习）
+        self._families: Dict[str, str] = {}
+        self._reset_delta()
+
+    def _reset_delta(self):
+        self._orders = 0
+        self._fills = 0
+        self._volume = 0.0
+        self._realized = 0.0
+        self._by_family: Dict[str, Dict] = {}
+
+    def _close(self, token_id: str, pnl: float, family: Optional[str] = None):
+        """记录一次平仓（卖出或索取）的盈亏"""
+        self._realized += pnl
+        entry = self._by_family.setdefault(
+            family or self._families.get(token_id, OTHER_FAMILY), {'wins': 0, 'losses': 0, 'pnl': 0.0}
+        )
+        entry['pnl'] += pnl
+        if pnl > 0:
+            entry['wins'] += 1
+        else:
+            entry['losses'] += 1
+
+    def note_markets(self, positions: Iterable[Dict]):
+        """从 get_positions() 的结果学习 token 所属的市场系列"""
+        for pos in positions:
+            raw = pos.get('raw_data') or {}
+            slug = raw.get('slug') or raw.get('eventSlug')
+            if slug and pos.get('token_id'):
+                self._families[str(pos['token_id'])] = market_family(slug)
+
+    def on_order(self, token_id, side: str, result, price: Optional[float], size: Optional[float]):
+        """一次下单提交的结果（side: 'BUY' / 'SELL'）"""
+        key = str(token_id) if token_id is not None else None
+        with self._lock:
+            self._orders += 1
+            shares = filled_from_result(side, result)
+            if not shares or key is None:
+                return
+            # 买单 makingAmount 为支付的 USDC，卖单 takingAmount 为收到的 USDC
+            usdc = _amount(result.get('makingAmount') if side == 'BUY' else result.get('takingAmount'))
+            if usdc is None:
+                usdc = shares * (price or 0.0)
+            self._fills += 1
+            self._volume += usdc
+            lot = self._lots.setdefault(key, [0.0, 0.0])
+            if side == 'BUY':
+                lot[0] += shares
+                lot[1] += usdc
+                return
+            if lot[0] <= 0:
+                # 没有本地成本（例如重启前买入），只计成交额
+                return
+            closed = min(shares, lot[0])
+            cost = lot[1] * closed / lot[0]
+            lot[0] -= closed
+            lot[1] -= cost
+            if lot[0] <= 1e-9:
+                self._lots.pop(key, None)
+            self._close(key, usdc * closed / shares - cost)
+
+    def on_redeem(self, positions: Iterable[Dict]):
+        """索取成功：positions 为 /positions 返回的可索取持仓（原始字段）"""
+        with self._lock:
+            for pos in positions:
+                key = str(pos.get('asset') or pos.get('tokenId') or pos.get('token_id') or '')
+                shares = _amount(pos.get('size')) or 0.0
+                if not key or shares <= 0:
+                    continue
+                payout = shares * (_amount(pos.get('curPrice')) or 0.0)
+                lot = self._lots.pop(key, None)
+                if lot and lot[0] > 0:
+                    cost = lot[1] * min(shares, lot[0]) / lot[0]
+                else:
+                    cost = shares * (_amount(pos.get('avgPrice')) or 0.0)
+                family = market_family(pos.get('slug') or pos.get('eventSlug')) \
+                    if (pos.get('slug') or pos.get('eventSlug')) else None
+                self._close(key, payout - cost, family)
+
+    def drain(self) -> Optional[Dict]:
+        """取出自上次 drain 以来的增量并清零；没有变化时返回None"""
+        with self._lock:
+            if not self._orders and not self._by_family and not self._fills:
+                return None
+            delta = {
+                'orders': self._orders,
+                'fills': self._fills,
+                'volume': self._volume,
+                'realized_pnl': self._realized,
+                'families': self._by_family
+            }
+            self._reset_delta()
+            return delta
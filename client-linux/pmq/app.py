@@ -4,21 +4,41 @@
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
+import threading
 try:
     from .account_manager import AccountManager
     from .task_scheduler import TaskScheduler
+    from .order_ledger import order_ledger
     from .config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG
 except ImportError:
     from account_manager import AccountManager
     from task_scheduler import TaskScheduler
+    from order_ledger import order_ledger
     from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app)
 
-# 初始化管理器
-account_manager = AccountManager()
-task_scheduler = TaskScheduler(account_manager)
+# 管理器由 init() 创建：导入本模块不能有副作用。
+# 签名/分片进程池使用 spawn，子进程会以 __mp_main__ 重新导入启动脚本（run.py -> app），
+# 若在导入时创建调度器，每个子进程都会再跑一遍状态恢复、监控循环和写盘线程
+account_manager = None
+task_scheduler = None
+
+
+def init():
+    """创建账号管理器和调度器，并在后台按上次的调度状态快照热恢复
+
+    只能在 if __name__ == '__main__' 下（或 WSGI 入口中）调用一次
+    """
+    global account_manager, task_scheduler
+    if task_scheduler is not None:
+        return app
+    account_manager = AccountManager()
+    task_scheduler = TaskScheduler(account_manager)
+    # 热恢复在后台执行，不阻塞接口启动
+    threading.Thread(target=task_scheduler.restore_state, daemon=True, name="state-restore").start()
+    return app
 
 @app.route('/')
 def index():
@@ -48,6 +68,9 @@ def update_account(account_id):
     """更新账号"""
     data = request.json
     result = account_manager.update_account(account_id, data)
+    if result.get('success') and 'group' in data:
+        # 账号分组决定按分组分配的策略配置档
+        task_scheduler.set_account_group(account_id, data.get('group'))
     return jsonify(result)
 
 @app.route('/api/accounts/<int:account_id>', methods=['DELETE'])
@@ -62,6 +85,9 @@ def update_account_status(account_id):
     data = request.json
     status = data.get('status', 'active')
     result = account_manager.update_account_status(account_id, status)
+    if result.get('success'):
+        # 非激活状态的账号暂停自动下单（已运行的bot不会被停止）
+        task_scheduler.set_account_paused(account_id, status != 'active')
     return jsonify(result)
 
 @app.route('/api/accounts/<int:account_id>/balance', methods=['GET'])
@@ -112,12 +138,33 @@ def get_task_status(account_id):
     status = task_scheduler.get_account_status(account_id)
     return jsonify({'success': True, 'data': status})
 
+@app.route('/api/tasks/eligibility/<market_id>', methods=['GET'])
+def get_eligibility(market_id):
+    """调试：某个市场当前的可下单账号"""
+    data = task_scheduler.get_eligibility_debug(market_id)
+    return jsonify({'success': True, 'data': data})
+
 @app.route('/api/tasks/scheduler_status', methods=['GET'])
 def get_scheduler_status():
     """获取调度线程总体状态"""
     status = task_scheduler.get_scheduler_status()
     return jsonify({'success': True, 'data': status})
 
+@app.route('/api/orders', methods=['GET'])
+def get_orders():
+    """查询下单流水（可按 account_id / market_id / since / until 过滤，按时间倒序）"""
+    try:
+        records = order_ledger.query(
+            account_id=request.args.get('account_id', type=int),
+            market_id=request.args.get('market_id'),
+            since=request.args.get('since', type=float),
+            until=request.args.get('until', type=float),
+            limit=request.args.get('limit', 100, type=int)
+        )
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'查询下单流水失败: {str(e)}'})
+    return jsonify({'success': True, 'data': records})
+
 @app.route('/api/strategy/config', methods=['GET'])
 def get_strategy_config():
     """获取策略配置"""
@@ -130,6 +177,33 @@ def update_strategy_config():
     task_scheduler.set_strategy_config(data)
     return jsonify({'success': True, 'message': '配置更新成功'})
 
+@app.route('/api/strategy/profiles', methods=['GET'])
+def get_strategy_profiles():
+    """获取策略配置档及账号/分组分配"""
+    return jsonify({'success': True, 'data': task_scheduler.get_strategy_profiles()})
+
+@app.route('/api/strategy/profiles/<name>', methods=['PUT'])
+def save_strategy_profile(name):
+    """新建或更新策略配置档"""
+    data = request.json or {}
+    result = task_scheduler.save_strategy_profile(name, data)
+    return jsonify(result)
+
+@app.route('/api/strategy/profiles/<name>', methods=['DELETE'])
+def delete_strategy_profile(name):
+    """删除策略配置档（已分配的账号/分组回到默认配置）"""
+    result = task_scheduler.delete_strategy_profile(name)
+    return jsonify(result)
+
+@app.route('/api/strategy/profiles/<name>/assign', methods=['POST'])
+def assign_strategy_profile(name):
+    """将账号/分组分配到策略配置档（name 为 default 时取消分配）"""
+    data = request.json or {}
+    result = task_scheduler.assign_strategy_profile(
+        name, data.get('account_ids', []), data.get('groups', [])
+    )
+    return jsonify(result)
+
 @app.route('/api/tasks/redeem_all', methods=['POST'])
 def redeem_all_accounts():
     """一键索取所有运行账号的持仓"""
@@ -160,6 +234,7 @@ def manual_place_order():
     return jsonify(result)
 
 if __name__ == '__main__':
+    init()
     print(f"启动服务器: http://{FLASK_HOST}:{FLASK_PORT}")
     app.run(host=FLASK_HOST, port=FLASK_PORT, debug=FLASK_DEBUG)
 
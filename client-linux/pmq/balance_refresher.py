@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""后台余额/授权预检查
+
+下单路径为了速度跳过余额检查，余额不足或未授权的账号仍会签名并提交必然失败的订单，
+白白占用下单并发与CLOB配额。本线程在后台周期性地为运行账号执行
+check_balance_and_allowance，结果按 TTL 缓存；不满足 order_amount_usd 的账号
+由调度器标记为资金不足，下发时直接跳过。检查窗口内暂停，避免与下单争抢带宽。
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BalanceStatus:
+    """账号最近一次余额检查结果"""
+
+    __slots__ = ('balance', 'allowance', 'checked_at', 'error')
+
+    def __init__(self, balance: float = 0.0, allowance: float = 0.0,
+                 checked_at: float = 0.0, error: Optional[str] = None):
+        self.balance = balance
+        self.allowance = allowance
+        self.checked_at = checked_at
+        self.error = error
+
+    def reason(self, required: float) -> Optional[str]:
+        """不满足下单金额时返回原因（检查失败时不判定，返回None）"""
+        if self.error:
+            return None
+        if self.balance < required:
+            return f"余额不足 ({self.balance:.2f} < {required:.2f} USDC)"
+        if self.allowance < required:
+            return f"USDC授权不足 ({self.allowance:.2f} < {required:.2f})"
+        return None
+
+    def to_dict(self) -> Dict:
+        return {
+            'balance': round(self.balance, 4),
+            'allowance': round(self.allowance, 4),
+            'checked_at': self.checked_at,
+            'error': self.error
+        }
+
+
+class BalanceRefresher:
+    """按 TTL 刷新账号余额与授权，并通知调度器更新资金不足标记"""
+
+    def __init__(self, check_fn: Callable[[List[int], float], Dict[int, Optional[Tuple[float, float]]]],
+                 accounts_fn: Callable[[], List[int]], required_fn: Callable[[int], float],
+                 on_update: Callable[[int, Optional[str]], None], paused_fn: Callable[[], bool],
+                 log_fn: Callable[[str], None], ttl: float = 300, interval: float = 15):
+        """
+        Args:
+            check_fn: 批量检查 (账号ID列表, 所需金额) -> {账号ID: (余额, 授权额度) 或 None(检查失败)}
+            accounts_fn: 返回当前运行账号
+            required_fn: 返回账号当前的单笔下单金额（USDC，按账号所属策略配置档）
+            on_update: 账号检查结果变化回调 (账号ID, 不满足原因或None)
+            paused_fn: 返回是否应暂停（有市场处于检查窗口）
+            log_fn: 日志输出
+            ttl: 结果有效期（秒），过期后重新检查
+            interval: 检查是否有过期账号的周期（秒）
+        """
+        self._check_fn = check_fn
+        self._accounts_fn = accounts_fn
+        self._required_fn = required_fn
+        self._on_update = on_update
+        self._paused_fn = paused_fn
+        self._log = log_fn
+        self.ttl = ttl
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._status: Dict[int, BalanceStatus] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="balance-refresher")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def is_alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def wake(self):
+        self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self._paused_fn():
+                try:
+                    self.refresh_due()
+                except Exception as e:
+                    self._log(f"余额预检查出错: {e}")
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+
+    def refresh_due(self, force: bool = False):
+        """检查所有过期（或从未检查过）的运行账号"""
+        now = time.time()
+        with self._lock:
+            due = [
+                acc_id for acc_id in self._accounts_fn()
+                if force or acc_id not in self._status or now - self._status[acc_id].checked_at >= self.ttl
+            ]
+        if not due:
+            return
+        required_by_account = {acc_id: self._required_fn(acc_id) for acc_id in due}
+        results = self._check_fn(due, max(required_by_account.values()))
+        checked_at = time.time()
+        for acc_id in due:
+            required = required_by_account[acc_id]
+            result = results.get(acc_id)
+            if result is None:
+                status = BalanceStatus(checked_at=checked_at, error='检查失败')
+            else:
+                status = BalanceStatus(result[0], result[1], checked_at)
+            with self._lock:
+                self._status[acc_id] = status
+            self._on_update(acc_id, status.reason(required))
+
+    # ========== 本地更新 ==========
+
+    def note_spent(self, account_id: int, amount: float):
+        """下单成功后从缓存余额中扣除，无需等待下一次检查"""
+        with self._lock:
+            status = self._status.get(account_id)
+            if status is None or status.error:
+                return
+            status.balance -= amount
+            status.allowance -= amount
+        self._on_update(account_id, status.reason(self._required_fn(account_id)))
+
+    def reevaluate(self):
+        """下单金额变化后，用缓存结果重新判定（不重新查询）"""
+        with self._lock:
+            items = list(self._status.items())
+        for acc_id, status in items:
+            self._on_update(acc_id, status.reason(self._required_fn(acc_id)))
+
+    def forget(self, account_id: int):
+        with self._lock:
+            self._status.pop(account_id, None)
+
+    # ========== 查询 ==========
+
+    def status_of(self, account_id: int) -> Optional[Dict]:
+        status = self._status.get(account_id)
+        return status.to_dict() if status else None
+
+    def reason_of(self, account_id: int) -> Optional[str]:
+        status = self._status.get(account_id)
+        return status.reason(self._required_fn(account_id)) if status else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            items = list(self._status.items())
+        return {
+            'alive': self.is_alive(),
+            'checked': len(items),
+            'underfunded': sum(1 for acc_id, s in items if s.reason(self._required_fn(acc_id))),
+            'errors': sum(1 for _, s in items if s.error),
+            'ttl': self.ttl
+        }
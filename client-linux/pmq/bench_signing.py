@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""签名吞吐基准：线程池签名 vs 多进程签名引擎
+
+用法:
+    python bench_signing.py [订单数] [进程数]
+
+使用随机生成的一次性私钥离线签名，不访问网络、不提交订单。
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eth_account import Account
+from py_clob_client.clob_types import OrderArgs, CreateOrderOptions
+from py_clob_client.order_builder.builder import OrderBuilder
+from py_clob_client.order_builder.constants import BUY
+from py_clob_client.signer import Signer
+
+from config import CHAIN_ID
+from signing_engine import SigningEngine
+
+# 任意合法的 token ID（离线签名不校验市场是否存在）
+BENCH_TOKEN_ID = "71321045679252212594626385532706912750332728571942532289631379312455583992563"
+
+
+def bench_threaded(private_key: str, count: int, threads: int) -> float:
+    """当前实现：下单线程内签名（受GIL限制）"""
+    builder = OrderBuilder(Signer(private_key, CHAIN_ID), sig_type=0)
+    options = CreateOrderOptions(tick_size="0.01", neg_risk=False)
+
+    def sign_one(i):
+        args = OrderArgs(token_id=BENCH_TOKEN_ID, price=0.99, size=2.0 + i % 7, side=BUY)
+        return builder.create_order(args, options)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(sign_one, range(count)))
+    return time.time() - start
+
+
+def bench_engine(private_key: str, count: int, processes: int, threads: int) -> float:
+    """多进程签名引擎"""
+    engine = SigningEngine(processes, CHAIN_ID)
+    signer_address = Account.from_key(private_key).address
+
+    def sign_one(i):
+        return engine.sign(private_key, 0, signer_address, BENCH_TOKEN_ID,
+                           0.99, 2.0 + i % 7, BUY, tick_size="0.01", neg_risk=False)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # 预热：拉起全部工作进程并建立缓存
+        list(executor.map(sign_one, range(processes * 2)))
+        start = time.time()
+        list(executor.map(sign_one, range(count)))
+        elapsed = time.time() - start
+    engine.shutdown(wait=True)
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    threads = 10
+    private_key = Account.create().key.hex()
+
+    print("=" * 50)
+    print(f"签名基准: {count} 笔订单, 下单线程 {threads}, 签名进程 {processes}")
+    print("=" * 50)
+
+    threaded = bench_threaded(private_key, count, threads)
+    print(f"线程池签名:   {threaded:.2f}s, {count / threaded:.1f} 笔/秒 (单核)")
+
+    engine = bench_engine(private_key, count, processes, threads)
+    print(f"进程池签名:   {engine:.2f}s, {count / engine:.1f} 笔/秒, "
+          f"{count / engine / processes:.1f} 笔/秒/核")
+    print(f"加速比:       {threaded / engine:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""写时复制的 bot 注册表
+
+Flask 请求线程启动/停止账号时，扫描与下单线程可能正在遍历 bot 字典，
+直接修改共享 dict 会触发 "dictionary changed size during iteration"。
+
+本注册表中的快照是只读映射，写入方在锁内复制出新字典并整体替换引用；
+读取方无需加锁，取一次快照即可在整轮扫描/下发中看到一致的账号集合。
+"""
+import threading
+from types import MappingProxyType
+from typing import Iterator, Mapping, Optional
+
+try:
+    from .trading_bot import TradingBot
+except ImportError:
+    from trading_bot import TradingBot
+
+
+class BotRegistry:
+    """account_id -> TradingBot（读无锁，写时复制）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Mapping[int, TradingBot] = MappingProxyType({})
+
+    def snapshot(self) -> Mapping[int, TradingBot]:
+        """当前快照（只读，之后的增删不会影响已取得的快照）"""
+        return self._snapshot
+
+    def add(self, account_id: int, bot: TradingBot) -> bool:
+        """注册bot，账号已存在时返回False"""
+        with self._lock:
+            if account_id in self._snapshot:
+                return False
+            bots = dict(self._snapshot)
+            bots[account_id] = bot
+            self._snapshot = MappingProxyType(bots)
+            return True
+
+    def remove(self, account_id: int) -> Optional[TradingBot]:
+        """注销bot，返回被移除的bot（不存在时返回None）"""
+        with self._lock:
+            if account_id not in self._snapshot:
+                return None
+            bots = dict(self._snapshot)
+            bot = bots.pop(account_id)
+            self._snapshot = MappingProxyType(bots)
+            return bot
+
+    # 以下只读接口都作用于调用瞬间的快照
+
+    def get(self, account_id: int) -> Optional[TradingBot]:
+        return self._snapshot.get(account_id)
+
+    def keys(self):
+        return self._snapshot.keys()
+
+    def values(self):
+        return self._snapshot.values()
+
+    def items(self):
+        return self._snapshot.items()
+
+    def __contains__(self, account_id) -> bool:
+        return account_id in self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._snapshot)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""交易所时间同步
+
+时间窗口与剩余时间都是拿 Gamma 的 endDate 与本机时间比较，本机时钟偏差会让
+实际窗口整体偏移数秒，time.time() 还可能因校时而跳变。
+
+ExchangeClock 定期请求 CLOB /time（失败时使用响应的 Date 头）估计本机与交易所的
+时钟偏移与往返时延，平滑后对外提供单调递增、已校正的“交易所当前时间”。
+本地时间基于 time.monotonic() 推进，不受系统时间跳变影响。
+"""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import requests
+
+try:
+    from .config import CLOB_HOST
+except ImportError:
+    from config import CLOB_HOST
+
+
+class ExchangeClock:
+    """校正后的交易所时间"""
+
+    def __init__(self, url: str = f"{CLOB_HOST}/time", alpha: float = 0.2,
+                 interval: float = 60, timeout: float = 5):
+        """
+        Args:
+            url: 时间接口（返回Unix秒）
+            alpha: 偏移 EWMA 平滑系数
+            interval: 后台同步周期（秒）
+            timeout: 单次请求超时（秒）
+        """
+        self.url = url
+        self.alpha = alpha
+        self.interval = interval
+        self.timeout = timeout
+        # 本地时间 = 锚定的墙钟 + 单调时钟增量，之后不再读取 time.time()
+        self._anchor_wall = time.time()
+        self._anchor_mono = time.monotonic()
+        self._lock = threading.Lock()
+        self._offset = 0.0
+        self._rtt: Optional[float] = None
+        self._min_rtt: Optional[float] = None
+        self._samples = 0
+        self._rejected = 0
+        self._last_sync: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._last_now = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ========== 时间 ==========
+
+    def local_now(self) -> float:
+        """本机时间（单调推进，不受系统校时跳变影响）"""
+        return self._anchor_wall + (time.monotonic() - self._anchor_mono)
+
+    def now(self) -> float:
+        """校正后的交易所当前时间（Unix秒，单调不减）"""
+        value = self.local_now() + self._offset
+        # 偏移估计下调时不让时间倒退
+        if value < self._last_now:
+            return self._last_now
+        self._last_now = value
+        return value
+
+    @property
+    def offset(self) -> float:
+        """交易所时间 - 本机时间（秒）；为正表示本机时钟偏慢"""
+        return self._offset
+
+    def follow(self, offset: float):
+        """直接采用外部给出的偏移（分片进程跟随协调者的时钟，不单独请求交易所时间）"""
+        with self._lock:
+            self._offset = offset
+            self._last_sync = self.local_now()
+            self._last_error = None
+
+    # ========== 同步 ==========
+
+    def sync(self, request_fn: Optional[Callable] = None) -> bool:
+        """请求一次交易所时间并更新偏移估计，返回是否成功"""
+        get = request_fn or (lambda url: requests.get(url, timeout=self.timeout))
+        try:
+            t0 = self.local_now()
+            resp = get(self.url)
+            t1 = self.local_now()
+            server_ts = self._parse_server_time(resp)
+        except Exception as e:
+            self._last_error = str(e)
+            return False
+        if server_ts is None:
+            self._last_error = '无法解析交易所时间'
+            return False
+        self._add_sample(server_ts, t0, t1)
+        return True
+
+    @staticmethod
+    def _parse_server_time(resp) -> Optional[float]:
+        try:
+            value = float(resp.text.strip().strip('"'))
+            if value > 1e12:  # 毫秒
+                value /= 1000.0
+            if value > 1e9:
+                # 整秒精度：取该秒的中点作为期望值
+                return value + 0.5 if value == int(value) else value
+        except (ValueError, AttributeError):
+            pass
+        date_header = getattr(resp, 'headers', {}).get('Date')
+        if date_header:
+            return parsedate_to_datetime(date_header).timestamp() + 0.5
+        return None
+
+    def _add_sample(self, server_ts: float, t0: float, t1: float):
+        rtt = t1 - t0
+        offset = server_ts - (t0 + t1) / 2
+        with self._lock:
+            if self._min_rtt is None or rtt < self._min_rtt:
+                self._min_rtt = rtt
+            # 往返时延明显偏大的样本误差大，丢弃（首个样本总是采用）
+            if self._samples and rtt > max(1.0, 3 * self._min_rtt):
+                self._rejected += 1
+                return
+            if self._samples == 0:
+                self._offset = offset
+            else:
+                self._offset = self.alpha * offset + (1 - self.alpha) * self._offset
+            self._rtt = rtt if self._rtt is None else self.alpha * rtt + (1 - self.alpha) * self._rtt
+            self._samples += 1
+            self._last_sync = t1
+            self._last_error = None
+
+    # ========== 后台同步 ==========
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="exchange-clock")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.sync()
+            # 尚无有效样本时更快重试
+            self._stop_event.wait(self.interval if self._samples else 5)
+
+    def status(self) -> Dict:
+        return {
+            'offset': round(self._offset, 4),
+            'rtt': round(self._rtt, 4) if self._rtt is not None else None,
+            'samples': self._samples,
+            'rejected': self._rejected,
+            'last_sync_age': round(self.local_now() - self._last_sync, 1) if self._last_sync else None,
+            'last_error': self._last_error,
+            # 系统时间与单调时间的漂移（系统时间被校时跳变时不为0）
+            'wall_drift': round(time.time() - self.local_now(), 4)
+        }
+
+
+# 进程内共享的交易所时钟
+exchange_clock = ExchangeClock()
+
+
+def exchange_now() -> float:
+    """校正后的交易所当前时间"""
+    return exchange_clock.now()
@@ -12,8 +12,14 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 # 数据文件路径
 ACCOUNTS_FILE = os.path.join(DATA_DIR, 'accounts.json')
-TASKS_FILE = os.path.join(DATA_DIR, 'tasks.json')
-POSITIONS_FILE = os.path.join(DATA_DIR, 'positions.json')
+# 下单流水（SQLite WAL，只追加，后台批量写入）
+ORDER_LEDGER_DB = os.path.join(DATA_DIR, 'order_ledger.db')
+# 下单去重记录（SQLite，重启后恢复，避免重复下单）
+ORDER_DEDUPE_DB = os.path.join(DATA_DIR, 'ordered_markets.db')
+# 策略配置档（按账号/分组分配）
+STRATEGY_PROFILES_FILE = os.path.join(DATA_DIR, 'strategy_profiles.json')
+# 调度状态快照（运行账号/策略配置/API凭证等，启动时热恢复）
+SCHEDULER_STATE_FILE = os.path.join(DATA_DIR, 'scheduler_state.json')
 
 # Polymarket API配置
 CLOB_HOST = "https://clob.polymarket.com"
@@ -33,6 +39,84 @@ DEFAULT_PRICE_PERCENTAGE_THRESHOLD = 0.85
 DEFAULT_CHECK_TIME_WINDOW_MINUTES = 2
 DEFAULT_MONITOR_INTERVAL = 3
 
+# 常驻线程池配置（下单 / 行情读取 / 索取与出售 互相隔离）
+ORDER_POOL_MIN_WORKERS = 10
+ORDER_POOL_MAX_WORKERS = 100
+ORDER_POST_LATENCY_TARGET = 1.0  # 下单延迟目标（秒），超过两倍时收缩下单池并发
+READ_POOL_WORKERS = 8
+REDEEM_POOL_WORKERS = 10
+PRESIGN_POOL_WORKERS = 4
+SELL_POOL_WORKERS = 32  # 出售全部持仓时各账号的逐 token 卖单共用
+
+# 多进程签名引擎进程数（0 表示关闭，在下单线程内签名；建议设置为CPU核数）
+SIGNING_PROCESSES = 0
+
+# 账号分片进程数（0 表示所有账号在调度进程内运行；>0 时调度进程只扫描市场，账号分布到N个工作进程）
+SHARD_PROCESSES = 0
+
+# 预签名订单：价格变化导致下单数量偏离超过该比例时重新签名
+PRESIGN_SIZE_TOLERANCE = 0.02
+
+# 账号熔断：连续下单失败达到次数后，在冷却时间（秒）内不再为该账号下单
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN_SECONDS = 60
+
+# 同一代理同时在途的下单数上限（0 表示不限制；直连账号不受限制）
+PROXY_MAX_INFLIGHT_ORDERS = 5
+
+# 后台余额/授权预检查：结果有效期与检查周期（秒）
+BALANCE_CHECK_TTL = 300
+BALANCE_CHECK_INTERVAL = 15
+
+# 下单截止时间：触发后最多等待的秒数，且不晚于市场结束前 ORDER_CUTOFF_BEFORE_END 秒
+# 截止时仍未开始的订单直接丢弃，在途订单不再等待（晚到的结果单独统计）
+ORDER_DISPATCH_TIMEOUT = 30
+ORDER_CUTOFF_BEFORE_END = 1.0
+
+# 调度状态快照写入周期（秒）与启动恢复时并发启动账号的线程数
+SCHEDULER_STATE_INTERVAL = 30
+STATE_RESTORE_WORKERS = 20
+
+# 本机行情服务（market_data_service.py）：各进程通过 Unix socket 订阅，服务未运行时直接请求上游
+MARKET_DATA_SOCKET = "/tmp/pmq-market-data.sock"
+MARKET_DATA_FAMILIES = ['eth-updown-15m']
+MARKET_DATA_REFRESH_INTERVAL = 1.0   # 价格刷新与推送周期（秒）
+MARKET_DATA_DISCOVERY_INTERVAL = 10  # 市场发现周期（秒）
+MARKET_DATA_MAX_AGE = 3.0            # 推送数据超过该时长视为过期，回退到直接请求
+MARKET_DATA_TRACK_TTL = 600          # 按需跟踪的 token 无人读取多久后停止刷新（秒）
+# 行情服务写入的共享内存价格板（各进程直接读取最优买/卖价）
+MARKET_DATA_BOARD = "pmq_price_board"
+PRICE_BOARD_SLOTS = 512
+
+# 下单参数（tick size / neg_risk / 手续费率）缓存有效期（秒）
+MARKET_PARAMS_TTL = 300
+
+# 同一账号的订单合并提交：合并窗口（秒，触发买入不等待窗口）与单次批量下单的订单数上限（CLOB 批量接口上限 15）
+ORDER_BATCH_WINDOW = 0.01
+ORDER_BATCH_MAX = 15
+
+# 出售全部持仓时单个账号同时处理的 token 数上限
+SELL_CONCURRENCY_PER_ACCOUNT = 8
+
+# 跨账号出售计划：深度不足部分的兜底限价、拆分订单的最小数量（低于此数量不再拆分）、并发拉取订单簿的线程数
+LIQUIDATION_FLOOR_PRICE = 0.01
+LIQUIDATION_MIN_SIZE = 5
+LIQUIDATION_BOOK_WORKERS = 8
+
+# 按钱包缓存 /positions 结果的有效期（秒）；本账号下单或索取成功后立即失效
+POSITIONS_CACHE_TTL = 5
+
+# 本地持仓簿与 /positions 的对账周期（秒），以及本地刚成交的 token 在对账时保留本地数量的宽限期（秒）
+POSITION_RECONCILE_INTERVAL = 300
+POSITION_RECONCILE_GRACE = 60
+
+# 下单流水单个事务最多写入的条数，以及记录最长等待写入的时间（秒）
+ORDER_LEDGER_BATCH = 200
+ORDER_LEDGER_FLUSH_INTERVAL = 0.5
+
+# 各账号统计（下单数/成交额/已实现盈亏/胜率）写入账号数据的间隔（秒，检查窗口内不写）
+ACCOUNT_STATS_INTERVAL = 30
+
 # Flask配置
 FLASK_HOST = "0.0.0.0"
 FLASK_PORT = 5000
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""下单下发规划（按账号延迟排序 + 每个代理的并发上限）
+
+- 每个账号记录最近下单延迟（EWMA），慢的账号先提交，使各账号的成交回报尽量集中
+- 同一代理下的账号交错排列，并限制同一代理同时在途的订单数，避免被代理限流；
+  等待代理名额最多到下发截止时间，超时的订单丢弃，不会让一个慢代理拖住其他代理的订单
+- 记录每次下发从触发到最后一个回报的时间跨度，以及截止时间到达时被丢弃/放弃的订单
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class DispatchPlanner:
+    """下单顺序规划与代理并发控制"""
+
+    def __init__(self, per_proxy_limit: int, alpha: float = 0.3, history: int = 50):
+        """
+        Args:
+            per_proxy_limit: 同一代理同时在途的订单上限（<=0 表示不限制；直连账号不限制）
+            alpha: 账号延迟 EWMA 平滑系数
+            history: 保留最近多少次下发的时间跨度
+        """
+        self.per_proxy_limit = per_proxy_limit
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._latency: Dict[int, float] = {}
+        self._proxy_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._spreads = deque(maxlen=history)
+        # 截止时间统计：未开始即丢弃 / 在途被放弃 / 放弃后才完成（成功、失败）
+        self._dropped = 0
+        self._abandoned = 0
+        self._late_success = 0
+        self._late_fail = 0
+        self._proxy_timeouts = 0
+
+    # ========== 账号延迟 ==========
+
+    def record_latency(self, account_id: int, latency: Optional[float]):
+        if latency is None:
+            return
+        with self._lock:
+            previous = self._latency.get(account_id)
+            if previous is None:
+                self._latency[account_id] = latency
+            else:
+                self._latency[account_id] = self.alpha * latency + (1 - self.alpha) * previous
+
+    def latency_of(self, account_id: int) -> Optional[float]:
+        return self._latency.get(account_id)
+
+    # ========== 下发顺序 ==========
+
+    def plan(self, account_ids: List[int], proxy_of: Callable[[int], str]) -> List[int]:
+        """返回提交顺序：整体按延迟从慢到快，同一代理的账号交错分布
+
+        没有延迟记录的账号（尚未下过单，连接未预热）视为最慢，排在最前。
+        """
+        latency = self._latency
+        unknown = float('inf')
+
+        def slowness(acc_id):
+            return latency.get(acc_id, unknown)
+
+        # 每个代理内按慢到快编号，再按 (组内序号, 慢到快) 全局排序
+        groups: Dict[str, List[int]] = {}
+        for acc_id in account_ids:
+            groups.setdefault(proxy_of(acc_id), []).append(acc_id)
+        keyed = []
+        for members in groups.values():
+            members.sort(key=slowness, reverse=True)
+            for rank, acc_id in enumerate(members):
+                keyed.append((rank, -slowness(acc_id), acc_id))
+        keyed.sort(key=lambda item: (item[0], item[1]))
+        return [acc_id for _, _, acc_id in keyed]
+
+    # ========== 代理并发 ==========
+
+    def proxy_slot(self, proxy: str, timeout: Optional[float] = None):
+        """获取代理的在途订单名额（返回值用作 with 语句，退出时释放）
+
+        Args:
+            timeout: 最多等待的秒数（通常为距下发截止时间的秒数），None 表示一直等待
+        Returns:
+            已获得的名额；timeout 内未获得时返回None；直连或不限制时返回空上下文
+        """
+        if not proxy or self.per_proxy_limit <= 0:
+            return _NO_LIMIT
+        slot = self._proxy_slots.get(proxy)
+        if slot is None:
+            with self._lock:
+                slot = self._proxy_slots.setdefault(proxy, threading.BoundedSemaphore(self.per_proxy_limit))
+        if not slot.acquire(timeout=None if timeout is None else max(0.0, timeout)):
+            with self._lock:
+                self._proxy_timeouts += 1
+            return None
+        return _HeldSlot(slot)
+
+    # ========== 触发到最后回报的时间跨度 ==========
+
+    def record_spread(self, trigger_ts: float, order_count: int):
+        """在一次下发的全部回报收齐（或超时）后调用"""
+        if order_count <= 0:
+            return
+        with self._lock:
+            self._spreads.append((time.time() - trigger_ts, order_count))
+
+    def record_deadline(self, dropped: int, abandoned: int):
+        with self._lock:
+            self._dropped += dropped
+            self._abandoned += abandoned
+
+    def record_late(self, success: bool):
+        """截止时间后才完成的订单（调度已不再等待）"""
+        with self._lock:
+            if success:
+                self._late_success += 1
+            else:
+                self._late_fail += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            spreads = [spread for spread, _ in self._spreads]
+            known = len(self._latency)
+            proxies = len(self._proxy_slots)
+            deadline = {
+                'dropped': self._dropped,
+                'abandoned': self._abandoned,
+                'late_success': self._late_success,
+                'late_fail': self._late_fail,
+                'proxy_timeouts': self._proxy_timeouts
+            }
+        return {
+            'accounts_with_latency': known,
+            'capped_proxies': proxies,
+            'per_proxy_limit': self.per_proxy_limit,
+            'last_spread': round(spreads[-1], 4) if spreads else None,
+            'avg_spread': round(sum(spreads) / len(spreads), 4) if spreads else None,
+            'max_spread': round(max(spreads), 4) if spreads else None,
+            'deadline': deadline
+        }
+
+
+class _HeldSlot:
+    """已获得的代理名额，退出 with 语句时释放"""
+
+    __slots__ = ('_semaphore',)
+
+    def __init__(self, semaphore: threading.BoundedSemaphore):
+        self._semaphore = semaphore
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._semaphore.release()
+        return False
+
+
+class _NoLimit:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_LIMIT = _NoLimit()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""常驻线程池（舱壁隔离：下单 / 行情读取 / 索取与出售 各自独立）"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Optional
+
+
+class DeadlineExpired(Exception):
+    """任务开始执行前已超过截止时间，未执行即丢弃"""
+
+
+class BulkheadPool:
+    """常驻线程池
+
+    - 线程在首次使用时创建并常驻，触发下单时不再付出线程启动成本
+    - 每类任务一个独立的池，大批量索取不会占满下单线程
+    - 提供排队深度 / 活跃线程数指标
+    - 配置 latency_target 后，并发上限会在 [min_workers, max_workers] 内
+      根据观测到的下单延迟自动调整
+    """
+
+    # 延迟指数平滑系数
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, max_workers: int, min_workers: Optional[int] = None,
+                 latency_target: Optional[float] = None):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.min_workers = max(1, min(int(min_workers or self.max_workers), self.max_workers))
+        self.latency_target = latency_target
+        # 当前并发上限（未开启自动调整时等于 max_workers）
+        self._limit = self.min_workers if latency_target else self.max_workers
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"pool-{name}")
+        self._cond = threading.Condition()
+        self._queued = 0
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._dropped = 0
+        self._latency_ewma: Optional[float] = None
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """提交任务（立即返回Future）"""
+        return self._submit(None, None, fn, args, kwargs)
+
+    def submit_with_deadline(self, deadline: float, now_fn: Callable[[], float], fn, *args, **kwargs) -> Future:
+        """提交带截止时间的任务：轮到执行时已超过 deadline（按 now_fn 计时）则不执行，
+        Future 抛出 DeadlineExpired；尚在排队的任务也可通过 future.cancel() 丢弃"""
+        return self._submit(deadline, now_fn, fn, args, kwargs)
+
+    def _submit(self, deadline, now_fn, fn, args, kwargs) -> Future:
+        with self._cond:
+            self._queued += 1
+            self._submitted += 1
+        future = self._executor.submit(self._run, fn, args, kwargs, deadline, now_fn)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future):
+        # 在线程池队列中被取消的任务不会进入 _run，需要在此修正排队计数
+        if future.cancelled():
+            with self._cond:
+                self._queued -= 1
+                self._dropped += 1
+
+    def _run(self, fn, args, kwargs, deadline=None, now_fn=None):
+        with self._cond:
+            while self._active >= self._limit:
+                self._cond.wait()
+            self._queued -= 1
+            if deadline is not None and now_fn() >= deadline:
+                self._dropped += 1
+                # 未占用并发名额，唤醒下一个等待的任务
+                self._cond.notify()
+                raise DeadlineExpired()
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._completed += 1
+                self._cond.notify()
+
+    def record_latency(self, seconds: float):
+        """记录一次下单（post_order）延迟，并据此调整并发上限
+
+        延迟健康且仍有排队时逐步扩容；延迟超过目标两倍（上游开始拥塞）时收缩。
+        """
+        if seconds is None or seconds < 0:
+            return
+        with self._cond:
+            if self._latency_ewma is None:
+                self._latency_ewma = seconds
+            else:
+                self._latency_ewma += self.EWMA_ALPHA * (seconds - self._latency_ewma)
+            if not self.latency_target:
+                return
+            old_limit = self._limit
+            if self._latency_ewma > self.latency_target * 2 and self._limit > self.min_workers:
+                self._limit = max(self.min_workers, self._limit * 3 // 4)
+            elif self._latency_ewma <= self.latency_target and self._queued > 0 and self._limit < self.max_workers:
+                self._limit = min(self.max_workers, self._limit + max(1, self._limit // 4))
+            if self._limit > old_limit:
+                self._cond.notify_all()
+
+    def gauges(self) -> Dict:
+        """池指标"""
+        with self._cond:
+            return {
+                'name': self.name,
+                'queue_depth': self._queued,
+                'active_workers': self._active,
+                'worker_limit': self._limit,
+                'min_workers': self.min_workers,
+                'max_workers': self.max_workers,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'dropped': self._dropped,
+                'latency_ewma': round(self._latency_ewma, 4) if self._latency_ewma is not None else None
+            }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""跨账号出售计划
+
+出售全部持仓时，各账号的持仓通常集中在同几个 token 上。这里先按 token 汇总所有账号的持仓，
+每个 token 只拉取一次订单簿，再按买盘深度为每个账号计算限价与数量：
+
+- 从最优买价向下累计深度，直到覆盖所有账号的总持仓，该档价格即为清算价；
+  各账号以清算价卖出按比例分得的深度份额，不会低于深度所能支撑的价格成交。
+  清算价订单以 FAK 提交：订单簿在拉取后变薄时未成交的部分由交易所撤销并按兜底价补卖，
+  不会以限价单挂在订单簿上
+- 深度不足以覆盖的部分仍按兜底价（原固定市价单价格）卖出，保证全部出清
+- 拆分后某一部分低于最小下单量时并入另一部分，每个账号每个 token 最多两笔订单
+- 订单簿获取失败或没有买盘时，整笔按兜底价卖出（与原行为一致）
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .config import LIQUIDATION_FLOOR_PRICE, LIQUIDATION_MIN_SIZE, LIQUIDATION_BOOK_WORKERS
+except ImportError:
+    from config import LIQUIDATION_FLOOR_PRICE, LIQUIDATION_MIN_SIZE, LIQUIDATION_BOOK_WORKERS
+
+# 清算价订单的类型（py_clob_client OrderType.FAK：能成交的部分立即成交，其余撤销）
+LIQUIDATION_CLEARING_ORDER_TYPE = 'FAK'
+
+
+def plan_token(holdings: Dict[int, float], bids: Optional[List[Tuple[float, float]]],
+               floor_price: float = LIQUIDATION_FLOOR_PRICE,
+               min_size: float = LIQUIDATION_MIN_SIZE) -> Dict[int, List[Tuple[float, float]]]:
+    """计算单个 token 各账号的卖单
+
+    Args:
+        holdings: 账号ID -> 持仓数量
+        bids: 买盘档位 [(price, size)]，按价格从高到低；None 表示订单簿不可用
+    Returns:
+        账号ID -> [(限价, 数量)]
+    """
+    total = sum(holdings.values())
+    if total <= 0:
+        return {}
+    clearing_price = None
+    depth = 0.0
+    for price, size in bids or []:
+        if price < floor_price:
+            break
+        depth += size
+        clearing_price = price
+        if depth >= total:
+            break
+    if clearing_price is None:
+        return {acc_id: [(floor_price, balance)] for acc_id, balance in holdings.items()}
+
+    ratio = min(1.0, depth / total)
+    plan = {}
+    for acc_id, balance in holdings.items():
+        covered = balance * ratio
+        rest = balance - covered
+        if rest < min_size:
+            plan[acc_id] = [(clearing_price, balance)]
+        elif covered < min_size:
+            plan[acc_id] = [(floor_price, balance)]
+        else:
+            plan[acc_id] = [(clearing_price, covered), (floor_price, rest)]
+    return plan
+
+
+class LiquidationPlanner:
+    """汇总所有账号持仓并生成出售计划"""
+
+    def __init__(self, floor_price: float = LIQUIDATION_FLOOR_PRICE, min_size: float = LIQUIDATION_MIN_SIZE,
+                 book_workers: int = LIQUIDATION_BOOK_WORKERS):
+        self.floor_price = floor_price
+        self.min_size = min_size
+        self.book_workers = max(1, book_workers)
+        self.last_stats: Dict = {}
+
+    def plan(self, positions: Dict[int, List[Dict]],
+             fetch_bids: Callable[[str], Optional[List[Tuple[float, float]]]]) -> Dict[int, List[Dict]]:
+        """
+        Args:
+            positions: 账号ID -> get_positions() 返回的持仓列表
+            fetch_bids: 拉取 token 买盘档位（按价格从高到低），失败返回None
+        Returns:
+            账号ID -> [{'token_id', 'market_id', 'price', 'size', 'order_type'}]；没有可卖持仓的账号为空列表。
+            order_type 为 None 表示普通限价单（GTC）
+        """
+        holdings: Dict[str, Dict[int, float]] = {}
+        markets: Dict[str, str] = {}
+        for acc_id, account_positions in positions.items():
+            for pos in account_positions or []:
+                token_id = pos.get('token_id')
+                balance = pos.get('balance')
+                if not token_id or not balance or balance <= 0:
+                    continue
+                by_account = holdings.setdefault(str(token_id), {})
+                by_account[acc_id] = by_account.get(acc_id, 0.0) + balance
+                if pos.get('market_id'):
+                    markets[str(token_id)] = pos.get('market_id')
+
+        books: Dict[str, Optional[List[Tuple[float, float]]]] = {}
+        if holdings:
+            def safe_fetch(token_id):
+                try:
+                    return fetch_bids(token_id)
+                except Exception:
+                    return None
+            tokens = list(holdings)
+            with ThreadPoolExecutor(max_workers=min(self.book_workers, len(tokens)),
+                                    thread_name_prefix="liquidation-book") as executor:
+                books = dict(zip(tokens, executor.map(safe_fetch, tokens)))
+
+        result: Dict[int, List[Dict]] = {acc_id: [] for acc_id in positions}
+        for token_id, by_account in holdings.items():
+            token_plan = plan_token(by_account, books.get(token_id), self.floor_price, self.min_size)
+            for acc_id, orders in token_plan.items():
+                result[acc_id].extend(
+                    {'token_id': token_id, 'market_id': markets.get(token_id), 'price': price, 'size': size,
+                     'order_type': LIQUIDATION_CLEARING_ORDER_TYPE if price > self.floor_price else None}
+                    for price, size in orders
+                )
+
+        self.last_stats = {
+            'accounts': len(positions),
+            'tokens': len(holdings),
+            'books_missing': sum(1 for book in books.values() if not book),
+            'orders': sum(len(orders) for orders in result.values())
+        }
+        return result
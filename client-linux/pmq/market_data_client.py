@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""本机行情服务客户端
+
+同一台机器上的调度器与各客户端进程共用一个行情服务进程（market_data_service.py）。
+服务存在时，本客户端通过 Unix socket 订阅，服务每轮刷新后推送市场列表与最优买/卖价，
+TradingBot 的读取方法直接读取本地最新推送；服务不存在、连接断开或数据过期时返回None，
+调用方回退到直接请求 Gamma/CLOB。每台机器的上游行情请求量因此与进程数量无关。
+价格优先从服务写入的共享内存价格板（price_board.py）读取，推送中的报价作为后备。
+
+协议：每行一个JSON
+- 客户端 -> 服务: {"op": "subscribe"} / {"op": "track", "tokens": [...]}
+- 服务 -> 客户端: {"type": "update", "ts": ..., "markets": [...], "quotes": {token: {"bid", "ask", "ts"}}}
+"""
+import json
+import os
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from .price_board import price_board
+    from .config import MARKET_DATA_SOCKET, MARKET_DATA_MAX_AGE, MARKET_DATA_TRACK_TTL
+except ImportError:
+    from price_board import price_board
+    from config import MARKET_DATA_SOCKET, MARKET_DATA_MAX_AGE, MARKET_DATA_TRACK_TTL
+
+
+class MarketDataClient:
+    """行情服务订阅端（进程内共享一个连接）"""
+
+    def __init__(self, path: str = MARKET_DATA_SOCKET, max_age: float = MARKET_DATA_MAX_AGE,
+                 retry_interval: float = 5):
+        """
+        Args:
+            path: 行情服务 Unix socket 路径
+            max_age: 推送数据的最长有效期（秒），过期视为不可用
+            retry_interval: 连接失败/断开后的重连间隔（秒）
+        """
+        self.path = path
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self._enabled = hasattr(socket, 'AF_UNIX')
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._next_connect = 0.0
+        self._ready = threading.Event()
+        self._markets: Optional[List[Dict]] = None
+        self._markets_ts = 0.0
+        self._quotes: Dict[str, Dict] = {}
+        # 请求服务跟踪的 token -> 最近一次发送时间（服务端超过 TTL 未续期即停止刷新）
+        self._tracked: Dict[str, float] = {}
+        self._track_renew = MARKET_DATA_TRACK_TTL / 2
+        self._hits = 0
+        self._misses = 0
+
+    def disable(self):
+        """行情服务进程自身调用，避免读取自己的推送"""
+        self._enabled = False
+
+    # ========== 连接 ==========
+
+    def _ensure_connected(self) -> bool:
+        if self._sock is not None:
+            return True
+        if not self._enabled or time.time() < self._next_connect:
+            return False
+        with self._lock:
+            if self._sock is not None:
+                return True
+            if not os.path.exists(self.path):
+                self._next_connect = time.time() + self.retry_interval
+                return False
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(1)
+                sock.connect(self.path)
+                sock.settimeout(None)
+            except OSError:
+                sock.close()
+                self._next_connect = time.time() + self.retry_interval
+                return False
+            self._sock = sock
+            self._ready.clear()
+            tracked = list(self._tracked)
+        threading.Thread(target=self._read_loop, args=(sock,), daemon=True, name="market-data-client").start()
+        self._send({'op': 'subscribe'})
+        if tracked:
+            self._send({'op': 'track', 'tokens': tracked})
+        # 服务在订阅后立即推送当前数据，稍等首个推送，使首次读取即可命中
+        self._ready.wait(0.5)
+        return True
+
+    def _send(self, message: Dict):
+        sock = self._sock
+        if sock is None:
+            return
+        data = (json.dumps(message) + '\n').encode()
+        try:
+            with self._send_lock:
+                sock.sendall(data)
+        except OSError:
+            self._disconnect(sock)
+
+    def _disconnect(self, sock: socket.socket):
+        with self._lock:
+            if self._sock is not sock:
+                return
+            self._sock = None
+            self._markets = None
+            self._quotes = {}
+            self._next_connect = time.time() + self.retry_interval
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _read_loop(self, sock: socket.socket):
+        try:
+            with sock.makefile('r', encoding='utf-8') as stream:
+                for line in stream:
+                    try:
+                        message = json.loads(line)
+                    except ValueError:
+                        continue
+                    if message.get('type') == 'update':
+                        self._apply(message)
+        except (OSError, ValueError):
+            pass
+        self._disconnect(sock)
+
+    def _apply(self, message: Dict):
+        if 'markets' in message:
+            self._markets = message['markets']
+            self._markets_ts = message.get('ts', time.time())
+        quotes = message.get('quotes')
+        if quotes:
+            # 写时复制，读取方无需加锁
+            merged = dict(self._quotes)
+            merged.update(quotes)
+            self._quotes = merged
+        self._ready.set()
+
+    # ========== 读取 ==========
+
+    def markets(self) -> Optional[List[Dict]]:
+        """服务发现的市场列表；服务不可用或数据过期时返回None"""
+        if not self._ensure_connected():
+            return None
+        markets = self._markets
+        if markets is None or time.time() - self._markets_ts > self.max_age:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return list(markets)
+
+    def quote(self, token_id, field: str = 'bid') -> Optional[Dict]:
+        """token 的最优买/卖价 {'bid', 'ask', 'ts'}；不可用时返回None
+
+        服务尚未跟踪（或报价缺少 field）的 token 会通知服务跟踪，之后的推送中即包含该 token。
+        """
+        return self.quotes([token_id], field).get(str(token_id))
+
+    def quotes(self, token_ids: Iterable, field: str = 'ask') -> Dict[str, Dict]:
+        """批量读取，只返回未过期且 field（'bid'/'ask'）有值的 token"""
+        if not self._ensure_connected():
+            return {}
+        now = time.time()
+        current = self._quotes
+        result = {}
+        track = []
+        for token_id in token_ids:
+            key = str(token_id)
+            # 优先读取共享内存价格板（最新刷新结果，无需等待推送解析）
+            board_entry = price_board.read(key)
+            if board_entry is not None:
+                entry = {'bid': board_entry[0], 'ask': board_entry[1], 'ts': board_entry[2]}
+            else:
+                entry = current.get(key)
+            sent_at = self._tracked.get(key)
+            if entry is not None and entry.get(field) is not None and now - entry.get('ts', 0) <= self.max_age:
+                result[key] = entry
+                if sent_at is not None and now - sent_at > self._track_renew:
+                    track.append(key)
+            elif sent_at is None or now - sent_at > self._track_renew:
+                track.append(key)
+        if track:
+            for key in track:
+                self._tracked[key] = now
+            self._send({'op': 'track', 'tokens': track})
+        if result:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return result
+
+    def status(self) -> Dict:
+        return {
+            'connected': self._sock is not None,
+            'path': self.path,
+            'markets_age': round(time.time() - self._markets_ts, 2) if self._markets is not None else None,
+            'quotes': len(self._quotes),
+            'tracked': len(self._tracked),
+            'hits': self._hits,
+            'misses': self._misses
+        }
+
+
+# 进程内共享的行情服务客户端
+market_data_client = MarketDataClient()
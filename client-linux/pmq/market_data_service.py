@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""本机行情服务进程
+
+同一台机器上的 pmq 调度器与多个 client 进程原本各自轮询 Gamma/CLOB 获取同一批市场。
+本服务统一负责配置的市场系列的发现与价格刷新，通过 Unix socket 向订阅者推送，
+各进程的 TradingBot 经 market_data_client 透明读取。每台机器的上游读取请求量
+不随进程数量增加。
+
+启动: python market_data_service.py
+"""
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    from .trading_bot import TradingBot
+    from .market_data_client import market_data_client
+    from .price_board import PriceBoardWriter
+    from .config import (
+        MARKET_DATA_SOCKET, MARKET_DATA_FAMILIES, MARKET_DATA_REFRESH_INTERVAL,
+        MARKET_DATA_DISCOVERY_INTERVAL, MARKET_DATA_TRACK_TTL
+    )
+except ImportError:
+    from trading_bot import TradingBot
+    from market_data_client import market_data_client
+    from price_board import PriceBoardWriter
+    from config import (
+        MARKET_DATA_SOCKET, MARKET_DATA_FAMILIES, MARKET_DATA_REFRESH_INTERVAL,
+        MARKET_DATA_DISCOVERY_INTERVAL, MARKET_DATA_TRACK_TTL
+    )
+
+# 市场系列 -> 发现方法（TradingBot 上对应的方法名）
+FAMILY_DISCOVERY = {
+    'eth-updown-15m': 'get_eth_15min_markets',
+}
+
+
+class _Subscriber:
+    """一个订阅连接（推送写入加锁，避免与请求回复交错）"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.lock = threading.Lock()
+
+    def send(self, message: Dict) -> bool:
+        data = (json.dumps(message) + '\n').encode()
+        try:
+            with self.lock:
+                self.wfile.write(data)
+                self.wfile.flush()
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+class _ThreadingServer(socketserver.ThreadingUnixStreamServer):
+    """订阅连接的处理线程设为守护线程，进程退出时不等待长连接"""
+
+    daemon_threads = True
+
+
+class MarketDataService:
+    """行情发现与价格刷新，并向订阅者推送"""
+
+    def __init__(self, path: str = MARKET_DATA_SOCKET, families: Optional[List[str]] = None,
+                 refresh_interval: float = MARKET_DATA_REFRESH_INTERVAL,
+                 discovery_interval: float = MARKET_DATA_DISCOVERY_INTERVAL,
+                 track_ttl: float = MARKET_DATA_TRACK_TTL):
+        """
+        Args:
+            path: Unix socket 路径
+            families: 负责的市场系列（FAMILY_DISCOVERY 中的键）
+            refresh_interval: 价格刷新与推送周期（秒）
+            discovery_interval: 市场发现周期（秒）
+            track_ttl: 订阅者请求跟踪的额外 token 在多久无人读取后停止刷新（秒）
+        """
+        # 本进程即行情来源，不能再读取自己的推送
+        market_data_client.disable()
+        self.path = path
+        self.families = [f for f in (families or MARKET_DATA_FAMILIES) if f in FAMILY_DISCOVERY]
+        self.refresh_interval = refresh_interval
+        self.discovery_interval = discovery_interval
+        self.track_ttl = track_ttl
+        self._bot = TradingBot({'id': 0, 'name': '行情服务'})
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="market-data")
+        self._lock = threading.Lock()
+        self._subscribers: List[_Subscriber] = []
+        self._markets: List[Dict] = []
+        self._pushed_at = 0.0
+        self._quotes: Dict[str, Dict] = {}
+        # 额外跟踪的 token -> 最近一次请求时间
+        self._tracked: Dict[str, float] = {}
+        self._server: Optional[_ThreadingServer] = None
+        # 共享内存价格板（本进程为唯一写入方），启动服务时创建
+        self._board: Optional[PriceBoardWriter] = None
+        self._stop_event = threading.Event()
+        self.cycles = 0
+
+    # ========== 刷新 ==========
+
+    def _discover(self):
+        markets = []
+        for family in self.families:
+            try:
+                markets.extend(getattr(self._bot, FAMILY_DISCOVERY[family])() or [])
+            except Exception as e:
+                print(f"[行情服务] 发现 {family} 市场失败: {e}")
+        self._markets = markets
+
+    def _quote_market(self, market: Dict) -> Dict[str, Dict]:
+        snapshot = self._bot.build_market_snapshot(market, with_prices=True)
+        if snapshot is None:
+            return {}
+        ts = time.time()
+        return {
+            str(snapshot.yes_token_id): {'bid': snapshot.yes_bid, 'ask': snapshot.yes_ask, 'ts': ts},
+            str(snapshot.no_token_id): {'bid': snapshot.no_bid, 'ask': snapshot.no_ask, 'ts': ts}
+        }
+
+    def _quote_token(self, token_id: str) -> Dict[str, Dict]:
+        return {token_id: {'bid': self._bot._get_best_bid_price(token_id), 'ask': None, 'ts': time.time()}}
+
+    def refresh(self, discover: bool = False):
+        """刷新一轮价格（需要时重新发现市场）并推送给所有订阅者"""
+        if discover:
+            self._discover()
+        now = time.time()
+        with self._lock:
+            self._tracked = {t: ts for t, ts in self._tracked.items() if now - ts <= self.track_ttl}
+            extra = list(self._tracked)
+        futures = [self._pool.submit(self._quote_market, market) for market in self._markets]
+        quotes: Dict[str, Dict] = {}
+        for future in futures:
+            try:
+                quotes.update(future.result())
+            except Exception:
+                continue
+        # 按需跟踪的 token（如出售持仓时查询买价）：不在市场内或市场报价缺少买价时单独查询
+        futures = [
+            self._pool.submit(self._quote_token, token_id) for token_id in extra
+            if quotes.get(token_id, {}).get('bid') is None
+        ]
+        for future in futures:
+            try:
+                for token_id, entry in future.result().items():
+                    if token_id in quotes:
+                        quotes[token_id]['bid'] = entry['bid']
+                    else:
+                        quotes[token_id] = entry
+            except Exception:
+                continue
+        self._quotes = quotes
+        if self._board is not None:
+            for token_id, entry in quotes.items():
+                self._board.update(token_id, entry['bid'], entry['ask'], entry['ts'])
+        self._pushed_at = time.time()
+        self.cycles += 1
+        self._broadcast(self._current_update())
+
+    def _broadcast(self, message: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        dead = [sub for sub in subscribers if not sub.send(message)]
+        if dead:
+            with self._lock:
+                self._subscribers = [sub for sub in self._subscribers if sub not in dead]
+
+    def _current_update(self) -> Dict:
+        # ts 为本轮推送时间：市场列表按发现周期更新，但每轮推送都表示服务仍在工作
+        return {'type': 'update', 'ts': self._pushed_at, 'markets': self._markets, 'quotes': self._quotes}
+
+    # ========== 订阅 ==========
+
+    def _handle(self, rfile, wfile):
+        subscriber = _Subscriber(wfile)
+        try:
+            for line in rfile:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                op = request.get('op')
+                if op == 'subscribe':
+                    with self._lock:
+                        self._subscribers.append(subscriber)
+                    # 立即推送当前数据，新订阅者无需等待下一轮
+                    subscriber.send(self._current_update())
+                elif op == 'track':
+                    now = time.time()
+                    with self._lock:
+                        for token_id in request.get('tokens', []):
+                            self._tracked[str(token_id)] = now
+                elif op == 'status':
+                    subscriber.send({'type': 'status', 'status': self.status()})
+        finally:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+
+    def status(self) -> Dict:
+        return {
+            'families': self.families,
+            'subscribers': len(self._subscribers),
+            'markets': len(self._markets),
+            'quotes': len(self._quotes),
+            'tracked': len(self._tracked),
+            'cycles': self.cycles,
+            'board': self._board.stats() if self._board else None
+        }
+
+    # ========== 运行 ==========
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            # 上次异常退出留下的 socket 文件；仍有服务在监听时不抢占
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                probe.close()
+                raise RuntimeError(f"行情服务已在运行: {self.path}")
+            except OSError:
+                os.unlink(self.path)
+
+        service = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                service._handle(self.rfile, self.wfile)
+
+        self._board = PriceBoardWriter()
+        self._server = _ThreadingServer(self.path, Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="market-data-server").start()
+        print(f"[行情服务] 监听 {self.path}，市场系列: {', '.join(self.families)}")
+
+        last_discovery = 0.0
+        try:
+            while not self._stop_event.is_set():
+                started = time.time()
+                discover = started - last_discovery >= self.discovery_interval
+                try:
+                    self.refresh(discover=discover)
+                except Exception as e:
+                    print(f"[行情服务] 刷新出错: {e}")
+                if discover:
+                    last_discovery = started
+                self._stop_event.wait(max(0, self.refresh_interval - (time.time() - started)))
+        finally:
+            self._close()
+
+    def stop(self):
+        """请求停止（可在信号处理函数或其他线程中调用）；资源由 serve_forever 退出循环后释放，
+        避免在刷新过程中关闭价格板"""
+        self._stop_event.set()
+
+    def _close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self._board:
+            self._board.close()
+            self._board = None
+
+
+def main():
+    service = MarketDataService()
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[行情服务] 已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""按 token 缓存下单参数（tick size / neg_risk / 手续费率）
+
+ClobClient.create_order 在未传入参数时会逐个查询 tick size、neg_risk 与手续费率，
+且缓存在各账号自己的客户端实例中；失败后再用写死的参数重新签名，签名成本翻倍，
+参数也可能与市场不符。这里在发现市场时预取并按 token 进程内共享缓存，
+签名时一次传入，每笔订单只签名一次，不再有额外查询。
+"""
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+try:
+    from .config import MARKET_PARAMS_TTL
+except ImportError:
+    from config import MARKET_PARAMS_TTL
+
+
+class MarketParams:
+    """单个 token 的下单参数"""
+
+    __slots__ = ('tick_size', 'neg_risk', 'fee_rate_bps', 'fetched_at')
+
+    def __init__(self, tick_size: str, neg_risk: bool, fee_rate_bps: int, fetched_at: float):
+        self.tick_size = tick_size
+        self.neg_risk = neg_risk
+        self.fee_rate_bps = fee_rate_bps
+        self.fetched_at = fetched_at
+
+    def clamp_price(self, price: float) -> float:
+        """把价格限制在 [tick, 1 - tick] 内（市价单的固定 0.99 / 0.01 在任何 tick size 下都有效）"""
+        tick = float(self.tick_size)
+        return min(max(price, tick), round(1 - tick, 6))
+
+    def to_dict(self) -> Dict:
+        return {'tick_size': self.tick_size, 'neg_risk': self.neg_risk, 'fee_rate_bps': self.fee_rate_bps}
+
+
+class MarketParamsCache:
+    """进程内共享的下单参数缓存（同一 token 并发查询时只请求一次）"""
+
+    def __init__(self, ttl: float = MARKET_PARAMS_TTL):
+        """
+        Args:
+            ttl: 缓存有效期（秒）；价格接近 0/1 时交易所可能调整 tick size，过期后重新查询
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._params: Dict[str, MarketParams] = {}
+        self._inflight: Dict[str, threading.Lock] = {}
+        # token -> 失效次数；查询期间被 invalidate 的结果不写入缓存
+        self._generations: Dict[str, int] = {}
+        self._hits = 0
+        self._lookups = 0
+        self._errors = 0
+
+    def get(self, token_id) -> Optional[MarketParams]:
+        params = self._params.get(str(token_id))
+        if params is None or time.time() - params.fetched_at > self.ttl:
+            return None
+        return params
+
+    def resolve(self, token_id, client) -> Optional[MarketParams]:
+        """返回缓存的参数，缺失或过期时通过 client 查询；查询失败返回None"""
+        key = str(token_id)
+        params = self.get(key)
+        if params is not None:
+            self._hits += 1
+            return params
+        with self._lock:
+            token_lock = self._inflight.setdefault(key, threading.Lock())
+        with token_lock:
+            # 等待期间其他线程可能已查询完成
+            params = self.get(key)
+            if params is not None:
+                self._hits += 1
+                return params
+            generation = self._generations.get(key, 0)
+            try:
+                params = self._lookup(key, client)
+            except Exception:
+                self._errors += 1
+                params = None
+            # 先写入结果再释放在途锁，之后到达的调用方直接命中缓存，不会再次查询
+            with self._lock:
+                if params is not None and self._generations.get(key, 0) == generation:
+                    self._params[key] = params
+                self._inflight.pop(key, None)
+            return params
+
+    def _lookup(self, token_id: str, client) -> MarketParams:
+        self._lookups += 1
+        tick_size = str(client.get_tick_size(token_id))
+        neg_risk = bool(client.get_neg_risk(token_id))
+        fee_rate_bps = 0
+        if hasattr(client, 'get_fee_rate_bps'):
+            fee_rate_bps = int(client.get_fee_rate_bps(token_id) or 0)
+        return MarketParams(tick_size, neg_risk, fee_rate_bps, time.time())
+
+    def prefetch(self, token_ids: Iterable, client):
+        """预取尚未缓存的 token（在行情线程中调用，不阻塞扫描）"""
+        for token_id in token_ids:
+            if self.get(token_id) is None:
+                self.resolve(token_id, client)
+
+    def missing(self, token_ids: Iterable) -> list:
+        return [token_id for token_id in token_ids if self.get(token_id) is None]
+
+    def invalidate(self, token_id):
+        key = str(token_id)
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._params.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {
+            'tokens': len(self._params),
+            'hits': self._hits,
+            'lookups': self._lookups,
+            'errors': self._errors,
+            'ttl': self.ttl
+        }
+
+
+# 进程内共享的下单参数缓存
+market_params = MarketParamsCache()
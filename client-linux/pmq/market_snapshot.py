@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""市场快照（一次扫描内对单个市场只解析一次）"""
+import time
+from typing import Dict, Optional
+try:
+    from .clock_sync import exchange_now
+except ImportError:
+    from clock_sync import exchange_now
+
+# 市场结束时间可能出现的字段（与 Gamma API 返回保持一致）
+END_TIME_FIELDS = (
+    "endDate", "end_date", "endTime", "end_time",
+    "endDateTimestamp", "endDateTimestampSeconds",
+    "resolutionDate", "resolution_date"
+)
+
+
+def parse_market_end_ts(market_data: Dict) -> Optional[float]:
+    """解析市场结束时间，返回秒级时间戳，无法解析时返回None"""
+    end_time = None
+    for field in END_TIME_FIELDS:
+        if field in market_data:
+            end_time = market_data[field]
+            break
+    if end_time is None:
+        return None
+
+    if isinstance(end_time, (int, float)):
+        if end_time > 1e12:
+            end_time = end_time / 1000.0
+        return float(end_time)
+    if isinstance(end_time, str):
+        try:
+            from dateutil import parser
+            return parser.parse(end_time).timestamp()
+        except Exception:
+            return None
+    return None
+
+
+class MarketSnapshot:
+    """单个市场在一次扫描(tick)中的快照
+
+    token ID、结束时间、两侧最优买/卖价只在构建时解析一次，
+    之后在阈值判断与并发下单之间直接传递，不再回查 Gamma/CLOB。
+    """
+
+    __slots__ = (
+        'market_id', 'question', 'yes_token_id', 'no_token_id', 'end_ts',
+        'yes_bid', 'yes_ask', 'no_bid', 'no_ask', 'fetched_at'
+    )
+
+    def __init__(self, market_id, question: str, yes_token_id: str, no_token_id: str,
+                 end_ts: Optional[float], fetched_at: Optional[float] = None):
+        self.market_id = market_id
+        self.question = question
+        self.yes_token_id = yes_token_id
+        self.no_token_id = no_token_id
+        self.end_ts = end_ts
+        self.yes_bid: Optional[float] = None
+        self.yes_ask: Optional[float] = None
+        self.no_bid: Optional[float] = None
+        self.no_ask: Optional[float] = None
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    @property
+    def market_id_str(self) -> str:
+        return str(self.market_id)
+
+    @property
+    def has_prices(self) -> bool:
+        """两侧卖价是否都已获取"""
+        return self.yes_ask is not None and self.no_ask is not None
+
+    def remaining_seconds(self, now: Optional[float] = None) -> Optional[float]:
+        """剩余时间（秒，按校正后的交易所时间），无结束时间时返回None"""
+        if self.end_ts is None:
+            return None
+        if now is None:
+            now = exchange_now()
+        return max(0.0, self.end_ts - now)
+
+    def token_for(self, side: str) -> str:
+        """side: "UP"/"YES" 或 "DOWN"/"NO" """
+        return self.yes_token_id if side in ('UP', 'YES') else self.no_token_id
+
+    def ask_for(self, side: str) -> Optional[float]:
+        return self.yes_ask if side in ('UP', 'YES') else self.no_ask
+
+    def bid_for(self, side: str) -> Optional[float]:
+        return self.yes_bid if side in ('UP', 'YES') else self.no_bid
+
+    def build_order_info(self, side: str, order_amount_usd: float) -> Dict:
+        """按快照价格构建下单参数（与 place_buy_order 的 order_info 格式一致）"""
+        price_used = self.ask_for(side)
+        return {
+            "market_id": self.market_id,
+            "market_question": self.question,
+            "token_id": self.token_for(side),
+            "best_ask": price_used,
+            "order_size": order_amount_usd / price_used,
+            "order_amount_usd": order_amount_usd,
+            "side": "UP" if side in ('UP', 'YES') else "DOWN"
+        }
+
+    def __repr__(self):
+        return (f"MarketSnapshot(id={self.market_id}, yes_ask={self.yes_ask}, "
+                f"no_ask={self.no_ask}, end_ts={self.end_ts})")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""单账号订单批量提交
+
+多个市场同时触发、或一次出售全部持仓时，同一账号会对每笔订单单独 post_order。
+OrderBatcher 把同一账号在短时间窗口内提交的已签名订单合并，通过 CLOB 批量下单接口
+（post_orders，一次请求多笔订单）提交，并把每笔订单的结果按顺序回填给各自的调用方。
+
+采用组提交方式：窗口内第一个提交者负责等待并发送整批，其余提交者只等待结果；
+只有一笔订单时仍走 post_order。触发买入每个账号只有一笔订单，以 window=0 提交，
+不等待窗口，只合并已在排队的订单。
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+
+class BatchResultUnknown(Exception):
+    """批量下单的响应无法按顺序对应到各笔订单：订单可能已提交，结果未知"""
+
+
+class OrderBatcher:
+    """按账号合并订单提交"""
+
+    def __init__(self, post_one: Callable, post_many: Optional[Callable],
+                 window: float = 0.01, max_batch: int = 15):
+        """
+        Args:
+            post_one: 提交单笔已签名订单
+            post_many: 批量提交（参数为已签名订单列表，返回按顺序的结果列表）；为None时逐笔提交
+            window: 合并窗口（秒），0 表示不等待、只合并已在排队的订单
+            max_batch: 单次批量请求的订单数上限（CLOB 批量接口限制）
+        """
+        self._post_one = post_one
+        self._post_many = post_many
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._pending: List[tuple] = []
+        self._collecting = False
+        self.last_latency: Optional[float] = None
+        self.requests = 0
+        self.orders = 0
+
+    def post(self, order, timeout: Optional[float] = None, window: Optional[float] = None):
+        """提交一笔订单并等待结果（与窗口内其他订单合并发送）
+
+        Args:
+            window: 本次提交的合并窗口，默认使用构造时的 window；0 表示不等待
+        """
+        return self.submit(order, window).result(timeout)
+
+    def submit(self, order, window: Optional[float] = None) -> Future:
+        if window is None:
+            window = self.window
+        future = Future()
+        with self._cond:
+            self._pending.append((order, future))
+            if self._collecting:
+                # 已有提交者在收集本批，批满时提前唤醒它
+                if len(self._pending) >= self.max_batch:
+                    self._cond.notify()
+                return future
+            self._collecting = True
+            if window > 0:
+                self._cond.wait_for(lambda: len(self._pending) >= self.max_batch, timeout=window)
+            batch, self._pending = self._pending, []
+            self._collecting = False
+        self._flush(batch)
+        return future
+
+    def post_all(self, orders: List) -> List:
+        """立即批量提交一组订单（不等待窗口），返回按顺序的结果（失败为None）"""
+        futures = [Future() for _ in orders]
+        self._flush(list(zip(orders, futures)))
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception:
+                results.append(None)
+        return results
+
+    def _flush(self, batch: List[tuple]):
+        for start in range(0, len(batch), self.max_batch):
+            chunk = batch[start:start + self.max_batch]
+            orders = [order for order, _ in chunk]
+            started = time.time()
+            try:
+                if len(chunk) == 1 or self._post_many is None:
+                    results = [self._post_one(order) for order in orders]
+                else:
+                    results = self._post_many(orders)
+                    if not isinstance(results, list) or len(results) != len(orders):
+                        # 无法按顺序对应时不能把整个响应当作每笔订单的结果（非空即会被当作成功）
+                        raise BatchResultUnknown(f"批量下单返回 {type(results).__name__}，无法对应 {len(orders)} 笔订单")
+            except Exception as e:
+                for _, future in chunk:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.last_latency = time.time() - started
+                self.requests += 1 if self._post_many is not None else len(chunk)
+                self.orders += len(chunk)
+            for (_, future), result in zip(chunk, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'orders': self.orders,
+            'last_latency': round(self.last_latency, 4) if self.last_latency is not None else None
+        }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""下单去重存储（持久化、按市场结束时间过期）
+
+记录 (market_id, account_id) 是否已下单：
+- 内存中维护 市场 -> {账号: 过期时间} 以及 账号 -> {市场} 反向索引，
+  判断与按账号清理都是 O(1)
+- 写入同步落盘到 SQLite（WAL 模式），重启后立即恢复，避免重复下单
+- 市场结束后（加上保留时长）自动过期清理
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+
+class OrderDedupeStore:
+    """(market_id, account_id) 去重存储"""
+
+    # 市场结束后保留时长（秒），防止结束前后的时钟误差导致重复下单
+    DEFAULT_RETENTION = 3600
+    # 无法获知市场结束时间时的默认有效期（秒）
+    DEFAULT_TTL = 24 * 3600
+
+    def __init__(self, db_path: Optional[str] = None, retention: float = DEFAULT_RETENTION):
+        """
+        Args:
+            db_path: SQLite 文件路径；为None时只保存在内存中（分片工作进程使用）
+            retention: 市场结束后继续保留记录的时长（秒）
+        """
+        self.db_path = db_path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._by_market: Dict[str, Dict[int, float]] = {}
+        self._by_account: Dict[int, Set[str]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ordered ("
+                " market_id TEXT NOT NULL, account_id INTEGER NOT NULL, expires_at REAL NOT NULL,"
+                " PRIMARY KEY (market_id, account_id)) WITHOUT ROWID"
+            )
+            self._load()
+
+    def _load(self):
+        now = time.time()
+        self._conn.execute("DELETE FROM ordered WHERE expires_at <= ?", (now,))
+        for market_id, account_id, expires_at in self._conn.execute(
+                "SELECT market_id, account_id, expires_at FROM ordered"):
+            self._by_market.setdefault(market_id, {})[account_id] = expires_at
+            self._by_account.setdefault(account_id, set()).add(market_id)
+
+    def _expires_at(self, end_ts: Optional[float]) -> float:
+        if end_ts:
+            return end_ts + self.retention
+        return time.time() + self.DEFAULT_TTL
+
+    # ========== 查询 ==========
+
+    def contains(self, market_id: str, account_id: int) -> bool:
+        entry = self._by_market.get(market_id)
+        return bool(entry) and account_id in entry
+
+    def accounts_for(self, market_id: str) -> Set[int]:
+        """已为该市场下单的账号（返回副本）"""
+        with self._lock:
+            return set(self._by_market.get(market_id, ()))
+
+    def markets_for(self, account_id: int) -> Set[str]:
+        with self._lock:
+            return set(self._by_account.get(account_id, ()))
+
+    # ========== 写入 ==========
+
+    def add(self, market_id: str, account_ids: Iterable[int], end_ts: Optional[float] = None):
+        """记录账号已为市场下单（end_ts 为市场结束时间戳，用于计算过期时间）"""
+        expires_at = self._expires_at(end_ts)
+        rows = []
+        with self._lock:
+            entry = self._by_market.setdefault(market_id, {})
+            for account_id in account_ids:
+                if account_id in entry:
+                    continue
+                entry[account_id] = expires_at
+                self._by_account.setdefault(account_id, set()).add(market_id)
+                rows.append((market_id, account_id, expires_at))
+            if rows and self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO ordered VALUES (?, ?, ?)", rows)
+
+    def remove(self, market_id: str, account_ids: Iterable[int]):
+        """撤销账号对某个市场的下单记录（记录后确认实际并未下单时调用）"""
+        rows = []
+        with self._lock:
+            entry = self._by_market.get(market_id)
+            if not entry:
+                return
+            for account_id in account_ids:
+                if entry.pop(account_id, None) is None:
+                    continue
+                markets = self._by_account.get(account_id)
+                if markets is not None:
+                    markets.discard(market_id)
+                    if not markets:
+                        self._by_account.pop(account_id, None)
+                rows.append((market_id, account_id))
+            if not entry:
+                self._by_market.pop(market_id, None)
+            if rows and self._conn:
+                self._conn.executemany("DELETE FROM ordered WHERE market_id = ? AND account_id = ?", rows)
+
+    def remove_account(self, account_id: int):
+        """清除某个账号的全部下单记录（停止账号时调用）"""
+        with self._lock:
+            markets = self._by_account.pop(account_id, set())
+            for market_id in markets:
+                entry = self._by_market.get(market_id)
+                if entry is not None:
+                    entry.pop(account_id, None)
+                    if not entry:
+                        self._by_market.pop(market_id, None)
+            if markets and self._conn:
+                self._conn.execute("DELETE FROM ordered WHERE account_id = ?", (account_id,))
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """清理已过期的记录，返回清理条数"""
+        if now is None:
+            now = time.time()
+        removed = 0
+        with self._lock:
+            for market_id in list(self._by_market):
+                entry = self._by_market[market_id]
+                for account_id in [a for a, exp in entry.items() if exp <= now]:
+                    del entry[account_id]
+                    markets = self._by_account.get(account_id)
+                    if markets is not None:
+                        markets.discard(market_id)
+                        if not markets:
+                            self._by_account.pop(account_id, None)
+                    removed += 1
+                if not entry:
+                    del self._by_market[market_id]
+            if removed and self._conn:
+                self._conn.execute("DELETE FROM ordered WHERE expires_at <= ?", (now,))
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'markets': len(self._by_market),
+                'entries': sum(len(e) for e in self._by_market.values()),
+                'persistent': self._conn is not None
+            }
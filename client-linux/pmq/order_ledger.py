@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""下单流水（只追加）
+
+每一次下单尝试（买入、出售，含签名失败与提交异常）记录账号、市场、token、方向、价格、数量、
+提交耗时、结果状态、订单ID与成交数量。下单线程只把记录放入队列，由后台写入线程按批
+（ORDER_LEDGER_BATCH 条或 ORDER_LEDGER_FLUSH_INTERVAL 秒）在一个事务中写入 SQLite（WAL 模式）；
+调度器、分片与客户端进程写入同一个文件。按 账号/市场/时间 建有索引，供 API 查询。
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    from .config import ORDER_LEDGER_DB, ORDER_LEDGER_BATCH, ORDER_LEDGER_FLUSH_INTERVAL
+except ImportError:
+    from config import ORDER_LEDGER_DB, ORDER_LEDGER_BATCH, ORDER_LEDGER_FLUSH_INTERVAL
+
+COLUMNS = (
+    'ts', 'account_id', 'market_id', 'token_id', 'side', 'price', 'size',
+    'latency', 'success', 'status', 'order_id', 'filled', 'error'
+)
+# 单次查询返回的最大条数
+MAX_QUERY_LIMIT = 1000
+
+
+class OrderLedger:
+    """下单流水（后台批量写入）"""
+
+    def __init__(self, db_path: Optional[str] = ORDER_LEDGER_DB, batch: int = ORDER_LEDGER_BATCH,
+                 flush_interval: float = ORDER_LEDGER_FLUSH_INTERVAL):
+        """
+        Args:
+            db_path: SQLite 文件路径；为None时不记录
+            batch: 单个事务最多写入的条数
+            flush_interval: 队列中的记录最长等待写入的时间（秒）
+        """
+        self.db_path = db_path
+        self.batch = max(1, batch)
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._written = 0
+        self._errors = 0
+        self._last_error: Optional[str] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _ensure_writer(self) -> bool:
+        if self._writer is not None:
+            return True
+        if not self.db_path:
+            return False
+        with self._start_lock:
+            if self._writer is None:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                conn = self._connect()
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS orders ("
+                    " id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, account_id INTEGER,"
+                    " market_id TEXT, token_id TEXT, side TEXT, price REAL, size REAL, latency REAL,"
+                    " success INTEGER NOT NULL, status TEXT, order_id TEXT, filled REAL, error TEXT)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_account_ts ON orders (account_id, ts)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_market_ts ON orders (market_id, ts)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_ts ON orders (ts)")
+                conn.close()
+                writer = threading.Thread(target=self._write_loop, daemon=True, name="order-ledger")
+                writer.start()
+                self._writer = writer
+        return True
+
+    # ========== 写入 ==========
+
+    def record(self, entry: Dict):
+        """追加一条下单记录（只入队，不等待写入）"""
+        if not self._ensure_writer():
+            return
+        entry.setdefault('ts', time.time())
+        self._queue.put(entry)
+
+    def flush(self, timeout: float = 5) -> bool:
+        """等待此前入队的记录全部写入"""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            pending = [item]
+            deadline = time.time() + self.flush_interval
+            # 等待同一批的其他记录；遇到 flush 请求立即写入
+            while len(pending) < self.batch and not isinstance(pending[-1], threading.Event):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            rows = [tuple(entry.get(column) for column in COLUMNS)
+                    for entry in pending if not isinstance(entry, threading.Event)]
+            if rows:
+                try:
+                    conn.execute("BEGIN")
+                    conn.executemany(
+                        f"INSERT INTO orders ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+                    )
+                    conn.execute("COMMIT")
+                    self._written += len(rows)
+                except sqlite3.Error as e:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+                    self._errors += len(rows)
+                    self._last_error = str(e)
+            for entry in pending:
+                if isinstance(entry, threading.Event):
+                    entry.set()
+
+    # ========== 查询 ==========
+
+    def query(self, account_id: Optional[int] = None, market_id: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 100) -> List[Dict]:
+        """按 账号/市场/时间范围 查询，按时间倒序"""
+        if not self.db_path or not os.path.exists(self.db_path):
+            return []
+        self.flush()
+        conditions, params = [], []
+        if account_id is not None:
+            conditions.append("account_id = ?")
+            params.append(account_id)
+        if market_id is not None:
+            conditions.append("market_id = ?")
+            params.append(str(market_id))
+        if since is not None:
+            conditions.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("ts < ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(max(1, min(int(limit), MAX_QUERY_LIMIT)))
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM orders{where} ORDER BY ts DESC LIMIT ?", params
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # 尚未写入过任何记录（表不存在）
+            return []
+        finally:
+            conn.close()
+        results = []
+        for row in rows:
+            entry = dict(zip(('id',) + COLUMNS, row))
+            entry['success'] = bool(entry['success'])
+            results.append(entry)
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': bool(self.db_path),
+            'queued': self._queue.qsize(),
+            'written': self._written,
+            'errors': self._errors,
+            'last_error': self._last_error
+        }
+
+
+# 进程内共享的下单流水（同一进程的所有账号共用一个写入线程）
+order_ledger = OrderLedger()
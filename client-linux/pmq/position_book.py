@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""单账号本地持仓簿
+
+Data API /positions 较慢、成交后有延迟且有限流。这里按本账号自己的下单结果与索取结果
+增量维护各 token 的持仓数量，出售与索取时直接读取本地持仓簿；
+按 POSITION_RECONCILE_INTERVAL 慢周期与 /positions 对账，以远端为准覆盖本地，
+并记录两者不一致的 token（偏差）。刚由本地成交更新过的 token 在 POSITION_RECONCILE_GRACE
+内保留本地数量（/positions 在成交后有延迟），不计偏差。
+
+无法从下单结果确定成交数量时（挂单未成交、返回缺少成交数量），持仓簿标记为待对账，
+下次读取前先与 /positions 对账。
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from .config import POSITION_RECONCILE_INTERVAL, POSITION_RECONCILE_GRACE
+except ImportError:
+    from config import POSITION_RECONCILE_INTERVAL, POSITION_RECONCILE_GRACE
+
+# 小于此数量的差异视为一致（下单数量按 2 位小数取整）
+DRIFT_EPSILON = 0.01
+# 保留的最近偏差记录数
+MAX_DRIFT_RECORDS = 20
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def filled_from_result(side: str, result) -> Optional[float]:
+    """已成交订单的成交份额：买单 takingAmount 为获得的份额，卖单 makingAmount 为卖出的份额"""
+    if not isinstance(result, dict) or str(result.get('status') or '').lower() != 'matched':
+        return None
+    return _to_float(result.get('takingAmount') if side == 'BUY' else result.get('makingAmount'))
+
+
+class PositionBook:
+    """按下单/索取结果增量维护的持仓，定期与 /positions 对账"""
+
+    def __init__(self, reconcile_interval: float = POSITION_RECONCILE_INTERVAL,
+                 grace: float = POSITION_RECONCILE_GRACE):
+        self.reconcile_interval = reconcile_interval
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, float] = {}
+        # token -> 最近一次本地成交/索取更新的时间
+        self._touched: Dict[str, float] = {}
+        # token -> 对账时 /positions 返回的描述字段（market_id / outcome 等）
+        self._meta: Dict[str, Dict] = {}
+        self._reconciled_at: Optional[float] = None
+        self._dirty = False
+        self._fills = 0
+        self._reconciles = 0
+        self._drift_events = 0
+        self._drift: List[Dict] = []
+
+    # ========== 增量更新 ==========
+
+    def apply_order_result(self, token_id, side: str, result, size: Optional[float] = None):
+        """根据 post_order 返回的单笔结果更新持仓
+
+        Args:
+            side: 'BUY' / 'SELL'
+            size: 下单数量，立即成交但结果缺少成交数量时用于卖单
+        """
+        if not isinstance(result, dict) or not result.get('success', True) or result.get('errorMsg'):
+            return
+        status = str(result.get('status') or '').lower()
+        if status != 'matched':
+            # 挂单或延迟撮合，成交数量未知
+            with self._lock:
+                self._dirty = True
+            return
+        filled = filled_from_result(side, result)
+        if not filled and side == 'SELL':
+            filled = size
+        with self._lock:
+            if not filled:
+                self._dirty = True
+                return
+            key = str(token_id)
+            delta = filled if side == 'BUY' else -filled
+            remaining = self._sizes.get(key, 0.0) + delta
+            if remaining > DRIFT_EPSILON:
+                self._sizes[key] = remaining
+            else:
+                self._sizes.pop(key, None)
+            self._touched[key] = time.time()
+            self._fills += 1
+
+    def mark_dirty(self):
+        """提交结果未知（订单可能已成交）时标记，下次检查时与 /positions 对账"""
+        with self._lock:
+            self._dirty = True
+
+    def apply_redeem(self, token_ids: Iterable):
+        """索取成功后清除对应 token 的持仓"""
+        with self._lock:
+            now = time.time()
+            for token_id in token_ids:
+                self._sizes.pop(str(token_id), None)
+                self._touched[str(token_id)] = now
+
+    # ========== 对账 ==========
+
+    def reconcile(self, remote: List[Dict]) -> List[Dict]:
+        """以 get_positions() 的结果覆盖本地持仓，返回本次偏差 [{'token_id', 'local', 'remote'}]
+
+        首次对账只建立基线，不计偏差；宽限期内本地更新过的 token 保留本地数量。
+        """
+        remote_sizes = {}
+        meta = {}
+        for pos in remote:
+            key = str(pos.get('token_id'))
+            remote_sizes[key] = remote_sizes.get(key, 0.0) + float(pos.get('balance') or 0)
+            meta[key] = {k: pos.get(k) for k in ('market_id', 'market_question', 'outcome')}
+        now = time.time()
+        with self._lock:
+            self._touched = {key: ts for key, ts in self._touched.items() if now - ts <= self.grace}
+            drift = []
+            sizes = {key: size for key, size in remote_sizes.items() if size > 0}
+            for key in set(self._sizes) | set(remote_sizes):
+                local = self._sizes.get(key, 0.0)
+                if key in self._touched:
+                    # 远端可能尚未反映本地刚成交的数量
+                    if local > 0:
+                        sizes[key] = local
+                    else:
+                        sizes.pop(key, None)
+                    continue
+                remote_size = remote_sizes.get(key, 0.0)
+                if self._reconciled_at is not None and abs(local - remote_size) > DRIFT_EPSILON:
+                    drift.append({'token_id': key, 'local': round(local, 4), 'remote': round(remote_size, 4)})
+            self._sizes = sizes
+            self._meta = meta
+            self._reconciled_at = now
+            self._dirty = False
+            self._reconciles += 1
+            if drift:
+                self._drift_events += 1
+                self._drift = (self._drift + [dict(d, ts=now) for d in drift])[-MAX_DRIFT_RECORDS:]
+        return drift
+
+    def needs_reconcile(self) -> bool:
+        reconciled_at = self._reconciled_at
+        return self._dirty or reconciled_at is None or time.time() - reconciled_at > self.reconcile_interval
+
+    # ========== 读取 ==========
+
+    def positions(self) -> List[Dict]:
+        """与 get_positions() 相同格式的持仓列表（token_id / balance 及对账时的描述字段）"""
+        with self._lock:
+            return [
+                dict(self._meta.get(key, {}), token_id=key, balance=size)
+                for key, size in self._sizes.items()
+            ]
+
+    def is_empty(self) -> bool:
+        return not self._sizes
+
+    def stats(self) -> Dict:
+        reconciled_at = self._reconciled_at
+        return {
+            'tokens': len(self._sizes),
+            'fills': self._fills,
+            'reconciles': self._reconciles,
+            'reconcile_age': round(time.time() - reconciled_at, 1) if reconciled_at is not None else None,
+            'dirty': self._dirty,
+            'drift_events': self._drift_events,
+            'recent_drift': list(self._drift[-5:])
+        }
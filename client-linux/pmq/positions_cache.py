@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""按钱包缓存 Data API /positions 结果
+
+出售全部持仓后紧接着索取时，同一钱包的 /positions 会在几秒内被请求两次；
+get_positions 与 auto_redeem_positions 也各自请求一次。这里按钱包地址在进程内短时间缓存
+原始返回列表，同一钱包并发查询时只请求一次；本账号下单成交或索取成功后由 TradingBot
+主动失效，下次读取即重新查询。
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .config import POSITIONS_CACHE_TTL
+except ImportError:
+    from config import POSITIONS_CACHE_TTL
+
+
+class PositionsCache:
+    """进程内共享的持仓缓存（键为小写钱包地址）"""
+
+    def __init__(self, ttl: float = POSITIONS_CACHE_TTL):
+        """
+        Args:
+            ttl: 缓存有效期（秒），过期后下次读取重新请求
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+        self._inflight: Dict[str, threading.Lock] = {}
+        # 钱包 -> 失效次数；请求期间被 invalidate（如订单成交）的结果不写入缓存
+        self._generations: Dict[str, int] = {}
+        self._hits = 0
+        self._fetches = 0
+        self._errors = 0
+        self._invalidations = 0
+
+    def get(self, wallet: str) -> Optional[List[Dict]]:
+        entry = self._entries.get(wallet.lower())
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def fetch(self, wallet: str, loader: Callable[[], Optional[List[Dict]]]) -> Optional[List[Dict]]:
+        """返回缓存的持仓列表，缺失或过期时调用 loader 请求；loader 返回None（请求失败）时不缓存"""
+        key = wallet.lower()
+        positions = self.get(key)
+        if positions is not None:
+            self._hits += 1
+            return positions
+        with self._lock:
+            wallet_lock = self._inflight.setdefault(key, threading.Lock())
+        with wallet_lock:
+            # 等待期间其他线程可能已请求完成
+            positions = self.get(key)
+            if positions is not None:
+                self._hits += 1
+                return positions
+            self._fetches += 1
+            generation = self._generations.get(key, 0)
+            positions = None
+            try:
+                positions = loader()
+            finally:
+                # 先写入结果再释放在途锁，之后到达的调用方直接命中缓存，不会再次请求
+                with self._lock:
+                    if positions is not None and self._generations.get(key, 0) == generation:
+                        self._entries[key] = (time.time(), positions)
+                    self._inflight.pop(key, None)
+            if positions is None:
+                self._errors += 1
+            return positions
+
+    def invalidate(self, *wallets: Optional[str]):
+        with self._lock:
+            for wallet in wallets:
+                if not wallet:
+                    continue
+                key = wallet.lower()
+                self._generations[key] = self._generations.get(key, 0) + 1
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def stats(self) -> Dict:
+        return {
+            'wallets': len(self._entries),
+            'hits': self._hits,
+            'fetches': self._fetches,
+            'errors': self._errors,
+            'invalidations': self._invalidations,
+            'ttl': self.ttl
+        }
+
+
+# 进程内共享的持仓缓存
+positions_cache = PositionsCache()
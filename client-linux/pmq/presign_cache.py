@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""预签名订单缓存（市场进入检查窗口后提前为两侧签好买单，触发时只需提交）"""
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+
+class PresignedOrder:
+    """一笔已签名但未提交的买单"""
+
+    __slots__ = ('market_id', 'token_id', 'order_size', 'order', 'signed_at')
+
+    def __init__(self, market_id: str, token_id: str, order_size: float, order):
+        self.market_id = market_id
+        self.token_id = token_id
+        self.order_size = order_size
+        self.order = order
+        self.signed_at = time.time()
+
+
+class PresignedOrderCache:
+    """预签名订单缓存: (account_id, token_id) -> PresignedOrder
+
+    - 价格变化导致下单数量偏离超过 size_tolerance（相对比例）时需要重新签名
+    - 触发时 take() 取出即删除，每笔签名订单只会被提交一次
+    - 市场下单完成或离开检查窗口后，剩余订单整体丢弃
+    """
+
+    def __init__(self, size_tolerance: float = 0.02):
+        self.size_tolerance = size_tolerance
+        self._orders: Dict[Tuple[int, str], PresignedOrder] = {}
+        # 正在签名中的 key，避免同一笔订单在多个 tick 重复提交签名任务
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _size_matches(self, cached_size: float, order_size: float) -> bool:
+        if not cached_size or not order_size:
+            return False
+        return abs(cached_size - order_size) / order_size <= self.size_tolerance
+
+    def needs_refresh(self, account_id: int, token_id: str, order_size: float) -> bool:
+        """是否需要(重新)签名；需要时同时标记为签名中"""
+        key = (account_id, token_id)
+        with self._lock:
+            if key in self._pending:
+                return False
+            cached = self._orders.get(key)
+            if cached is not None and self._size_matches(cached.order_size, order_size):
+                return False
+            self._pending.add(key)
+            return True
+
+    def put(self, account_id: int, market_id: str, token_id: str, order_size: float, order):
+        """写入签名结果（order 为 None 表示签名失败，仅清除签名中标记）"""
+        key = (account_id, token_id)
+        with self._lock:
+            self._pending.discard(key)
+            if order is not None:
+                self._orders[key] = PresignedOrder(market_id, token_id, order_size, order)
+
+    def take(self, account_id: int, token_id: str, order_size: float):
+        """取出可直接提交的签名订单（数量不匹配时丢弃并返回None）"""
+        key = (account_id, token_id)
+        with self._lock:
+            cached = self._orders.pop(key, None)
+            if cached is not None and self._size_matches(cached.order_size, order_size):
+                self._hits += 1
+                return cached.order
+            self._misses += 1
+            return None
+
+    def discard_market(self, market_id: str):
+        """丢弃某个市场的全部预签名订单"""
+        with self._lock:
+            for key in [k for k, v in self._orders.items() if v.market_id == market_id]:
+                del self._orders[key]
+
+    def discard_account(self, account_id: int):
+        with self._lock:
+            for key in [k for k in self._orders if k[0] == account_id]:
+                del self._orders[key]
+
+    def retain_markets(self, market_ids: Iterable[str]):
+        """只保留仍在检查窗口内的市场"""
+        keep = set(market_ids)
+        with self._lock:
+            for key in [k for k, v in self._orders.items() if v.market_id not in keep]:
+                del self._orders[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'cached_orders': len(self._orders),
+                'pending': len(self._pending),
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""共享内存价格板
+
+行情服务进程（唯一写入方）把各 token 的最优买/卖价写入固定布局的
+multiprocessing.shared_memory；调度器、分片与客户端进程直接按偏移读取，
+无需经 socket 传输和 JSON 解析。
+
+布局（小端）：
+- 头部 32 字节: magic(8s) 槽位数(I) 槽位大小(I) 已分配槽位数(Q) 代数(Q)
+- 槽位 128 字节: seq(Q) bid(d) ask(d) ts(d) token_id(80s)
+
+一致性采用 seqlock：写入方先把 seq 加一（奇数表示写入中），写完价格后再加一；
+读取方在读取前后各读一次 seq，两次相同且为偶数才采用。槽位写满时写入方重置价格板
+（代数加一），读取方发现代数变化后重建 token 索引。缺失的价格以 NaN 存储。
+"""
+import math
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+try:
+    from .config import MARKET_DATA_BOARD, PRICE_BOARD_SLOTS
+except ImportError:
+    from config import MARKET_DATA_BOARD, PRICE_BOARD_SLOTS
+
+MAGIC = b'PMQBOARD'
+HEADER = struct.Struct('<8sIIQQ')
+HEADER_SIZE = 32
+SLOT_SIZE = 128
+SEQ = struct.Struct('<Q')
+VALUES = struct.Struct('<ddd')
+TOKEN_SIZE = 80
+TOKEN_OFFSET = SEQ.size + VALUES.size
+COUNT_OFFSET = 16
+GENERATION_OFFSET = 24
+# 读取方遇到写入中的槽位时的最大重试次数
+MAX_READ_RETRIES = 100
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """附加到已存在的共享内存，不注册到 resource_tracker（否则读取进程退出时会删除它）"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class PriceBoardWriter:
+    """价格板写入方（每块价格板只能有一个写入进程）"""
+
+    def __init__(self, name: str = MARKET_DATA_BOARD, capacity: int = PRICE_BOARD_SLOTS):
+        self.name = name
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * SLOT_SIZE
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 上次异常退出遗留的价格板：大小相符则复用，否则重建
+            self._shm = _attach(name)
+            if self._shm.size < size:
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._buf = self._shm.buf
+        generation = 0
+        magic, _, _, _, old_generation = HEADER.unpack_from(self._buf, 0)
+        if magic == MAGIC:
+            generation = old_generation
+        self._generation = generation
+        self._slots: Dict[str, int] = {}
+        self.resets = 0
+        self.reset()
+        HEADER.pack_into(self._buf, 0, MAGIC, capacity, SLOT_SIZE, 0, self._generation)
+
+    def reset(self):
+        """清空全部槽位（代数加一，读取方据此重建索引）"""
+        self._generation += 1
+        struct.pack_into('<Q', self._buf, GENERATION_OFFSET, self._generation)
+        struct.pack_into('<Q', self._buf, COUNT_OFFSET, 0)
+        self._slots = {}
+        self.resets += 1
+
+    def update(self, token_id, bid: Optional[float], ask: Optional[float], ts: Optional[float] = None):
+        token = str(token_id)
+        index = self._slots.get(token)
+        if index is None:
+            if len(self._slots) >= self.capacity:
+                self.reset()
+            index = len(self._slots)
+            offset = HEADER_SIZE + index * SLOT_SIZE
+            SEQ.pack_into(self._buf, offset, 0)
+            VALUES.pack_into(self._buf, offset + SEQ.size, math.nan, math.nan, 0.0)
+            encoded = token.encode()[:TOKEN_SIZE]
+            self._buf[offset + TOKEN_OFFSET:offset + TOKEN_OFFSET + TOKEN_SIZE] = encoded.ljust(TOKEN_SIZE, b'\0')
+            self._slots[token] = index
+            # token 写完后才发布槽位数，读取方不会看到未写完的 token
+            struct.pack_into('<Q', self._buf, COUNT_OFFSET, index + 1)
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        seq = SEQ.unpack_from(self._buf, offset)[0]
+        SEQ.pack_into(self._buf, offset, seq + 1)
+        VALUES.pack_into(
+            self._buf, offset + SEQ.size,
+            math.nan if bid is None else bid,
+            math.nan if ask is None else ask,
+            time.time() if ts is None else ts
+        )
+        SEQ.pack_into(self._buf, offset, seq + 2)
+
+    def close(self, unlink: bool = True):
+        # 清除 magic，仍附加着的读取方据此放弃旧映射并重新附加
+        self._buf[0:8] = b'\0' * 8
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict:
+        return {'name': self.name, 'slots': len(self._slots), 'capacity': self.capacity, 'resets': self.resets}
+
+
+class PriceBoardReader:
+    """价格板读取方（价格板不存在时按间隔重试附加）"""
+
+    def __init__(self, name: str = MARKET_DATA_BOARD, retry_interval: float = 5):
+        self.name = name
+        self.retry_interval = retry_interval
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._next_attach = 0.0
+        self._index: Dict[str, int] = {}
+        self._index_count = 0
+        self._index_generation = -1
+        self.retries = 0
+
+    def _ensure_attached(self) -> bool:
+        if self._shm is not None:
+            return True
+        if time.time() < self._next_attach:
+            return False
+        try:
+            shm = _attach(self.name)
+        except (FileNotFoundError, OSError, ValueError):
+            self._next_attach = time.time() + self.retry_interval
+            return False
+        if bytes(shm.buf[:8]) != MAGIC:
+            shm.close()
+            self._next_attach = time.time() + self.retry_interval
+            return False
+        self._shm = shm
+        return True
+
+    def _rebuild_index(self, generation: int, count: int):
+        buf = self._shm.buf
+        index = {}
+        for i in range(count):
+            start = HEADER_SIZE + i * SLOT_SIZE + TOKEN_OFFSET
+            token = bytes(buf[start:start + TOKEN_SIZE]).rstrip(b'\0').decode()
+            index[token] = i
+        self._index = index
+        self._index_count = count
+        self._index_generation = generation
+
+    def read(self, token_id) -> Optional[Tuple[Optional[float], Optional[float], float]]:
+        """读取 token 的 (bid, ask, ts)；价格板不可用或没有该 token 时返回None"""
+        if not self._ensure_attached():
+            return None
+        buf = self._shm.buf
+        token = str(token_id)
+        for _ in range(MAX_READ_RETRIES):
+            magic, _, _, count, generation = HEADER.unpack_from(buf, 0)
+            if magic != MAGIC:
+                # 写入方已关闭（行情服务重启后会创建新的价格板）
+                buf = None
+                self.close()
+                return None
+            if generation != self._index_generation or (token not in self._index and count != self._index_count):
+                self._rebuild_index(generation, count)
+            index = self._index.get(token)
+            if index is None:
+                return None
+            offset = HEADER_SIZE + index * SLOT_SIZE
+            seq_before = SEQ.unpack_from(buf, offset)[0]
+            if seq_before & 1:
+                self.retries += 1
+                continue
+            bid, ask, ts = VALUES.unpack_from(buf, offset + SEQ.size)
+            seq_after = SEQ.unpack_from(buf, offset)[0]
+            if seq_after != seq_before or struct.unpack_from('<Q', buf, GENERATION_OFFSET)[0] != generation:
+                self.retries += 1
+                continue
+            return _none_if_nan(bid), _none_if_nan(ask), ts
+        return None
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+            self._index_generation = -1
+            self._next_attach = 0.0
+
+    def stats(self) -> Dict:
+        return {
+            'attached': self._shm is not None,
+            'name': self.name,
+            'indexed_tokens': len(self._index),
+            'read_retries': self.retries
+        }
+
+
+# 进程内共享的价格板读取方
+price_board = PriceBoardReader()
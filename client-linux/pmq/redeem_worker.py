@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""后台自动索取线程（独立于市场扫描，检查窗口内自动暂停）"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+class RedeemWorker:
+    """按 redeem_interval 周期执行自动索取
+
+    - 运行在独立线程中，扫描循环从不等待索取完成
+    - 任一市场处于检查窗口时推迟执行，窗口结束后再补上
+    - 实际的并发索取由调度器的索取池执行，与下单池隔离
+    """
+
+    def __init__(self, redeem_fn: Callable[[], None], interval_fn: Callable[[], float],
+                 paused_fn: Callable[[], bool], log_fn: Callable[[str], None]):
+        """
+        Args:
+            redeem_fn: 执行一次全量索取
+            interval_fn: 返回当前索取间隔（秒），每轮读取以便策略配置实时生效
+            paused_fn: 返回是否应暂停（有市场处于检查窗口）
+            log_fn: 日志输出
+        """
+        self._redeem_fn = redeem_fn
+        self._interval_fn = interval_fn
+        self._paused_fn = paused_fn
+        self._log = log_fn
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self.last_redeem_time = 0.0
+        self.redeeming = False
+        self.deferred_count = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="redeem-worker")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def is_alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def wake(self):
+        """检查窗口结束时唤醒，尽快补上被推迟的索取"""
+        self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            due_in = self.last_redeem_time + self._interval_fn() - time.time()
+            if due_in > 0:
+                self._wake_event.wait(min(due_in, 5))
+                self._wake_event.clear()
+                continue
+            if self._paused_fn():
+                # 有市场处于检查窗口：推迟，避免与下单争抢出口带宽和账号
+                self.deferred_count += 1
+                self._wake_event.wait(1)
+                self._wake_event.clear()
+                continue
+            self._log(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 执行自动索取（后台线程，所有运行账号并发执行）...")
+            self.redeeming = True
+            try:
+                self._redeem_fn()
+            except Exception as e:
+                self._log(f"自动索取出错: {e}")
+            finally:
+                self.redeeming = False
+                self.last_redeem_time = time.time()
+                self.deferred_count = 0
+
+    def status(self) -> Dict:
+        next_due = self.last_redeem_time + self._interval_fn() if self.last_redeem_time else None
+        return {
+            'alive': self.is_alive(),
+            'redeeming': self.redeeming,
+            'paused': self._paused_fn(),
+            'last_redeem_time': self.last_redeem_time or None,
+            'next_due': next_due,
+            'deferred_count': self.deferred_count
+        }
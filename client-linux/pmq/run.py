@@ -7,10 +7,12 @@ import os
 # 添加当前目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app
+from app import app, init
 from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG
 
+# 初始化必须放在 __main__ 保护下：spawn 出的签名/分片子进程会重新导入本脚本
 if __name__ == '__main__':
+    init()
     print("=" * 50)
     print("Polymarket 多账号群控系统")
     print("=" * 50)
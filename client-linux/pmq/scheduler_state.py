@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""调度状态快照（热重启）
+
+重启进程后需要逐个重新启动账号、重新派生API凭证、重新发现市场，自动索取计时也会
+归零，账号多时恢复交易需要数分钟。调度器定期把以下状态写入快照文件，启动时据此恢复：
+
+- 运行中的账号ID与自动监控开关
+- 全局策略配置与上次自动索取时间
+- 各账号已派生的L2 API凭证（与 accounts.json 中的私钥同样以明文保存在本机 data 目录）
+- 最近发现的市场数据（市场列表拉取失败时作为后备）
+
+已下单记录由 OrderDedupeStore 自行持久化，不在快照中重复保存。
+快照先写临时文件再原子替换，进程在写入途中退出也不会留下损坏的文件。
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# 快照格式版本（格式不兼容时忽略旧快照）
+STATE_VERSION = 1
+
+
+class SchedulerStateStore:
+    """调度状态快照文件"""
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 24 * 3600):
+        """
+        Args:
+            path: 快照文件路径；为None时不持久化
+            max_age: 快照最长有效期（秒），超过后启动时不再恢复
+        """
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.last_saved_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def load(self) -> Optional[Dict]:
+        """读取快照；文件不存在、损坏、版本不符或已过期时返回None"""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            self.last_error = f"读取调度状态失败: {e}"
+            return None
+        if state.get('version') != STATE_VERSION:
+            return None
+        if time.time() - state.get('saved_at', 0) > self.max_age:
+            return None
+        return state
+
+    def save(self, state: Dict) -> bool:
+        """原子写入快照"""
+        if not self.path:
+            return False
+        data = dict(state)
+        data['version'] = STATE_VERSION
+        data['saved_at'] = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                self.last_error = f"保存调度状态失败: {e}"
+                return False
+            self.last_saved_at = data['saved_at']
+            self.last_error = None
+        return True
+
+    def status(self) -> Dict:
+        return {
+            'enabled': bool(self.path),
+            'last_saved_age': round(time.time() - self.last_saved_at, 1) if self.last_saved_at else None,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""多进程账号分片
+
+调度进程（协调者）只负责扫描市场与判断触发，账号按 account_id 分到 N 个
+工作进程。每个工作进程内运行一个本地模式的 TaskScheduler（不启动监控线程），
+自行签名、下单、索取与出售，结果再汇总回协调者。单个工作进程崩溃只影响
+其分片内的账号，协调者会自动重启该分片并恢复账号。
+"""
+import itertools
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .clock_sync import exchange_clock, exchange_now
+except ImportError:
+    from clock_sync import exchange_clock, exchange_now
+
+
+# 耗时较长的命令（索取 / 余额检查 / 持仓查询 / 出售）在分片的后台线程中执行，
+# 命令循环只处理账号增删与下单，触发下单不会排在这些命令之后
+BACKGROUND_OPS = frozenset(('redeem', 'balances', 'positions', 'sell_plan'))
+
+
+def _shard_worker_main(shard_index: int, command_queue, result_queue, strategy_config: Dict,
+                       clock_offset: float = 0.0):
+    """工作进程入口：按顺序处理协调者下发的命令"""
+    try:
+        from task_scheduler import TaskScheduler
+        from clock_sync import exchange_clock, exchange_now
+    except ImportError:
+        from pmq.task_scheduler import TaskScheduler
+        from pmq.clock_sync import exchange_clock, exchange_now
+
+    # 本地模式调度器：不再分片、不启动监控线程；分片本身已独占一个GIL，签名在下单线程内完成
+    scheduler = TaskScheduler(None, shard_processes=0, signing_processes=0, persistent=False)
+    scheduler.set_strategy_config(strategy_config)
+    # 下单截止时间由协调者按交易所时间给出。分片与协调者在同一台机器上，直接沿用协调者的时钟偏移
+    # （启动时随参数传入，之后随每条下单命令更新），不自行同步：否则首次同步完成前偏移为0，
+    # 与协调者的截止时间不在同一时间基准上
+    exchange_clock.follow(clock_offset)
+    # 后台命令按到达顺序逐个执行（与原先在命令循环中执行时的顺序一致）
+    background = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard-{shard_index}-background")
+
+    def execute(op: str, payload) -> Dict:
+        if op == 'start':
+            result = scheduler.add_bot(payload['account'])
+            # 回传已派生的API凭证，由协调者写入状态快照
+            result['api_creds'] = scheduler.get_api_creds(payload['account']['id'])
+            return result
+        if op == 'stop':
+            return scheduler.stop_account(payload['account_id'])
+        if op == 'config':
+            scheduler.set_strategy_config(payload['config'])
+            return {'success': True}
+        if op == 'orders':
+            deadline = payload['deadline']
+            exchange_clock.follow(payload['clock_offset'])
+            if exchange_now() >= deadline:
+                # 在命令队列中排队到截止时间之后：协调者已不再等待，全部丢弃（stale 表示未下任何单）
+                return {'succeeded': [], 'failed': [], 'dropped': list(payload['account_ids']),
+                        'abandoned': [], 'stopped': [], 'stale': True}
+            return scheduler.dispatch_orders_local(
+                payload['snapshot'], payload['order_info'], payload['side_label'], payload['account_ids'],
+                deadline=deadline
+            )
+        if op == 'presign':
+            scheduler.presign_orders_local(payload['snapshot'], payload['account_ids'], payload.get('order_amount_usd'))
+            return {'success': True}
+        if op == 'balances':
+            return {'balances': scheduler.check_balances_local(payload['account_ids'], payload['required'])}
+        if op == 'redeem':
+            return scheduler.redeem_local()
+        if op == 'positions':
+            return {'positions': scheduler.collect_positions_local()}
+        if op == 'sell_plan':
+            return scheduler.sell_planned_local(payload['plan'])
+        if op == 'stats':
+            return {'stats': scheduler.collect_stats_local()}
+        if op == 'reconcile':
+            scheduler.reconcile_positions_async()
+            return {'success': True}
+        if op == 'status':
+            return {
+                'shard': shard_index,
+                'accounts': scheduler.get_running_accounts(),
+                'pools': scheduler.get_pool_gauges(),
+                'dispatch': scheduler.dispatch_planner.stats(),
+                'position_book': scheduler.position_book_stats()
+            }
+        return {'success': False, 'message': f'未知命令: {op}'}
+
+    def handle(request_id, op: str, payload):
+        try:
+            result = execute(op, payload)
+        except Exception as e:
+            traceback.print_exc()
+            result = {'success': False, 'message': f'分片{shard_index}执行{op}异常: {e}'}
+        if request_id is not None:
+            result_queue.put((request_id, shard_index, result))
+
+    while True:
+        request_id, op, payload = command_queue.get()
+        if op == 'shutdown':
+            break
+        if op in BACKGROUND_OPS:
+            background.submit(handle, request_id, op, payload)
+        else:
+            handle(request_id, op, payload)
+    background.shutdown(wait=False)
+
+
+class _PendingCall:
+    """一次发往若干分片的请求，收齐全部分片结果后完成"""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.results: List[Dict] = []
+        self.event = threading.Event()
+        if expected == 0:
+            self.event.set()
+
+    def add(self, result: Dict):
+        self.results.append(result)
+        if len(self.results) >= self.expected:
+            self.event.set()
+
+
+class ShardPool:
+    """账号分片进程池（协调者侧）"""
+
+    def __init__(self, processes: int, strategy_config: Dict):
+        self.processes = max(1, int(processes))
+        # spawn：调度进程内有多个线程，fork 会继承锁状态。spawn 子进程以 __mp_main__ 重新导入启动脚本，
+        # 启动脚本必须把 app.init() 放在 if __name__ == '__main__' 下；子进程里创建持久化调度器会直接报错
+        self._ctx = multiprocessing.get_context('spawn')
+        self._strategy_config = dict(strategy_config)
+        self._result_queue = self._ctx.Queue()
+        self._command_queues: List = [None] * self.processes
+        self._workers: List = [None] * self.processes
+        # 协调者记录的分片账号数据，用于分片崩溃后重放
+        self._accounts: Dict[int, Dict] = {}
+        self._pending: Dict[int, _PendingCall] = {}
+        # 已超时的请求：request_id -> [晚到回报回调, 尚未回报的分片数]
+        self._late: Dict[int, list] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._restarts = [0] * self.processes
+        for index in range(self.processes):
+            self._spawn(index)
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+
+    def _spawn(self, index: int):
+        command_queue = self._ctx.Queue()
+        worker = self._ctx.Process(
+            target=_shard_worker_main,
+            args=(index, command_queue, self._result_queue, self._strategy_config, exchange_clock.offset),
+            daemon=True,
+            name=f"pmq-shard-{index}"
+        )
+        worker.start()
+        self._command_queues[index] = command_queue
+        self._workers[index] = worker
+
+    def _read_results(self):
+        while True:
+            try:
+                request_id, _shard_index, result = self._result_queue.get()
+            except (EOFError, OSError):
+                break
+            on_late = None
+            with self._pending_lock:
+                call = self._pending.get(request_id)
+                if call is not None:
+                    call.add(result)
+                    if call.event.is_set():
+                        self._pending.pop(request_id, None)
+                elif request_id in self._late:
+                    late = self._late[request_id]
+                    on_late = late[0]
+                    late[1] -= 1
+                    if late[1] <= 0:
+                        self._late.pop(request_id, None)
+            if on_late is not None:
+                try:
+                    on_late(result)
+                except Exception:
+                    traceback.print_exc()
+
+    def shard_for(self, account_id: int) -> int:
+        return account_id % self.processes
+
+    def _call(self, targets: Dict[int, Dict], op: str, timeout: float,
+              on_late: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """向多个分片发送命令并等待结果: targets = {shard_index: payload}
+
+        Args:
+            on_late: 超时后仍未回报的分片，其结果到达时以该结果调用（在结果读取线程中执行）
+        """
+        request_id = next(self._ids)
+        call = _PendingCall(len(targets))
+        with self._pending_lock:
+            self._pending[request_id] = call
+        for index, payload in targets.items():
+            self._command_queues[index].put((request_id, op, payload))
+        call.event.wait(timeout)
+        with self._pending_lock:
+            self._pending.pop(request_id, None)
+            missing = call.expected - len(call.results)
+            if missing > 0 and on_late is not None:
+                self._late[request_id] = [on_late, missing]
+            return list(call.results)
+
+    def _broadcast(self, op: str, payload: Optional[Dict] = None, timeout: float = 60) -> List[Dict]:
+        return self._call({index: payload or {} for index in range(self.processes)}, op, timeout)
+
+    # ========== 账号 ==========
+
+    def start_account(self, account: Dict, timeout: float = 60) -> Dict:
+        account_id = account.get('id')
+        results = self._call({self.shard_for(account_id): {'account': account}}, 'start', timeout)
+        result = results[0] if results else {'success': False, 'message': '分片启动账号超时'}
+        api_creds = result.pop('api_creds', None)
+        if result.get('success'):
+            # 记录凭证后，分片崩溃重放账号时也无需重新派生
+            self._accounts[account_id] = dict(account, api_creds=api_creds) if api_creds else account
+        return result
+
+    def stop_account(self, account_id: int, timeout: float = 10) -> Dict:
+        self._accounts.pop(account_id, None)
+        results = self._call({self.shard_for(account_id): {'account_id': account_id}}, 'stop', timeout)
+        return results[0] if results else {'success': False, 'message': '分片停止账号超时'}
+
+    def api_creds_of(self, account_id: int) -> Optional[Dict]:
+        return self._accounts.get(account_id, {}).get('api_creds')
+
+    def account_ids(self) -> List[int]:
+        return list(self._accounts.keys())
+
+    def set_strategy_config(self, config: Dict):
+        self._strategy_config.update(config)
+        for index in range(self.processes):
+            self._command_queues[index].put((None, 'config', {'config': config}))
+
+    # ========== 下单 / 索取 / 出售 ==========
+
+    def _group_by_shard(self, account_ids: List[int]) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for acc_id in account_ids:
+            groups.setdefault(self.shard_for(acc_id), []).append(acc_id)
+        return groups
+
+    def place_orders(self, snapshot, order_info: Dict, side_label: str, account_ids: List[int],
+                     deadline: float, grace: float = 2,
+                     on_late: Optional[Callable[[Dict], None]] = None) -> Dict[str, List[int]]:
+        """每个分片一条消息并发下单
+
+        Args:
+            deadline: 截止时间（交易所时间）；分片取到命令时已过截止时间则整条丢弃，不再下单
+            grace: 等待分片回报的额外时间（进程间传递）
+            on_late: 未按时回报的分片，其结果晚到时的回调（用于撤销实际未下单账号的已下单标记）
+        Returns:
+            与 TaskScheduler.dispatch_orders_local 相同；未按时回报的分片，其账号计入 abandoned
+        """
+        groups = self._group_by_shard(account_ids)
+        targets = {
+            index: {'snapshot': snapshot, 'order_info': order_info, 'side_label': side_label,
+                    'account_ids': ids, 'deadline': deadline, 'clock_offset': exchange_clock.offset}
+            for index, ids in groups.items()
+        }
+        merged = {'succeeded': [], 'failed': [], 'dropped': [], 'abandoned': [], 'stopped': []}
+        reported = set()
+        for result in self._call(targets, 'orders', max(0.0, deadline - exchange_now()) + grace, on_late):
+            for key in merged:
+                merged[key].extend(result.get(key, []))
+            reported.update(acc_id for key in merged for acc_id in result.get(key, []))
+        merged['abandoned'].extend(acc_id for acc_id in account_ids if acc_id not in reported)
+        return merged
+
+    def presign(self, snapshot, account_ids: List[int], order_amount_usd: Optional[float] = None):
+        """通知各分片预签名（不等待结果）"""
+        for index, ids in self._group_by_shard(account_ids).items():
+            payload = {'snapshot': snapshot, 'account_ids': ids, 'order_amount_usd': order_amount_usd}
+            self._command_queues[index].put((None, 'presign', payload))
+
+    def collect_stats(self, timeout: float = 10) -> Dict[int, Dict]:
+        """取出各分片内账号的统计增量"""
+        deltas: Dict[int, Dict] = {}
+        for result in self._broadcast('stats', timeout=timeout):
+            deltas.update(result.get('stats', {}))
+        return deltas
+
+    def reconcile_positions(self):
+        """通知各分片对账本地持仓簿（不等待结果）"""
+        for queue in self._command_queues:
+            queue.put((None, 'reconcile', {}))
+
+    def check_balances(self, account_ids: List[int], required: float, timeout: float = 60) -> Dict[int, Optional[tuple]]:
+        """各分片并发检查账号余额与授权"""
+        targets = {
+            index: {'account_ids': ids, 'required': required}
+            for index, ids in self._group_by_shard(account_ids).items()
+        }
+        balances: Dict[int, Optional[tuple]] = {}
+        for result in self._call(targets, 'balances', timeout):
+            balances.update(result.get('balances', {}))
+        return balances
+
+    def redeem_all(self, timeout: float = 60) -> Dict:
+        results = self._broadcast('redeem', timeout=timeout)
+        return {
+            'success_count': sum(r.get('success_count', 0) for r in results),
+            'fail_count': sum(r.get('fail_count', 0) for r in results)
+        }
+
+    def collect_positions(self, timeout: float = 60) -> Dict[int, List[Dict]]:
+        """各分片并发获取其账号的持仓"""
+        positions: Dict[int, List[Dict]] = {}
+        for result in self._broadcast('positions', timeout=timeout):
+            positions.update(result.get('positions', {}))
+        return positions
+
+    def sell_planned(self, plan: Dict[int, List[Dict]], timeout: float = 60) -> Dict:
+        """按出售计划，每个分片一条消息并发出售其账号的持仓"""
+        targets: Dict[int, Dict] = {}
+        for index, ids in self._group_by_shard(list(plan)).items():
+            targets[index] = {'plan': {acc_id: plan[acc_id] for acc_id in ids}}
+        results = self._call(targets, 'sell_plan', timeout)
+        account_results = []
+        for r in results:
+            account_results.extend(r.get('account_results', []))
+        total_sold = sum(r.get('sold_count', 0) for r in results)
+        total_failed = sum(r.get('failed_count', 0) for r in results)
+        resting_size = round(sum(r.get('resting_size', 0.0) for r in results), 6)
+        return {
+            'success': total_sold > 0,
+            'sold_count': total_sold,
+            'failed_count': total_failed,
+            'resting_size': resting_size,
+            'account_count': len(self._accounts),
+            'account_results': account_results,
+            'message': f"并发出售完成: 总成功 {total_sold}, 总失败 {total_failed}, 账号数 {len(self._accounts)}, "
+                       f"挂单未成交 {resting_size}"
+        }
+
+    # ========== 健康检查 ==========
+
+    def ensure_alive(self) -> List[int]:
+        """重启已退出的分片并重放其账号，返回被重启的分片序号"""
+        restarted = []
+        for index, worker in enumerate(self._workers):
+            if worker is not None and worker.is_alive():
+                continue
+            self._restarts[index] += 1
+            self._spawn(index)
+            for account_id, account in list(self._accounts.items()):
+                if self.shard_for(account_id) == index:
+                    self._command_queues[index].put((None, 'start', {'account': account}))
+            restarted.append(index)
+        return restarted
+
+    def status(self, timeout: float = 5) -> List[Dict]:
+        results = {r.get('shard'): r for r in self._broadcast('status', timeout=timeout)}
+        shards = []
+        for index, worker in enumerate(self._workers):
+            entry = {
+                'shard': index,
+                'alive': bool(worker and worker.is_alive()),
+                'pid': worker.pid if worker else None,
+                'restarts': self._restarts[index]
+            }
+            entry.update(results.get(index, {}))
+            shards.append(entry)
+        return shards
+
+    def shutdown(self):
+        for command_queue in self._command_queues:
+            try:
+                command_queue.put((None, 'shutdown', None))
+            except Exception:
+                pass
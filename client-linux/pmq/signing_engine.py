@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""多进程订单签名引擎（绕开GIL，签名吞吐随CPU核数扩展）
+
+下单线程只提交订单参数，签名在进程池中完成后返回 SignedOrder，
+再由原线程调用 post_order 提交。每个工作进程按私钥缓存签名对象和
+EIP-712 域数据（exchange 合约地址 + chain_id），同一账号只初始化一次。
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+# ========== 工作进程侧 ==========
+
+# 工作进程内缓存: (private_key, signature_type, funder) -> py_clob_client OrderBuilder
+_worker_builders: Dict = {}
+# 工作进程内缓存: (private_key, neg_risk) -> py_order_utils OrderBuilder（含 EIP-712 域分隔符）
+_worker_utils_builders: Dict = {}
+_worker_chain_id: Optional[int] = None
+
+
+def _init_worker(chain_id: int):
+    global _worker_chain_id
+    _worker_chain_id = chain_id
+
+
+def _get_builder(private_key: str, signature_type: int, funder: Optional[str]):
+    key = (private_key, signature_type, funder)
+    builder = _worker_builders.get(key)
+    if builder is None:
+        from py_clob_client.signer import Signer
+        from py_clob_client.order_builder.builder import OrderBuilder
+        builder = OrderBuilder(Signer(private_key, _worker_chain_id), sig_type=signature_type, funder=funder)
+        _worker_builders[key] = builder
+    return builder
+
+
+def _get_utils_builder(private_key: str, neg_risk: bool):
+    key = (private_key, bool(neg_risk))
+    utils_builder = _worker_utils_builders.get(key)
+    if utils_builder is None:
+        from py_clob_client.config import get_contract_config
+        from py_order_utils.builders import OrderBuilder as UtilsOrderBuilder
+        from py_order_utils.signer import Signer as UtilsSigner
+        contract_config = get_contract_config(_worker_chain_id, bool(neg_risk))
+        utils_builder = UtilsOrderBuilder(contract_config.exchange, _worker_chain_id, UtilsSigner(key=private_key))
+        _worker_utils_builders[key] = utils_builder
+    return utils_builder
+
+
+def _sign_order(private_key: str, signature_type: int, funder: Optional[str], token_id: str,
+                price: float, size: float, side: str, tick_size: str, neg_risk: bool,
+                fee_rate_bps: int = 0):
+    """在工作进程中构建并签名订单"""
+    from py_clob_client.clob_types import OrderArgs, CreateOrderOptions
+    from py_clob_client.order_builder.builder import ROUNDING_CONFIG
+
+    builder = _get_builder(private_key, signature_type, funder)
+    order_args = OrderArgs(token_id=token_id, price=price, size=size, side=side, fee_rate_bps=fee_rate_bps)
+    try:
+        # 复用缓存的 EIP-712 域数据，只计算订单哈希与签名
+        from py_order_utils.model import OrderData
+        side_value, maker_amount, taker_amount = builder.get_order_amounts(
+            order_args.side, order_args.size, order_args.price, ROUNDING_CONFIG[tick_size]
+        )
+        data = OrderData(
+            maker=builder.funder,
+            taker=order_args.taker,
+            tokenId=order_args.token_id,
+            makerAmount=str(maker_amount),
+            takerAmount=str(taker_amount),
+            side=side_value,
+            feeRateBps=str(order_args.fee_rate_bps),
+            nonce=str(order_args.nonce),
+            signer=builder.signer.address(),
+            expiration=str(order_args.expiration),
+            signatureType=builder.sig_type,
+        )
+        return _get_utils_builder(private_key, neg_risk).build_signed_order(data)
+    except (ImportError, AttributeError):
+        # py_order_utils / py_clob_client 内部结构变化时回退到 py_clob_client 的标准实现
+        return builder.create_order(order_args, CreateOrderOptions(tick_size=tick_size, neg_risk=neg_risk))
+
+
+# ========== 调用方侧 ==========
+
+class SigningEngine:
+    """进程池签名服务（线程安全，可被多个下单线程同时调用）"""
+
+    def __init__(self, processes: int, chain_id: int):
+        self.processes = max(1, int(processes))
+        self.chain_id = chain_id
+        # 调度进程内有多个线程，使用 spawn 避免 fork 后继承锁状态。
+        # spawn 子进程会以 __mp_main__ 重新导入启动脚本（run.py），因此启动脚本及其导入的模块
+        # 不能在导入时产生副作用：调度器只能在 if __name__ == '__main__' 下通过 app.init() 创建
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(chain_id,)
+        )
+
+    def sign(self, private_key: str, signature_type: int, funder: Optional[str], token_id: str,
+             price: float, size: float, side: str, tick_size: str = "0.01", neg_risk: bool = False,
+             fee_rate_bps: int = 0, timeout: Optional[float] = 10):
+        """提交签名任务并等待结果（等待期间释放GIL），返回 SignedOrder"""
+        future = self._executor.submit(
+            _sign_order, private_key, signature_type, funder, token_id,
+            price, size, side, tick_size, neg_risk, fee_rate_bps
+        )
+        return future.result(timeout=timeout)
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""策略配置档（按账号或账号分组分配）
+
+每个配置档包含一组策略参数（阈值/时间窗口/下单金额），未设置的参数沿用全局
+strategy_config。账号的配置档按 账号指定 > 分组指定 > 默认 的顺序确定。
+调度线程每轮只扫描一次市场，所有配置档都基于同一份市场快照判断，
+新增策略不会增加行情请求。
+"""
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_PROFILE = 'default'
+# 可按配置档覆盖的策略参数
+PROFILE_FIELDS = ('order_amount_usd', 'price_percentage_threshold', 'check_time_window_minutes')
+
+
+class StrategyProfiles:
+    """策略配置档与账号/分组分配"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 配置档JSON文件路径；为None时不持久化
+        """
+        self.path = path
+        # 写操作在锁内构造新字典，保存成功后再整体替换（写时复制），读取方在锁内取引用即得一致快照
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, Dict] = {}
+        self._account_assignments: Dict[int, str] = {}
+        self._group_assignments: Dict[str, str] = {}
+        self._account_groups: Dict[int, str] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:
+            return
+        self._profiles = data.get('profiles', {})
+        self._account_assignments = {int(k): v for k, v in data.get('accounts', {}).items()}
+        self._group_assignments = data.get('groups', {})
+
+    def _save(self, profiles: Dict[str, Dict], accounts: Dict[int, str], groups: Dict[str, str]):
+        """原子写入（临时文件 + fsync + 替换），失败时抛出异常，调用方不替换内存中的数据"""
+        if not self.path:
+            return
+        data = {
+            'profiles': profiles,
+            'accounts': {str(k): v for k, v in accounts.items()},
+            'groups': groups
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _commit(self, profiles: Dict[str, Dict], accounts: Dict[int, str], groups: Dict[str, str]) -> Optional[str]:
+        """保存并替换内存中的数据（需持有 self._lock），返回错误信息"""
+        try:
+            self._save(profiles, accounts, groups)
+        except Exception as e:
+            return f'保存配置档失败: {e}'
+        self._profiles = profiles
+        self._account_assignments = accounts
+        self._group_assignments = groups
+        return None
+
+    def _snapshot(self):
+        """当前数据的一致快照（各字典发布后不再修改，只需在锁内取引用）"""
+        with self._lock:
+            return self._profiles, self._account_assignments, self._group_assignments, self._account_groups
+
+    # ========== 配置档 ==========
+
+    def upsert(self, name: str, params: Dict) -> Dict:
+        """新建或更新配置档（只保留可覆盖的策略参数）"""
+        if not name or name == DEFAULT_PROFILE:
+            return {'success': False, 'message': '默认配置档请通过 /api/strategy/config 修改'}
+        overrides = {}
+        for field in PROFILE_FIELDS:
+            if field in params and params[field] is not None:
+                try:
+                    overrides[field] = float(params[field])
+                except (TypeError, ValueError):
+                    return {'success': False, 'message': f'参数无效: {field}'}
+        with self._lock:
+            profiles = dict(self._profiles)
+            profiles[name] = {**profiles.get(name, {}), **overrides}
+            error = self._commit(profiles, self._account_assignments, self._group_assignments)
+        if error:
+            return {'success': False, 'message': error}
+        return {'success': True, 'message': f'配置档 {name} 已保存'}
+
+    def delete(self, name: str) -> Dict:
+        """删除配置档，分配到该配置档的账号/分组回到默认配置档"""
+        with self._lock:
+            if name not in self._profiles:
+                return {'success': False, 'message': '配置档不存在'}
+            profiles = {k: v for k, v in self._profiles.items() if k != name}
+            accounts = {k: v for k, v in self._account_assignments.items() if v != name}
+            groups = {k: v for k, v in self._group_assignments.items() if v != name}
+            error = self._commit(profiles, accounts, groups)
+        if error:
+            return {'success': False, 'message': error}
+        return {'success': True, 'message': f'配置档 {name} 已删除'}
+
+    def assign(self, name: str, account_ids: Iterable[int] = (), groups: Iterable[str] = ()) -> Dict:
+        """将账号/分组分配到配置档（name 为 default 时取消分配）"""
+        with self._lock:
+            if name != DEFAULT_PROFILE and name not in self._profiles:
+                return {'success': False, 'message': '配置档不存在'}
+            accounts = dict(self._account_assignments)
+            group_assignments = dict(self._group_assignments)
+            for account_id in account_ids:
+                if name == DEFAULT_PROFILE:
+                    accounts.pop(int(account_id), None)
+                else:
+                    accounts[int(account_id)] = name
+            for group in groups:
+                if name == DEFAULT_PROFILE:
+                    group_assignments.pop(group, None)
+                else:
+                    group_assignments[group] = name
+            error = self._commit(self._profiles, accounts, group_assignments)
+        if error:
+            return {'success': False, 'message': error}
+        return {'success': True, 'message': f'已分配到配置档 {name}'}
+
+    def set_account_group(self, account_id: int, group: Optional[str]):
+        """记录账号所属分组（启动账号或修改账号信息时更新）"""
+        with self._lock:
+            account_groups = dict(self._account_groups)
+            if group:
+                account_groups[account_id] = group
+            else:
+                account_groups.pop(account_id, None)
+            self._account_groups = account_groups
+
+    # ========== 解析 ==========
+
+    @staticmethod
+    def _profile_in(snapshot, account_id: int) -> str:
+        _, accounts, groups, account_groups = snapshot
+        name = accounts.get(account_id)
+        if name is None:
+            group = account_groups.get(account_id)
+            name = groups.get(group) if group else None
+        return name or DEFAULT_PROFILE
+
+    def profile_of(self, account_id: int) -> str:
+        return self._profile_in(self._snapshot(), account_id)
+
+    def resolve(self, name: str, base_config: Dict) -> Dict:
+        """配置档的完整策略参数（全局配置 + 配置档覆盖项）"""
+        profiles = self._snapshot()[0]
+        config = dict(base_config)
+        config.update(profiles.get(name, {}))
+        return config
+
+    def partition(self, account_ids: Iterable[int]) -> Dict[str, List[int]]:
+        """按配置档对账号分组（整轮使用同一份快照）"""
+        snapshot = self._snapshot()
+        groups: Dict[str, List[int]] = {}
+        for account_id in account_ids:
+            groups.setdefault(self._profile_in(snapshot, account_id), []).append(account_id)
+        return groups
+
+    def active_configs(self, account_ids: Iterable[int], base_config: Dict) -> Dict[str, Dict]:
+        """当前有账号使用的配置档及其完整参数"""
+        snapshot = self._snapshot()
+        names = {self._profile_in(snapshot, account_id) for account_id in account_ids}
+        return {name: {**base_config, **snapshot[0].get(name, {})} for name in names}
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'profiles': {name: dict(params) for name, params in self._profiles.items()},
+                'accounts': dict(self._account_assignments),
+                'groups': dict(self._group_assignments)
+            }
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""bot 注册表压力测试：下发过程中并发启动/停止账号
+
+用法:
+    python stress_bot_registry.py [秒数] [账号数]
+
+若干线程反复调用 start_account / stop_account，同时若干线程循环调用 _dispatch_orders
+遍历注册表快照下单。账号使用本地假 bot（不访问网络、不提交订单），检查：
+- 下发与启动/停止过程中没有任何异常（KeyError / dictionary changed size 等）
+- stop_account 返回之后，被停止的 bot 不再收到订单
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import task_scheduler
+from account_stats import AccountStats
+from clock_sync import exchange_now
+from market_snapshot import MarketSnapshot
+
+CHURN_THREADS = 4
+DISPATCH_THREADS = 2
+PROXIES = ['http://127.0.0.1:8001', 'http://127.0.0.1:8002', None]
+
+
+class FakeBot:
+    """替代 TradingBot：记录下单，不访问网络"""
+
+    orders = []
+    errors = []
+    _lock = threading.Lock()
+
+    def __init__(self, account, proxy_ip=None):
+        self.account_id = account['id']
+        self.proxy_ip = proxy_ip
+        self.signing_engine = None
+        self.last_post_latency = 0.001
+        self.stats = AccountStats()
+        # stop_account 返回的时间（由压测线程设置）
+        self.stopped_at = None
+
+    def place_buy_order(self, order_info, strategy_config, **kwargs):
+        with FakeBot._lock:
+            FakeBot.orders.append((self, time.time()))
+        time.sleep(random.uniform(0, 0.002))
+        return {'success': True, 'orderID': 'fake'}
+
+    def export_api_creds(self):
+        return None
+
+    def _log_status(self, message):
+        pass
+
+    def _log_error(self, message):
+        with FakeBot._lock:
+            FakeBot.errors.append(f"账号{self.account_id}: {message}")
+
+
+class FakeAccountManager:
+    def __init__(self, count: int):
+        self.accounts = {
+            i: {'id': i, 'name': f'账号{i}', 'private_key': f'0x{i:064x}', 'status': 'active',
+                'proxy_ip': PROXIES[i % len(PROXIES)]}
+            for i in range(1, count + 1)
+        }
+
+    def get_account(self, account_id):
+        return self.accounts.get(account_id)
+
+    def apply_stats(self, deltas):
+        pass
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+
+    task_scheduler.TradingBot = FakeBot
+    scheduler = task_scheduler.TaskScheduler(
+        FakeAccountManager(count), shard_processes=0, signing_processes=0, persistent=False
+    )
+    # 去重记录会让同一市场只下一次单，压测中每轮使用新的市场
+    snapshot_ids = iter(range(1, 10 ** 9))
+    stop_at = time.time() + duration
+    failures = []
+    counters = {'starts': 0, 'stops': 0, 'dispatches': 0}
+    counter_lock = threading.Lock()
+
+    def churn():
+        while time.time() < stop_at:
+            account_id = random.randint(1, count)
+            try:
+                if random.random() < 0.5:
+                    scheduler.start_account(account_id)
+                    key = 'starts'
+                else:
+                    bot = scheduler.bots.get(account_id)
+                    result = scheduler.stop_account(account_id)
+                    if bot is not None and result.get('success'):
+                        bot.stopped_at = time.time()
+                    key = 'stops'
+                with counter_lock:
+                    counters[key] += 1
+            except Exception as e:
+                failures.append(f"启动/停止异常: {e!r}")
+
+    def dispatch():
+        while time.time() < stop_at:
+            snapshot = MarketSnapshot(next(snapshot_ids), '压测市场', '1', '2', exchange_now() + 3600)
+            snapshot.yes_ask = snapshot.no_ask = 0.5
+            order_info = snapshot.build_order_info('UP', 2.0)
+            try:
+                scheduler._dispatch_orders(snapshot, order_info, '涨', scheduler._running_account_ids())
+                with counter_lock:
+                    counters['dispatches'] += 1
+            except Exception as e:
+                failures.append(f"下发异常: {e!r}")
+
+    threads = [threading.Thread(target=churn) for _ in range(CHURN_THREADS)]
+    threads += [threading.Thread(target=dispatch) for _ in range(DISPATCH_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    late = [(bot.account_id, ts - bot.stopped_at) for bot, ts in FakeBot.orders
+            if bot.stopped_at is not None and ts > bot.stopped_at]
+
+    print("=" * 50)
+    print(f"压测 {duration:.0f}s: 账号 {count}, 启动 {counters['starts']}, 停止 {counters['stops']}, "
+          f"下发 {counters['dispatches']} 轮, 订单 {len(FakeBot.orders)}")
+    print("=" * 50)
+    for message in (failures + FakeBot.errors)[:10]:
+        print(f"✗ {message}")
+    for account_id, delay in late[:10]:
+        print(f"✗ 账号{account_id} 停止 {delay * 1000:.1f}ms 后仍收到订单")
+
+    assert not failures, f"{len(failures)} 次异常"
+    assert not FakeBot.errors, f"{len(FakeBot.errors)} 次下单异常"
+    assert not late, f"{len(late)} 笔订单发给了已停止的账号"
+    print("✓ 没有异常，已停止的账号没有收到订单")
+
+
+if __name__ == '__main__':
+    main()
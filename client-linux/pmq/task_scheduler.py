@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """任务调度器"""
+import hashlib
+import multiprocessing
 import threading
 import time
 from datetime import datetime
@@ -9,24 +11,146 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 try:
     from .account_manager import AccountManager
     from .trading_bot import TradingBot
+    from .bot_registry import BotRegistry
+    from .market_snapshot import MarketSnapshot
+    from .clock_sync import exchange_clock, exchange_now
+    from .market_data_client import market_data_client
+    from .price_board import price_board
+    from .market_params import market_params
+    from .positions_cache import positions_cache
+    from .order_ledger import order_ledger
+    from .executor_pools import BulkheadPool, DeadlineExpired
+    from .dispatch_planner import DispatchPlanner
+    from .liquidation_planner import LiquidationPlanner
+    from .presign_cache import PresignedOrderCache
+    from .signing_engine import SigningEngine
+    from .shard_pool import ShardPool
+    from .redeem_worker import RedeemWorker
+    from .balance_refresher import BalanceRefresher
+    from .strategy_profiles import StrategyProfiles, DEFAULT_PROFILE
+    from .order_dedupe_store import OrderDedupeStore
+    from .scheduler_state import SchedulerStateStore
+    from .account_bitmap import AccountStateTable, FLAG_RUNNING, FLAG_PAUSED, FLAG_CIRCUIT_OPEN, FLAG_UNDERFUNDED, FLAG_INFLIGHT
+    from .account_stats import merge_stats
+    from .config import (
+        CHAIN_ID, ORDER_DEDUPE_DB, STRATEGY_PROFILES_FILE, SCHEDULER_STATE_FILE, SIGNING_PROCESSES, SHARD_PROCESSES,
+        ORDER_POOL_MIN_WORKERS, ORDER_POOL_MAX_WORKERS, ORDER_POST_LATENCY_TARGET,
+        READ_POOL_WORKERS, REDEEM_POOL_WORKERS, SELL_POOL_WORKERS, PRESIGN_POOL_WORKERS, PRESIGN_SIZE_TOLERANCE,
+        CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_SECONDS, PROXY_MAX_INFLIGHT_ORDERS,
+        BALANCE_CHECK_TTL, BALANCE_CHECK_INTERVAL, ORDER_DISPATCH_TIMEOUT, ORDER_CUTOFF_BEFORE_END,
+        SCHEDULER_STATE_INTERVAL, STATE_RESTORE_WORKERS, MARKET_DATA_MAX_AGE, POSITION_RECONCILE_INTERVAL,
+        ACCOUNT_STATS_INTERVAL
+    )
 except ImportError:
     from account_manager import AccountManager
     from trading_bot import TradingBot
+    from bot_registry import BotRegistry
+    from market_snapshot import MarketSnapshot
+    from clock_sync import exchange_clock, exchange_now
+    from market_data_client import market_data_client
+    from price_board import price_board
+    from market_params import market_params
+    from positions_cache import positions_cache
+    from order_ledger import order_ledger
+    from executor_pools import BulkheadPool, DeadlineExpired
+    from dispatch_planner import DispatchPlanner
+    from liquidation_planner import LiquidationPlanner
+    from presign_cache import PresignedOrderCache
+    from signing_engine import SigningEngine
+    from shard_pool import ShardPool
+    from redeem_worker import RedeemWorker
+    from balance_refresher import BalanceRefresher
+    from strategy_profiles import StrategyProfiles, DEFAULT_PROFILE
+    from order_dedupe_store import OrderDedupeStore
+    from scheduler_state import SchedulerStateStore
+    from account_bitmap import AccountStateTable, FLAG_RUNNING, FLAG_PAUSED, FLAG_CIRCUIT_OPEN, FLAG_UNDERFUNDED, FLAG_INFLIGHT
+    from account_stats import merge_stats
+    from config import (
+        CHAIN_ID, ORDER_DEDUPE_DB, STRATEGY_PROFILES_FILE, SCHEDULER_STATE_FILE, SIGNING_PROCESSES, SHARD_PROCESSES,
+        ORDER_POOL_MIN_WORKERS, ORDER_POOL_MAX_WORKERS, ORDER_POST_LATENCY_TARGET,
+        READ_POOL_WORKERS, REDEEM_POOL_WORKERS, SELL_POOL_WORKERS, PRESIGN_POOL_WORKERS, PRESIGN_SIZE_TOLERANCE,
+        CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_SECONDS, PROXY_MAX_INFLIGHT_ORDERS,
+        BALANCE_CHECK_TTL, BALANCE_CHECK_INTERVAL, ORDER_DISPATCH_TIMEOUT, ORDER_CUTOFF_BEFORE_END,
+        SCHEDULER_STATE_INTERVAL, STATE_RESTORE_WORKERS, MARKET_DATA_MAX_AGE, POSITION_RECONCILE_INTERVAL,
+        ACCOUNT_STATS_INTERVAL
+    )
 
 class TaskScheduler:
     """任务调度器（管理多个账号的监控任务）"""
     
-    def __init__(self, account_manager: AccountManager):
+    def __init__(self, account_manager: Optional[AccountManager], shard_processes: Optional[int] = None,
+                 signing_processes: Optional[int] = None, persistent: bool = True):
+        """
+        Args:
+            account_manager: 账号管理器（分片工作进程内为None）
+            shard_processes: 账号分片进程数，默认取 SHARD_PROCESSES；0 表示所有账号在本进程运行
+            signing_processes: 签名进程数，默认取 SIGNING_PROCESSES
+            persistent: 是否持久化调度状态（去重记录等）；分片工作进程由协调者负责去重，传False
+        """
+        if persistent and multiprocessing.parent_process() is not None:
+            # 签名/分片子进程（spawn）会重新导入启动脚本；在子进程里再建一个持久化调度器
+            # 会重复恢复状态、重复下单，直接拒绝
+            raise RuntimeError("持久化调度器只能在主进程创建，请在 if __name__ == '__main__' 下调用 app.init()")
         self.account_manager = account_manager
-        self.bots: Dict[int, TradingBot] = {}  # account_id -> TradingBot
+        # account_id -> TradingBot（写时复制：请求线程增删账号时，扫描/下单线程无锁读取一致快照）
+        self.bots = BotRegistry()
         self.scanner_thread: Optional[threading.Thread] = None  # 单一调度线程
         self.running = False  # 调度线程状态
-        # 记录每个市场为哪些账号已经下过单，避免重复: {market_id(str): set(account_id)}
-        self.ordered_markets: Dict[str, set] = {}
-        # 线程锁，保护 ordered_markets 的并发访问
-        self._order_lock = threading.Lock()
-        # 线程池配置：并发下单的最大线程数
-        self.max_workers = 10  # 可调整：50-200 之间，根据实际情况调整
+        # 记录每个市场为哪些账号已经下过单，避免重复（持久化，按市场结束时间过期，重启后立即恢复）
+        self.order_store = OrderDedupeStore(ORDER_DEDUPE_DB if persistent else None)
+        # 账号状态位图（运行/资金不足/熔断/暂停/已下单），可下单账号由一次按位运算得出
+        self.account_state = AccountStateTable(
+            circuit_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            circuit_cooldown=CIRCUIT_COOLDOWN_SECONDS,
+            ordered_loader=self.order_store.accounts_for
+        )
+        # 常驻线程池（舱壁隔离）：下单池并发上限根据下单延迟在 [min, max] 内自动调整
+        self.order_pool = BulkheadPool(
+            'order', ORDER_POOL_MAX_WORKERS,
+            min_workers=ORDER_POOL_MIN_WORKERS,
+            latency_target=ORDER_POST_LATENCY_TARGET
+        )
+        # 下发规划：按账号下单延迟从慢到快提交，并限制每个代理的在途订单数
+        self.dispatch_planner = DispatchPlanner(PROXY_MAX_INFLIGHT_ORDERS)
+        # 出售全部持仓时的跨账号出售计划（每个 token 只拉取一次订单簿）
+        self.liquidation_planner = LiquidationPlanner()
+        self.read_pool = BulkheadPool('read', READ_POOL_WORKERS)
+        self.redeem_pool = BulkheadPool('redeem', REDEEM_POOL_WORKERS)
+        # 各账号逐 token 的卖单（账号级出售任务在索取池中执行并等待这些卖单，不能共用同一个池）
+        self.sell_pool = BulkheadPool('sell', SELL_POOL_WORKERS)
+        # 预签名：检查窗口内提前为两侧签好买单，触发时只需 post_order
+        self.presign_pool = BulkheadPool('presign', PRESIGN_POOL_WORKERS)
+        self.presign_cache = PresignedOrderCache(size_tolerance=PRESIGN_SIZE_TOLERANCE)
+        # 多进程签名引擎（SIGNING_PROCESSES > 0 时启用，签名不再受GIL限制）
+        if signing_processes is None:
+            signing_processes = SIGNING_PROCESSES
+        self.signing_engine: Optional[SigningEngine] = None
+        if signing_processes > 0:
+            self.signing_engine = SigningEngine(signing_processes, CHAIN_ID)
+        # 分片模式：本进程只做扫描与触发，账号在分片进程中签名/下单（首次启动账号时才拉起进程）
+        self.shard_processes = SHARD_PROCESSES if shard_processes is None else shard_processes
+        self.shard_pool: Optional[ShardPool] = None
+        # 分片模式下用于拉取市场数据的只读bot（不含私钥）
+        self._scan_bot: Optional[TradingBot] = None
+        # 当前是否有市场处于检查窗口（由扫描循环每轮更新，后台索取据此暂停）
+        self.window_active = False
+        self.redeem_worker = RedeemWorker(
+            redeem_fn=self._redeem_all_accounts_concurrent,
+            interval_fn=lambda: self.strategy_config['redeem_interval'],
+            paused_fn=lambda: self.window_active,
+            log_fn=self._log_global
+        )
+        # 后台余额/授权预检查：余额或授权不足的账号标记为资金不足，下发时跳过
+        self.balance_refresher = BalanceRefresher(
+            check_fn=self._check_balances,
+            accounts_fn=self._running_account_ids,
+            required_fn=lambda acc_id: self.get_account_strategy(acc_id)['order_amount_usd'],
+            on_update=self._on_balance_update,
+            paused_fn=lambda: self.window_active,
+            log_fn=self._log_global,
+            ttl=BALANCE_CHECK_TTL,
+            interval=BALANCE_CHECK_INTERVAL
+        )
         self.strategy_config = {
             'order_amount_usd': 2.0,
             'price_percentage_threshold': 0.85,
@@ -34,10 +158,97 @@ class TaskScheduler:
             'monitor_interval': 3,
             'redeem_interval': 30 * 60  # 30分钟
         }
+        # 策略配置档：按账号/分组覆盖阈值、时间窗口与下单金额，未分配的账号使用上面的全局配置
+        self.strategy_profiles = StrategyProfiles(STRATEGY_PROFILES_FILE if persistent else None)
+        # 调度状态快照（运行账号/策略配置/索取时间/API凭证/市场数据），启动时热恢复
+        self.state_store = SchedulerStateStore(SCHEDULER_STATE_FILE if persistent else None)
+        # account_id -> 已派生的L2 API凭证（附私钥指纹，私钥变更后不再复用）
+        self._api_creds: Dict[int, Dict] = {}
+        # 最近发现的市场（slug -> 市场数据），市场列表拉取失败时作为后备
+        self._market_cache: Dict[str, Dict] = {}
+        self._restoring = False
+        self._last_state_save = 0.0
+        self._last_position_reconcile = 0.0
+        self._last_stats_flush = 0.0
+        # 已取出但尚未写入账号数据的统计增量（写入失败时保留，下次一并写入）
+        self._stats_lock = threading.Lock()
+        self._unsaved_stats: Dict[int, Dict] = {}
     
     def set_strategy_config(self, config: Dict):
         """设置策略配置"""
         self.strategy_config.update(config)
+        if self.shard_pool:
+            self.shard_pool.set_strategy_config(config)
+        if 'order_amount_usd' in config:
+            # 下单金额变化：用缓存的余额重新判定资金不足标记
+            self.balance_refresher.reevaluate()
+        self._save_state()
+    
+    def get_account_strategy(self, account_id: int) -> Dict:
+        """账号实际使用的策略参数（全局配置 + 所属配置档覆盖项）"""
+        return self.strategy_profiles.resolve(self.strategy_profiles.profile_of(account_id), self.strategy_config)
+    
+    def get_strategy_profiles(self) -> Dict:
+        data = self.strategy_profiles.to_dict()
+        data['default'] = dict(self.strategy_config)
+        return data
+    
+    def save_strategy_profile(self, name: str, params: Dict) -> Dict:
+        result = self.strategy_profiles.upsert(name, params)
+        self.balance_refresher.reevaluate()
+        return result
+    
+    def delete_strategy_profile(self, name: str) -> Dict:
+        result = self.strategy_profiles.delete(name)
+        self.balance_refresher.reevaluate()
+        return result
+    
+    def assign_strategy_profile(self, name: str, account_ids: List[int], groups: List[str]) -> Dict:
+        result = self.strategy_profiles.assign(name, account_ids, groups)
+        self.balance_refresher.reevaluate()
+        return result
+    
+    def set_account_group(self, account_id: int, group: Optional[str]):
+        """账号分组变化（决定按分组分配的配置档）"""
+        self.strategy_profiles.set_account_group(account_id, group)
+        self.balance_refresher.reevaluate()
+    
+    @property
+    def sharded(self) -> bool:
+        return self.shard_processes > 0
+    
+    def _get_shard_pool(self) -> ShardPool:
+        if self.shard_pool is None:
+            self.shard_pool = ShardPool(self.shard_processes, self.strategy_config)
+        return self.shard_pool
+    
+    def _running_account_ids(self) -> List[int]:
+        """所有运行中的账号（分片模式下由协调者记录）"""
+        if self.sharded:
+            return self.shard_pool.account_ids() if self.shard_pool else []
+        return list(self.bots.snapshot().keys())
+    
+    def _get_scan_bot(self) -> Optional[TradingBot]:
+        """选择一个bot用于拉取市场数据（仅数据源/输出，不下单）"""
+        if self.sharded:
+            if self._scan_bot is None:
+                self._scan_bot = TradingBot({'id': 0, 'name': '调度'})
+            return self._scan_bot
+        return next(iter(self.bots.snapshot().values()), None)
+    
+    def add_bot(self, account: Dict) -> Dict:
+        """在本进程创建交易机器人（冷启动，不启动监控线程）"""
+        account_id = account.get('id')
+        if account_id in self.bots:
+            return {'success': True, 'message': '账号已启动'}
+        bot = TradingBot(self._with_cached_creds(account), proxy_ip=account.get('proxy_ip'))
+        bot.signing_engine = self.signing_engine
+        bot.sell_pool = self.sell_pool
+        if not self.bots.add(account_id, bot):
+            return {'success': True, 'message': '账号已启动'}
+        self._remember_creds(account, bot.export_api_creds())
+        self.account_state.set_flag(FLAG_RUNNING, account_id, True)
+        return {'success': True, 'message': '账号冷启动成功（等待手动下单或自动监控启动）'}
     
     def start_account(self, account_id: int) -> Dict:
         """冷启动账号（只创建bot，不启动监控线程）"""
@@ -48,24 +259,55 @@ class TaskScheduler:
         if account.get('status') != 'active':
             return {'success': False, 'message': '账号未激活'}
         
+        self.strategy_profiles.set_account_group(account_id, account.get('group'))
+        
         # 如果已经启动，直接返回
-        if account_id in self.bots:
+        if account_id in self._running_account_ids():
             return {'success': True, 'message': '账号已启动'}
         
-        # 创建交易机器人（冷启动，不启动监控线程）
-        bot = TradingBot(account, proxy_ip=account.get('proxy_ip'))
-        self.bots[account_id] = bot
+        # 分片模式：交给账号所在的分片进程创建bot
+        if self.sharded:
+            result = self._get_shard_pool().start_account(self._with_cached_creds(account))
+            if result.get('success'):
+                self.account_state.set_flag(FLAG_RUNNING, account_id, True)
+                self._remember_creds(account, self.shard_pool.api_creds_of(account_id))
+                self._save_state()
+            return result
         
-        return {'success': True, 'message': '账号冷启动成功（等待手动下单或自动监控启动）'}
+        # 创建交易机器人（冷启动，不启动监控线程）
+        result = self.add_bot(account)
+        self._save_state()
+        return result
+    
+    @staticmethod
+    def _key_id(account: Dict) -> str:
+        return hashlib.sha256(account.get('private_key', '').encode()).hexdigest()[:16]
+    
+    def _with_cached_creds(self, account: Dict) -> Dict:
+        """附加已缓存的API凭证（私钥未变更时），创建bot时跳过重新派生"""
+        cached = self._api_creds.get(account.get('id'))
+        if not cached or cached.get('key_id') != self._key_id(account):
+            return account
+        return dict(account, api_creds=cached)
+    
+    def _remember_creds(self, account: Dict, creds: Optional[Dict]):
+        if creds:
+            self._api_creds[account.get('id')] = dict(creds, key_id=self._key_id(account))
+    
+    def get_api_creds(self, account_id: int) -> Optional[Dict]:
+        """本进程bot已派生的API凭证（分片进程启动账号后回传给协调者）"""
+        bot = self.bots.get(account_id)
+        return bot.export_api_creds() if bot else None
     
     def start_auto_monitoring(self) -> Dict:
         """启动自动监控（为所有已启动的账号开始自动运行）"""
-        if not self.bots:
+        account_count = len(self._running_account_ids())
+        if not account_count:
             return {'success': False, 'message': '没有已启动的账号'}
         
         # 如果监控线程已经在运行，直接返回
         if self.running and self.scanner_thread and self.scanner_thread.is_alive():
-            return {'success': True, 'message': f'自动监控已在运行（{len(self.bots)}个账号）'}
+            return {'success': True, 'message': f'自动监控已在运行（{account_count}个账号）'}
         
         # 启动调度线程（单线程统一扫描/下发）
         self.running = True
@@ -74,57 +316,160 @@ class TaskScheduler:
             daemon=True
         )
         self.scanner_thread.start()
+        # 自动索取与余额预检查在独立后台线程执行，不阻塞扫描
+        self.redeem_worker.start()
+        self.balance_refresher.start()
+        # 后台定期校准交易所时间（时间窗口与剩余时间按校正后的时间计算）
+        exchange_clock.start()
+        self._save_state()
         
-        return {'success': True, 'message': f'自动监控已启动（{len(self.bots)}个账号）'}
+        return {'success': True, 'message': f'自动监控已启动（{account_count}个账号）'}
     
     def stop_account(self, account_id: int) -> Dict:
         """停止账号的监控任务"""
-        if account_id not in self.bots:
+        if account_id not in self._running_account_ids():
             return {'success': False, 'message': '账号未运行'}
         
-        # 删除该账号的bot与已下单标记
-        del self.bots[account_id]
-        for mkt, accs in list(self.ordered_markets.items()):
-            if account_id in accs:
-                accs.discard(account_id)
-            if not accs:
-                self.ordered_markets.pop(mkt, None)
+        # 删除前先写入该账号尚未保存的统计
+        self._flush_account_stats()
+        
+        # 删除该账号的bot、预签名订单与已下单标记
+        if self.sharded:
+            self.shard_pool.stop_account(account_id)
+        else:
+            self.bots.remove(account_id)
+        self.presign_cache.discard_account(account_id)
+        self.order_store.remove_account(account_id)
+        self.account_state.remove_account(account_id)
+        self.balance_refresher.forget(account_id)
         
         # 如果没有账号在运行，停止调度线程
-        if not self.bots:
+        if not self._running_account_ids():
             self.running = False
+        self._save_state()
         
         return {'success': True, 'message': '账号停止成功'}
     
+    # ========== 状态快照 / 热重启 ==========
+    
+    def _save_state(self):
+        """写入调度状态快照（恢复过程中不写，恢复完成后统一写一次）"""
+        if self._restoring:
+            return
+        self._last_state_save = time.time()
+        running_ids = self._running_account_ids()
+        self.state_store.save({
+            'running_account_ids': running_ids,
+            'auto_monitoring': self.running,
+            'strategy_config': dict(self.strategy_config),
+            'last_redeem_time': self.redeem_worker.last_redeem_time,
+            'api_creds': {str(acc_id): creds for acc_id, creds in list(self._api_creds.items())},
+            'markets': self._market_cache
+        })
+    
+    def restore_state(self) -> Dict:
+        """按快照恢复：并发启动运行账号（复用API凭证），恢复策略配置、索取计时与自动监控"""
+        state = self.state_store.load()
+        if not state:
+            return {'success': False, 'message': '没有可恢复的调度状态'}
+        
+        started_at = time.time()
+        self._restoring = True
+        try:
+            if state.get('strategy_config'):
+                self.set_strategy_config(state['strategy_config'])
+            self.redeem_worker.last_redeem_time = state.get('last_redeem_time', 0.0)
+            for acc_id, creds in state.get('api_creds', {}).items():
+                self._api_creds.setdefault(int(acc_id), creds)
+            self._market_cache = state.get('markets', {})
+            
+            account_ids = [int(acc_id) for acc_id in state.get('running_account_ids', [])]
+            if self.sharded and account_ids:
+                # 先创建分片进程池，避免并发启动时重复创建
+                self._get_shard_pool()
+            started, failed = 0, []
+            if account_ids:
+                with ThreadPoolExecutor(max_workers=min(STATE_RESTORE_WORKERS, len(account_ids)),
+                                        thread_name_prefix="state-restore") as executor:
+                    futures = {executor.submit(self.start_account, acc_id): acc_id for acc_id in account_ids}
+                    for future in as_completed(futures):
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {'success': False, 'message': str(e)}
+                        if result.get('success'):
+                            started += 1
+                        else:
+                            failed.append(futures[future])
+        finally:
+            self._restoring = False
+        
+        if state.get('auto_monitoring') and started:
+            self.start_auto_monitoring()
+        else:
+            self._save_state()
+        
+        elapsed = time.time() - started_at
+        message = f"已恢复 {started}/{len(account_ids)} 个账号（耗时{elapsed:.1f}秒）"
+        if failed:
+            message += f"，启动失败: {failed}"
+        self._log_global(message)
+        return {'success': True, 'message': message, 'started': started, 'failed': failed}
+    
+    def _remember_markets(self, scan_bot: TradingBot, markets: List[Dict]):
+        """记录最近发现的市场，并清理已结束的缓存"""
+        cache = {
+            slug: market for slug, market in self._market_cache.items()
+            if (scan_bot.get_market_remaining_seconds(market) or 0) > 0
+        }
+        for market in markets:
+            cache[market.get('slug') or str(market.get('id'))] = market
+        self._market_cache = cache
+    
+    def _cached_markets(self, scan_bot: TradingBot) -> List[Dict]:
+        """缓存中仍未结束的市场（剩余0-15分钟）"""
+        markets = []
+        for market in self._market_cache.values():
+            remaining_seconds = scan_bot.get_market_remaining_seconds(market)
+            if remaining_seconds is not None and 0 < remaining_seconds <= 900:
+                markets.append(market)
+        return markets
+    
     def _monitor_loop(self):
         """单一调度线程：统一获取市场数据，命中后同时下发到所有运行账号"""
-        last_redeem_time = 0
         self._log_global("调度线程启动")
         self._log_global(f"策略: 市场结束前倒数{self.strategy_config['check_time_window_minutes']}分钟内，如果UP或DOWN价格 > {self.strategy_config['price_percentage_threshold']*100}%，自动买入")
         self._log_global(f"监控间隔: {self.strategy_config['monitor_interval']}秒")
-        self._log_global(f"自动索取: 每{int(self.strategy_config['redeem_interval']/60)}分钟自动索取一次可赎回持仓\n")
+        self._log_global(f"自动索取: 每{int(self.strategy_config['redeem_interval']/60)}分钟自动索取一次可赎回持仓（后台线程，检查窗口内暂停）\n")
+        if exchange_clock.sync():
+            self._log_global(f"交易所时钟偏移: {exchange_clock.offset:+.3f}秒\n")
 
         while self.running:
             loop_start_time = time.time()  # 记录循环开始时间
             try:
                 # 没有账号运行时，等待
-                if not self.bots:
+                if not self._running_account_ids():
                     time.sleep(self.strategy_config['monitor_interval'])
                     continue
 
-                # 选择一个bot用于拉取市场与打印全局日志（仅数据源/输出，不下单）
-                scan_bot = next(iter(self.bots.values()))
+                # 分片模式：重启已崩溃的分片进程并恢复其账号
+                if self.shard_pool:
+                    for index in self.shard_pool.ensure_alive():
+                        self._log_global(f"⚠ 分片{index}进程已退出，已重启并恢复账号")
 
-                # 自动赎回：并发执行所有账号
-                current_time = time.time()
-                if current_time - last_redeem_time >= self.strategy_config['redeem_interval']:
-                    self._log_global(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 执行自动索取（所有运行账号，并发执行）...")
-                    self._redeem_all_accounts_concurrent()
-                    last_redeem_time = current_time
+                # 选择一个bot用于拉取市场与打印全局日志（仅数据源/输出，不下单）
+                scan_bot = self._get_scan_bot()
 
-                # 获取市场（统一）
+                # 获取市场（统一）；拉取失败时使用最近发现的市场（热重启后也立即可用）
                 markets = scan_bot.get_eth_15min_markets()
+                if markets:
+                    self._remember_markets(scan_bot, markets)
+                else:
+                    markets = self._cached_markets(scan_bot)
+                    if markets:
+                        self._log_global(f"市场列表获取失败，使用缓存的 {len(markets)} 个市场")
                 if not markets:
+                    self._set_window_active(False)
                     # 计算剩余等待时间
                     elapsed = time.time() - loop_start_time
                     sleep_time = max(0, self.strategy_config['monitor_interval'] - elapsed)
@@ -134,129 +479,81 @@ class TaskScheduler:
 
                 self._log_global(f"\n监控 {len(markets)} 个市场...\n")
 
+                # 当前运行账号使用的策略配置档（全部基于同一份市场快照判断，不额外请求行情）
+                profile_configs = self.strategy_profiles.active_configs(self._running_account_ids(), self.strategy_config)
+                max_window_minutes = max(
+                    (config['check_time_window_minutes'] for config in profile_configs.values()),
+                    default=self.strategy_config['check_time_window_minutes']
+                )
+
+                # 第一遍：构建快照并按时间窗口过滤（get_eth_15min_markets 已返回完整市场数据，无需再次拉取详情）
+                window_snapshots = []
+                discovered_tokens = []
                 for i, market in enumerate(markets, 1):
-                    try:
-                        market_id = market.get("id")
-                        market_id_str = str(market_id)
-                        market_question = market.get("question", "未知市场")
+                    market_question = market.get("question", "未知市场")
+                    snapshot = scan_bot.build_market_snapshot(market, with_prices=False)
+                    if snapshot is None:
+                        self._log_global(f"[{i}] {market_question[:60]}... 跳过（无法获取token IDs）")
+                        continue
+                    discovered_tokens.extend((snapshot.yes_token_id, snapshot.no_token_id))
 
-                        # 获取完整市场数据
-                        market_data = scan_bot.fetch_market_detail(market_id)
-                        if not market_data:
-                            continue
+                    remaining_seconds = snapshot.remaining_seconds()
+                    if remaining_seconds is None or remaining_seconds <= 0:
+                        self._log_global(f"[{i}] {market_question[:60]}... 跳过（无剩余时间）")
+                        continue
 
-                        # 剩余时间
-                        remaining_seconds = scan_bot.get_market_remaining_seconds(market_data)
-                        if remaining_seconds is None or remaining_seconds <= 0:
-                            self._log_global(f"[{i}] {market_question[:60]}... 跳过（无剩余时间）")
-                            continue
+                    if remaining_seconds / 60.0 > max_window_minutes:
+                        self._log_global(f"[{i}] {market_question[:60]}... 跳过（不在时间窗口内）")
+                        continue
+                    window_snapshots.append((i, snapshot))
+                self._set_window_active(bool(window_snapshots))
+                # 新发现市场的下单参数（tick size / neg_risk / 手续费率）在行情池中预取，下单时直接使用
+                self._prefetch_market_params(scan_bot, discovered_tokens)
+                # 清理已过期（市场已结束）的去重记录，位图随后按需重新加载
+                if self.order_store.prune():
+                    self.account_state.clear_ordered()
 
-                        remaining_minutes = remaining_seconds / 60.0
-                        if remaining_minutes > self.strategy_config['check_time_window_minutes']:
-                            self._log_global(f"[{i}] {market_question[:60]}... 跳过（不在时间窗口内）")
-                            continue
+                # 窗口内市场的价格通过行情池并发获取（回填到快照）
+                self._fetch_snapshot_prices(scan_bot, [snap for _, snap in window_snapshots])
+                # 已离开检查窗口的市场，丢弃其预签名订单
+                self.presign_cache.retain_markets(snap.market_id_str for _, snap in window_snapshots)
 
-                        # 价格与token
-                        yes_token_id, no_token_id = scan_bot.get_yes_no_token_ids(market_id, market_data)
-                        if not yes_token_id or not no_token_id:
-                            self._log_global(f"[{i}] {market_question[:60]}... 跳过（无法获取token IDs）")
-                            continue
+                for i, snapshot in window_snapshots:
+                    try:
+                        market_question = snapshot.question
+                        market_id_str = snapshot.market_id_str
+                        remaining_seconds = snapshot.remaining_seconds()
+                        remaining_minutes = remaining_seconds / 60.0
 
-                        yes_price, no_price = scan_bot.get_yes_no_prices_via_clob_spreads(market_id, market_data)
-                        if yes_price is None or no_price is None:
+                        # 阈值判断前再读一次价格板，使用行情服务最新一轮的价格
+                        self._prices_from_board(snapshot)
+                        if not snapshot.has_prices:
                             self._log_global(f"[{i}] {market_question[:60]}... 跳过（无法获取价格）")
                             continue
 
-                        up_token_id = yes_token_id
-                        down_token_id = no_token_id
-                        up_price = yes_price
-                        down_price = no_price
+                        up_price = snapshot.yes_ask
+                        down_price = snapshot.no_ask
 
                         self._log_global(f"[{i}] {market_question[:60]}...")
                         self._log_global(f"     剩余时间: {remaining_minutes:.2f}分钟 ({remaining_seconds:.0f}秒)")
                         self._log_global(f"     UP价格: {up_price:.4f} ({up_price*100:.2f}%), DOWN价格: {down_price:.4f} ({down_price*100:.2f}%)")
 
-                        price_threshold = self.strategy_config['price_percentage_threshold']
-                        should_buy_up = up_price >= price_threshold
-                        should_buy_down = down_price >= price_threshold
-
-                        if should_buy_up or should_buy_down:
-                            side_label = "涨" if should_buy_up else "跌"
-                            price_used = up_price if should_buy_up else down_price
-                            token_used = up_token_id if should_buy_up else down_token_id
-
-                            # 仅对未下过单的账号下发指令，避免重复下单
-                            eligible_accounts = []
-                            for acc_id in self.bots.keys():
-                                ordered_set = self.ordered_markets.get(market_id_str, set())
-                                if acc_id not in ordered_set:
-                                    eligible_accounts.append(acc_id)
-
-                            if not eligible_accounts:
-                                self._log_global(f"     - 所有运行账号已为该市场下单，跳过重复下发")
-                                continue
-
-                            self._log_global(f"     ✓ {side_label.upper()} 价格 >= {price_threshold*100}%，准备为 {len(eligible_accounts)} 个账号并发买入'{side_label}'...")
-
-                            # 使用线程池并发下单（几乎同时执行）
-                            order_amount_usd = self.strategy_config['order_amount_usd']
-                            order_size = order_amount_usd / price_used
-                            order_info = {
-                                "market_id": market_id,
-                                "market_question": market_question,
-                                "token_id": token_used,
-                                "best_ask": price_used,
-                                "order_size": order_size,
-                                "order_amount_usd": order_amount_usd,
-                                "side": "UP" if should_buy_up else "DOWN"
-                            }
-                            
-                            # 统计成功/失败数量
-                            success_count = 0
-                            fail_count = 0
-                            
-                            # 使用线程池并发执行下单
-                            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                                # 提交所有账号的下单任务
-                                futures = {}
-                                for acc_id in eligible_accounts:
-                                    b = self.bots.get(acc_id)
-                                    if not b:
-                                        continue
-                                    # 提交任务到线程池
-                                    future = executor.submit(
-                                        self._place_order_for_account,
-                                        acc_id, b, order_info, side_label, market_id_str
-                                    )
-                                    futures[future] = acc_id
-                                
-                                # 等待所有任务完成（设置超时避免无限等待）
-                                timeout = 30  # 30秒超时
-                                try:
-                                    for future in as_completed(futures, timeout=timeout):
-                                        acc_id = futures[future]
-                                        try:
-                                            success = future.result()
-                                            if success:
-                                                success_count += 1
-                                            else:
-                                                fail_count += 1
-                                        except Exception as e:
-                                            fail_count += 1
-                                            bot = self.bots.get(acc_id)
-                                            if bot:
-                                                bot._log_error(f"下单异常: {e}")
-                                except TimeoutError:
-                                    # 超时处理：标记未完成的任务为失败
-                                    remaining = len(futures) - (success_count + fail_count)
-                                    if remaining > 0:
-                                        fail_count += remaining
-                                        self._log_global(f"     ⚠ 警告: {remaining} 个账号下单超时（{timeout}秒）")
-                            
-                            # 输出统计结果
-                            self._log_global(f"     [并发下单完成] 成功: {success_count}, 失败: {fail_count}, 总计: {len(eligible_accounts)}")
-                        else:
-                            self._log_global(f"     - 价格未达到阈值（需要 >= {price_threshold*100}%），当前 UP={up_price*100:.2f}% / DOWN={down_price*100:.2f}%")
+                        # 仅对未下过单、未熔断、未暂停、资金充足的账号下发指令（位图按位运算）
+                        eligible_accounts = self.account_state.eligible_accounts(market_id_str)
+                        if not eligible_accounts:
+                            self._log_global(f"     - 没有可下单账号（已下单/熔断/暂停/资金不足），跳过")
+                            continue
+
+                        # 按配置档分别判断与下发
+                        all_triggered = True
+                        for profile, account_ids in self.strategy_profiles.partition(eligible_accounts).items():
+                            config = profile_configs.get(profile) or self.strategy_profiles.resolve(profile, self.strategy_config)
+                            triggered = self._evaluate_profile(snapshot, profile, config, account_ids, remaining_seconds)
+                            all_triggered = all_triggered and triggered
+
+                        if all_triggered:
+                            # 所有配置档均已下发，未使用的预签名订单丢弃
+                            self.presign_cache.discard_market(market_id_str)
 
                     except Exception as e:
                         self._log_global(f"  处理市场时出错: {e}")
@@ -264,6 +561,22 @@ class TaskScheduler:
                         traceback.print_exc()
                         continue
 
+                # 定期写入状态快照（检查窗口内不写，避免占用下单时间）
+                if not self.window_active and time.time() - self._last_state_save >= SCHEDULER_STATE_INTERVAL:
+                    self._save_state()
+
+                # 定期把各账号的统计增量写入账号数据
+                if not self.window_active and time.time() - self._last_stats_flush >= ACCOUNT_STATS_INTERVAL:
+                    self._flush_account_stats()
+
+                # 慢周期对账本地持仓簿（后台执行，不等待结果）
+                if not self.window_active and time.time() - self._last_position_reconcile >= POSITION_RECONCILE_INTERVAL:
+                    self._last_position_reconcile = time.time()
+                    if self.sharded:
+                        self.shard_pool.reconcile_positions()
+                    else:
+                        self.reconcile_positions_async()
+
                 # 计算实际耗时，确保扫描间隔准确
                 elapsed = time.time() - loop_start_time
                 sleep_time = max(0, self.strategy_config['monitor_interval'] - elapsed)
@@ -280,46 +593,97 @@ class TaskScheduler:
                 time.sleep(self.strategy_config['monitor_interval'])
 
         self._log_global("调度线程停止")
+        self._set_window_active(False)
+        self.redeem_worker.stop()
+        self.balance_refresher.stop()
         self.scanner_thread = None
+    
+    def _evaluate_profile(self, snapshot: MarketSnapshot, profile: str, config: Dict,
+                          account_ids: List[int], remaining_seconds: float) -> bool:
+        """按配置档判断快照是否触发，触发时为该配置档的账号下单，返回是否已下发"""
+        prefix = "" if profile == DEFAULT_PROFILE else f"[{profile}] "
+        if remaining_seconds / 60.0 > config['check_time_window_minutes']:
+            self._log_global(f"     - {prefix}未进入该配置档的时间窗口（{config['check_time_window_minutes']}分钟）")
+            return False
+
+        up_price = snapshot.yes_ask
+        down_price = snapshot.no_ask
+        price_threshold = config['price_percentage_threshold']
+        should_buy_up = up_price >= price_threshold
+        should_buy_down = down_price >= price_threshold
+
+        if not (should_buy_up or should_buy_down):
+            self._log_global(f"     - {prefix}价格未达到阈值（需要 >= {price_threshold*100}%），当前 UP={up_price*100:.2f}% / DOWN={down_price*100:.2f}%")
+            # 未触发：为两侧预签名（价格变化导致数量变化时刷新）
+            self._presign_orders(snapshot, account_ids, config['order_amount_usd'])
+            return False
+
+        side_label = "涨" if should_buy_up else "跌"
+        self._log_global(f"     ✓ {prefix}{side_label.upper()} 价格 >= {price_threshold*100}%，准备为 {len(account_ids)} 个账号并发买入'{side_label}'...")
+
+        # 构建下单参数（该配置档的所有账号共享同一份）
+        order_info = snapshot.build_order_info("UP" if should_buy_up else "DOWN", config['order_amount_usd'])
+        success_count, fail_count = self._dispatch_orders(snapshot, order_info, side_label, account_ids)
+
+        # 输出统计结果
+        self._log_global(f"     [并发下单完成] {prefix}成功: {success_count}, 失败: {fail_count}, 总计: {len(account_ids)}")
+        return True
+
+    def _set_window_active(self, active: bool):
+        """更新检查窗口状态；窗口结束时唤醒后台索取补上被推迟的任务"""
+        was_active = self.window_active
+        self.window_active = active
+        if was_active and not active:
+            self.redeem_worker.wake()
 
     def _redeem_all_accounts_concurrent(self):
         """并发执行所有运行账号的自动索取"""
-        if not self.bots:
+        account_count = len(self._running_account_ids())
+        if not account_count:
             return
         
+        if self.sharded:
+            result = self.shard_pool.redeem_all()
+        else:
+            result = self.redeem_local()
+        self._log_global(f"     [并发索取完成] 成功: {result['success_count']}, 失败: {result['fail_count']}, 总计: {account_count}")
+        self._flush_account_stats()
+    
+    def redeem_local(self) -> Dict:
+        """并发执行本进程内所有账号的索取，返回成功/失败数"""
         success_count = 0
         fail_count = 0
         
-        # 使用线程池并发执行索取
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {}
-            for acc_id, bot in list(self.bots.items()):
-                future = executor.submit(self._redeem_for_account, acc_id, bot)
-                futures[future] = acc_id
-            
-            # 等待所有任务完成
-            timeout = 60  # 60秒超时
-            try:
-                for future in as_completed(futures, timeout=timeout):
-                    acc_id = futures[future]
-                    try:
-                        success = future.result()
-                        if success:
-                            success_count += 1
-                        else:
-                            fail_count += 1
-                    except Exception as e:
+        # 使用常驻索取池并发执行
+        bots = self.bots.snapshot()
+        futures = {}
+        for acc_id, bot in bots.items():
+            future = self.redeem_pool.submit(self._redeem_for_account, acc_id, bot)
+            futures[future] = acc_id
+        
+        # 等待所有任务完成
+        timeout = 60  # 60秒超时
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                acc_id = futures[future]
+                try:
+                    success = future.result()
+                    if success:
+                        success_count += 1
+                    else:
                         fail_count += 1
-                        bot = self.bots.get(acc_id)
-                        if bot:
-                            bot._log_error(f"索取异常: {e}")
-            except TimeoutError:
-                remaining = len(futures) - (success_count + fail_count)
-                if remaining > 0:
-                    fail_count += remaining
-                    self._log_global(f"     ⚠ 警告: {remaining} 个账号索取超时（{timeout}秒）")
+                except Exception as e:
+                    fail_count += 1
+                    bot = bots.get(acc_id)
+                    if bot:
+                        bot._log_error(f"索取异常: {e}")
+        except TimeoutError:
+            remaining = len(futures) - (success_count + fail_count)
+            if remaining > 0:
+                fail_count += remaining
+                self._log_global(f"     ⚠ 警告: {remaining} 个账号索取超时（{timeout}秒）")
         
-        self._log_global(f"     [并发索取完成] 成功: {success_count}, 失败: {fail_count}, 总计: {len(self.bots)}")
+        return {'success_count': success_count, 'fail_count': fail_count}
     
     def _redeem_for_account(self, acc_id: int, bot: TradingBot) -> bool:
         """为单个账号执行索取（在线程池中执行）"""
@@ -330,27 +694,302 @@ class TaskScheduler:
             bot._log_error(f"索取异常: {e}")
             return False
     
-    def _place_order_for_account(self, acc_id: int, bot: TradingBot, order_info: Dict, side_label: str, market_id_str: str) -> bool:
-        """为单个账号下单（在线程池中执行）"""
+    def _check_balances(self, account_ids: List[int], required: float) -> Dict[int, Optional[tuple]]:
+        """批量检查账号余额与授权（本进程或各分片进程）"""
+        if self.sharded:
+            return self.shard_pool.check_balances(account_ids, required)
+        return self.check_balances_local(account_ids, required)
+    
+    def check_balances_local(self, account_ids: List[int], required: float, timeout: float = 60) -> Dict[int, Optional[tuple]]:
+        """在索取池中并发检查本进程账号的余额与授权，返回 {账号ID: (余额, 授权额度) 或 None}"""
+        bots = self.bots.snapshot()
+        futures = {
+            self.redeem_pool.submit(bots[acc_id].check_balance_and_allowance, required): acc_id
+            for acc_id in account_ids if acc_id in bots
+        }
+        results: Dict[int, Optional[tuple]] = {}
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                acc_id = futures[future]
+                try:
+                    _, _, balance, allowance, wallet_address = future.result()
+                    # 检查失败时 wallet_address 为None，不据此判定资金不足
+                    results[acc_id] = (balance, allowance) if wallet_address else None
+                except Exception:
+                    results[acc_id] = None
+        except TimeoutError:
+            self._log_global(f"     ⚠ 警告: 余额预检查超时（{timeout}秒）")
+        return results
+    
+    def _on_balance_update(self, account_id: int, reason: Optional[str]):
+        """余额检查结果回调：更新资金不足标记"""
+        self.account_state.set_flag(FLAG_UNDERFUNDED, account_id, reason is not None)
+    
+    def _fetch_snapshot_prices(self, scan_bot: TradingBot, snapshots: List[MarketSnapshot], timeout: float = 10):
+        """通过行情池并发获取多个快照的价格（结果直接回填到快照）"""
+        # 共享内存价格板已有最新价格的快照无需请求
+        snapshots = [snap for snap in snapshots if not self._prices_from_board(snap)]
+        if not snapshots:
+            return
+        futures = [
+            self.read_pool.submit(scan_bot.get_yes_no_prices_via_clob_spreads, snap.market_id, None, snap)
+            for snap in snapshots
+        ]
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    future.result()
+                except Exception as e:
+                    self._log_global(f"  获取价格出错: {e}")
+        except TimeoutError:
+            self._log_global(f"     ⚠ 警告: 获取价格超时（{timeout}秒）")
+    
+    def _prefetch_market_params(self, scan_bot: TradingBot, token_ids: List[str]):
+        missing = market_params.missing(token_ids)
+        if missing:
+            self.read_pool.submit(market_params.prefetch, missing, scan_bot.client)
+    
+    def _prices_from_board(self, snapshot: MarketSnapshot) -> bool:
+        """从共享内存价格板读取两侧价格回填到快照（行情服务未运行或价格过期时返回False）"""
+        yes = price_board.read(snapshot.yes_token_id)
+        no = price_board.read(snapshot.no_token_id)
+        if yes is None or no is None or yes[1] is None or no[1] is None:
+            return False
+        if time.time() - min(yes[2], no[2]) > MARKET_DATA_MAX_AGE:
+            return False
+        snapshot.yes_bid, snapshot.yes_ask = yes[0], yes[1]
+        snapshot.no_bid, snapshot.no_ask = no[0], no[1]
+        return True
+    
+    def _dispatch_orders(self, snapshot: MarketSnapshot, order_info: Dict, side_label: str, account_ids: List[int]):
+        """向指定账号并发下单（本进程或各分片进程），返回 (成功数, 失败数)
+
+        下发带截止时间：截止时未开始的订单丢弃，在途订单不再等待，扫描线程不会被慢代理卡住。
+        """
+        trigger_ts = time.time()
+        deadline = self._order_deadline(snapshot)
+        if self.sharded:
+            result = self.shard_pool.place_orders(
+                snapshot, order_info, side_label, account_ids, deadline,
+                on_late=lambda late: self._on_late_shard_orders(snapshot, late)
+            )
+            # 在途被放弃（或分片未响应）的订单可能已经成交，按已下单处理，避免重复下单
+            self._mark_ordered(snapshot, result['succeeded'] + result['abandoned'])
+        else:
+            result = self.dispatch_orders_local(snapshot, order_info, side_label, account_ids, deadline)
+        succeeded = result['succeeded']
+        # 更新账号连续失败计数（达到阈值后熔断）；被截止时间丢弃/放弃的不计入
+        for acc_id in succeeded:
+            self.account_state.record_result(acc_id, True)
+        for acc_id in result['failed']:
+            self.account_state.record_result(acc_id, False)
+        for acc_id in succeeded:
+            self.balance_refresher.note_spent(acc_id, order_info['order_amount_usd'])
+        # 从触发到最后一个回报的时间跨度
+        self.dispatch_planner.record_spread(trigger_ts, len(account_ids))
+        return len(succeeded), len(account_ids) - len(succeeded)
+    
+    def _on_late_shard_orders(self, snapshot: MarketSnapshot, result: Dict):
+        """分片在协调者停止等待后才回报（其账号已按 abandoned 记为已下单）
+
+        丢弃、失败或已停止的账号实际并未下单，撤销已下单标记；成功与分片内在途的保留。
+        """
+        not_placed = result.get('dropped', []) + result.get('failed', []) + result.get('stopped', [])
+        if not_placed:
+            self.order_store.remove(snapshot.market_id_str, not_placed)
+            self.account_state.unmark_ordered(snapshot.market_id_str, not_placed)
+        for _ in result.get('succeeded', []):
+            self.dispatch_planner.record_late(True)
+        for _ in result.get('failed', []):
+            self.dispatch_planner.record_late(False)
+        reason = '（命令排队超过截止时间，未下单）' if result.get('stale') else ''
+        self._log_global(f"     [晚到回报] 分片下单 市场{snapshot.market_id_str}: 成功 {len(result.get('succeeded', []))}, "
+                         f"未下单 {len(not_placed)}{reason}，已撤销未下单账号的标记")
+    
+    def _order_deadline(self, snapshot: MarketSnapshot) -> float:
+        """下发截止时间（校正后的交易所时间）"""
+        deadline = exchange_now() + ORDER_DISPATCH_TIMEOUT
+        if snapshot.end_ts:
+            deadline = min(deadline, snapshot.end_ts - ORDER_CUTOFF_BEFORE_END)
+        return deadline
+    
+    def _mark_ordered(self, snapshot: MarketSnapshot, account_ids: List[int]):
+        """记录账号已为该市场下单（去重存储 + 状态位图）"""
+        self.order_store.add(snapshot.market_id_str, account_ids, snapshot.end_ts)
+        self.account_state.mark_ordered(snapshot.market_id_str, account_ids)
+    
+    def dispatch_orders_local(self, snapshot: MarketSnapshot, order_info: Dict, side_label: str,
+                              account_ids: List[int], deadline: Optional[float] = None) -> Dict[str, List[int]]:
+        """使用本进程的常驻下单池并发下单
+
+        Args:
+            deadline: 截止时间（本进程的 exchange_now() 时间），默认 ORDER_DISPATCH_TIMEOUT 秒后
+        Returns:
+            {'succeeded', 'failed', 'dropped'(截止时未开始), 'abandoned'(截止时仍在途),
+             'stopped'(下发期间账号已停止，未下单)} 账号ID列表
+        """
+        if deadline is None:
+            deadline = exchange_now() + ORDER_DISPATCH_TIMEOUT
+        # 整轮下发使用同一份快照，期间启动/停止账号不影响本轮
+        bots = self.bots.snapshot()
+        # 慢账号先提交，同一代理的账号交错分布
+        ordered = self.dispatch_planner.plan(
+            [acc_id for acc_id in account_ids if acc_id in bots],
+            lambda acc_id: bots[acc_id].proxy_ip
+        )
+        futures = {}
+        for acc_id in ordered:
+            bot = bots[acc_id]
+            future = self.order_pool.submit_with_deadline(
+                deadline, exchange_now,
+                self._place_order_for_account,
+                acc_id, bot, snapshot, order_info, side_label, deadline
+            )
+            futures[future] = acc_id
+        return self._collect_order_results(futures, deadline)
+    
+    def _presign_orders(self, snapshot: MarketSnapshot, account_ids: List[int], order_amount_usd: float):
+        """为指定账号预签名两侧买单（不阻塞扫描）"""
+        if self.sharded:
+            self.shard_pool.presign(snapshot, account_ids, order_amount_usd)
+        else:
+            self.presign_orders_local(snapshot, account_ids, order_amount_usd)
+    
+    def presign_orders_local(self, snapshot: MarketSnapshot, account_ids: List[int], order_amount_usd: Optional[float] = None):
+        """为本进程内的账号预签名两侧买单（在预签名池中异步执行）"""
+        market_id_str = snapshot.market_id_str
+        if order_amount_usd is None:
+            order_amount_usd = self.strategy_config['order_amount_usd']
+        bots = self.bots.snapshot()
+        for side in ('UP', 'DOWN'):
+            price = snapshot.ask_for(side)
+            if not price:
+                continue
+            token_id = snapshot.token_for(side)
+            order_size = order_amount_usd / price
+            for acc_id in account_ids:
+                bot = bots.get(acc_id)
+                if not bot:
+                    continue
+                if not self.presign_cache.needs_refresh(acc_id, token_id, order_size):
+                    continue
+                self.presign_pool.submit(self._presign_for_account, acc_id, bot, market_id_str, token_id, order_size)
+    
+    def _presign_for_account(self, acc_id: int, bot: TradingBot, market_id_str: str, token_id: str, order_size: float):
+        """为单个账号签名一笔买单（在预签名池中执行）"""
+        order = None
+        try:
+            order = bot.create_buy_order(token_id, order_size)
+        except Exception as e:
+            bot._log_error(f"预签名异常: {e}")
+        finally:
+            self.presign_cache.put(acc_id, market_id_str, token_id, order_size, order)
+    
+    def _collect_order_results(self, futures: Dict, deadline: float) -> Dict[str, List[int]]:
+        """收集并发下单结果，最多等到截止时间，不等待在途的慢订单"""
+        result = {'succeeded': [], 'failed': [], 'dropped': [], 'abandoned': [], 'stopped': []}
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - exchange_now())):
+                pending.discard(future)
+                acc_id = futures[future]
+                try:
+                    success = future.result()
+                except DeadlineExpired:
+                    result['dropped'].append(acc_id)
+                    continue
+                except Exception as e:
+                    success = False
+                    bot = self.bots.get(acc_id)
+                    if bot:
+                        bot._log_error(f"下单异常: {e}")
+                if success is None:
+                    result['stopped'].append(acc_id)
+                    continue
+                result['succeeded' if success else 'failed'].append(acc_id)
+        except TimeoutError:
+            pass
+        
+        # 截止时间已到：仍在排队的直接取消，在途的放弃等待，完成后单独记录
+        for future in pending:
+            acc_id = futures[future]
+            if future.cancel():
+                result['dropped'].append(acc_id)
+                continue
+            result['abandoned'].append(acc_id)
+            # 结果返回前不再为该账号下发，避免重复下单
+            self.account_state.set_flag(FLAG_INFLIGHT, acc_id, True)
+            future.add_done_callback(lambda f, acc_id=acc_id: self._on_late_order(acc_id, f))
+        
+        if result['dropped'] or result['abandoned']:
+            self.dispatch_planner.record_deadline(len(result['dropped']), len(result['abandoned']))
+            self._log_global(f"     ⚠ 警告: 已到下单截止时间，丢弃 {len(result['dropped'])} 个未开始的订单，"
+                             f"放弃等待 {len(result['abandoned'])} 个在途订单")
+        return result
+    
+    def _on_late_order(self, acc_id: int, future):
+        """截止时间后才完成的订单（成功时 _place_order_for_account 已记录去重）"""
+        self.account_state.set_flag(FLAG_INFLIGHT, acc_id, False)
+        try:
+            success = bool(future.result())
+        except DeadlineExpired:
+            # 在并发名额处等待到截止时间后被丢弃，实际并未发出
+            self.dispatch_planner.record_deadline(dropped=1, abandoned=-1)
+            return
+        except Exception:
+            success = False
+        if success is None:
+            # 账号在下发期间已停止，未下单
+            self.dispatch_planner.record_deadline(dropped=0, abandoned=-1)
+            return
+        self.dispatch_planner.record_late(success)
+        self._log_global(f"     [晚到回报] 账号{acc_id} 下单{'成功' if success else '失败'}（已超过截止时间）")
+    
+    def _place_order_for_account(self, acc_id: int, bot: TradingBot, snapshot: MarketSnapshot, order_info: Dict,
+                                 side_label: str, deadline: Optional[float] = None) -> Optional[bool]:
+        """为单个账号下单（在线程池中执行）
+        
+        order_info 由 snapshot 构建一次后在所有账号间共享，不在此处复制或重新计算。
+        账号在下发期间被停止时不下单，返回None。
+        """
         try:
-            result = bot.place_buy_order(
-                order_info, 
-                self.strategy_config, 
-                auto_confirm=True, 
-                skip_balance_check=True, 
-                verbose=False
+            # 命中预签名缓存时只需提交
+            signed_order = self.presign_cache.take(acc_id, order_info['token_id'], order_info['order_size'])
+            # 同一代理的在途订单数受限，等待名额最多到截止时间
+            slot = self.dispatch_planner.proxy_slot(
+                bot.proxy_ip, None if deadline is None else deadline - exchange_now()
             )
+            if slot is None:
+                raise DeadlineExpired()
+            with slot:
+                # 等待代理名额期间已过截止时间：不再提交
+                if deadline is not None and exchange_now() >= deadline:
+                    raise DeadlineExpired()
+                # 本轮快照取得后账号已被停止（或停止后重新启动为新的bot）：不再下单
+                if self.bots.get(acc_id) is not bot:
+                    return None
+                result = bot.place_buy_order(
+                    order_info, 
+                    self.strategy_config, 
+                    auto_confirm=True, 
+                    skip_balance_check=True, 
+                    verbose=False,
+                    signed_order=signed_order
+                )
+            # 按实际下单延迟调整下单池并发上限，并记录账号延迟供下次排序（未实际提交时不记录）
+            latency = bot.last_post_latency
+            if latency is not None:
+                self.order_pool.record_latency(latency)
+                self.dispatch_planner.record_latency(acc_id, latency)
             if result:
                 bot._log_status(f"     ✓ 买入'{side_label}'成功！")
-                # 线程安全地更新已下单标记
-                with self._order_lock:
-                    ordered_set = self.ordered_markets.get(market_id_str, set())
-                    ordered_set.add(acc_id)
-                    self.ordered_markets[market_id_str] = ordered_set
+                self._mark_ordered(snapshot, [acc_id])
                 return True
             else:
                 bot._log_status(f"     ✗ 买入'{side_label}'失败")
                 return False
+        except DeadlineExpired:
+            raise
         except Exception as e:
             bot._log_error(f"下单异常: {e}")
             return False
@@ -361,39 +1000,92 @@ class TaskScheduler:
     
     def get_running_accounts(self) -> List[int]:
         """获取正在运行的账号ID列表"""
-        return list(self.bots.keys())
+        return self._running_account_ids()
     
     def get_account_status(self, account_id: int) -> Dict:
         """获取账号运行状态"""
-        is_running = account_id in self.bots and self.running and self.scanner_thread is not None and self.scanner_thread.is_alive()
-        return {
+        bot_exists = account_id in self._running_account_ids()
+        is_running = bot_exists and self.running and self.scanner_thread is not None and self.scanner_thread.is_alive()
+        status = {
             'account_id': account_id,
             'is_running': is_running,
-            'bot_exists': account_id in self.bots
+            'bot_exists': bot_exists
         }
+        if self.shard_pool and bot_exists:
+            status['shard'] = self.shard_pool.shard_for(account_id)
+        status['paused'] = self.account_state.has_flag(FLAG_PAUSED, account_id)
+        status['circuit_open'] = self.account_state.has_flag(FLAG_CIRCUIT_OPEN, account_id)
+        status['underfunded'] = self.account_state.has_flag(FLAG_UNDERFUNDED, account_id)
+        status['balance'] = self.balance_refresher.status_of(account_id)
+        # 自动下单时被跳过的原因（None 表示可正常下单）
+        skip_reason = None
+        if status['paused']:
+            skip_reason = '账号已暂停'
+        elif status['circuit_open']:
+            skip_reason = '连续下单失败，熔断冷却中'
+        elif status['underfunded']:
+            skip_reason = self.balance_refresher.reason_of(account_id) or '资金不足'
+        status['skip_reason'] = skip_reason
+        status['strategy_profile'] = self.strategy_profiles.profile_of(account_id)
+        return status
+    
+    def set_account_paused(self, account_id: int, paused: bool):
+        """暂停/恢复账号的自动下单（bot保持运行，只是不再参与下单）"""
+        self.account_state.set_flag(FLAG_PAUSED, account_id, paused)
+    
+    def get_eligibility_debug(self, market_id: str) -> Dict:
+        """调试：某个市场的可下单账号及各状态位计数"""
+        return self.account_state.debug(str(market_id))
 
     def get_scheduler_status(self) -> Dict:
         """获取调度线程状态"""
         return {
             'running': self.running and self.scanner_thread is not None and self.scanner_thread.is_alive(),
-            'running_accounts': self.get_running_accounts()
+            'running_accounts': self.get_running_accounts(),
+            'pools': self.get_pool_gauges(),
+            'presign': self.presign_cache.stats(),
+            'dispatch': self.dispatch_planner.stats(),
+            'shards': self.shard_pool.status() if self.shard_pool else [],
+            'window_active': self.window_active,
+            'order_store': self.order_store.stats(),
+            'redeem_worker': self.redeem_worker.status(),
+            'balance': self.balance_refresher.stats(),
+            'clock': exchange_clock.status(),
+            'market_data': market_data_client.status(),
+            'price_board': price_board.stats(),
+            'market_params': market_params.stats(),
+            'positions_cache': positions_cache.stats(),
+            'position_book': self.position_book_stats(),
+            'order_ledger': order_ledger.stats(),
+            'state': self.state_store.status()
+        }
+    
+    def get_pool_gauges(self) -> Dict:
+        """各线程池的排队深度与活跃线程数"""
+        return {
+            'order': self.order_pool.gauges(),
+            'read': self.read_pool.gauges(),
+            'redeem': self.redeem_pool.gauges(),
+            'sell': self.sell_pool.gauges(),
+            'presign': self.presign_pool.gauges()
         }
     
     def redeem_all_accounts(self) -> Dict:
         """手动触发所有运行账号的索取（并发执行）"""
-        if not self.bots:
+        account_count = len(self._running_account_ids())
+        if not account_count:
             return {'success': False, 'message': '没有运行中的账号'}
         
         try:
             self._log_global(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 手动触发索取（所有运行账号，并发执行）...")
             self._redeem_all_accounts_concurrent()
-            return {'success': True, 'message': f'已为 {len(self.bots)} 个账号触发索取'}
+            return {'success': True, 'message': f'已为 {account_count} 个账号触发索取'}
         except Exception as e:
             return {'success': False, 'message': f'索取失败: {str(e)}'}
     
     def sell_all_accounts(self) -> Dict:
         """手动触发所有运行账号的出售（并发执行）"""
-        if not self.bots:
+        if not self._running_account_ids():
             return {'success': False, 'message': '没有运行中的账号'}
         
         try:
@@ -403,65 +1095,183 @@ class TaskScheduler:
             return {'success': False, 'message': f'出售失败: {str(e)}'}
     
     def _sell_all_accounts_concurrent(self) -> Dict:
-        """并发执行所有运行账号的出售"""
-        if not self.bots:
+        """并发执行所有运行账号的出售
+        
+        先汇总所有账号的持仓，由出售计划按 token 拉取一次订单簿并计算各账号的限价与数量，
+        再按计划并发出售（分片模式下持仓收集与出售由各分片执行，计划在协调者生成）。
+        """
+        if not self._running_account_ids():
             return {'success': False, 'sold_count': 0, 'failed_count': 0, 'message': '没有运行中的账号'}
         
+        if self.sharded:
+            positions = self.shard_pool.collect_positions()
+        else:
+            positions = self.collect_positions_local()
+        
+        scan_bot = self._get_scan_bot()
+        plan = self.liquidation_planner.plan(positions, scan_bot.get_bid_levels)
+        stats = self.liquidation_planner.last_stats
+        self._log_global(f"     [出售计划] 账号 {stats['accounts']}, token {stats['tokens']}, "
+                         f"订单 {stats['orders']}, 缺少订单簿 {stats['books_missing']}")
+        
+        if self.sharded:
+            result = self.shard_pool.sell_planned(plan)
+        else:
+            result = self.sell_planned_local(plan)
+        self._log_global(f"     [并发出售完成] {result['message']}")
+        self._flush_account_stats()
+        return result
+    
+    def collect_positions_local(self, timeout: float = 60) -> Dict[int, List[Dict]]:
+        """并发获取本进程内所有账号的持仓，返回 账号ID -> 持仓列表（失败或超时为空列表）"""
+        bots = self.bots.snapshot()
+        futures = {self.redeem_pool.submit(bot.get_book_positions): acc_id for acc_id, bot in bots.items()}
+        positions: Dict[int, List[Dict]] = {acc_id: [] for acc_id in bots}
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    positions[futures[future]] = future.result() or []
+                except Exception as e:
+                    bots[futures[future]]._log_error(f"获取持仓异常: {e}")
+        except TimeoutError:
+            self._log_global(f"     ⚠ 警告: 部分账号获取持仓超时（{timeout}秒）")
+        return positions
+    
+    def reconcile_positions_local(self) -> Dict:
+        """对账本进程内需要对账的账号的本地持仓簿，返回 账号ID -> 偏差列表（仅包含有偏差的账号）"""
+        bots = self.bots.snapshot()
+        futures = {
+            self.redeem_pool.submit(bot.reconcile_positions): acc_id
+            for acc_id, bot in bots.items() if bot.position_book.needs_reconcile()
+        }
+        drift = {}
+        for future in as_completed(futures):
+            try:
+                account_drift = future.result()
+            except Exception:
+                continue
+            if account_drift:
+                drift[futures[future]] = account_drift
+        if drift:
+            self._log_global(f"     [持仓对账] {len(drift)} 个账号本地持仓与 /positions 不一致: {list(drift)}")
+        return drift
+    
+    def collect_stats_local(self) -> Dict[int, Dict]:
+        """取出本进程内各账号自上次以来的统计增量（没有变化的账号不包含在内）"""
+        deltas = {}
+        for acc_id, bot in self.bots.snapshot().items():
+            delta = bot.stats.drain()
+            if delta:
+                deltas[acc_id] = delta
+        return deltas
+    
+    def _flush_account_stats(self):
+        """把各账号（本进程或各分片）的统计增量合并进账号数据并保存
+
+        扫描线程、后台索取与停止账号都会调用，同一时间只有一个写入；
+        写入失败时已取出的增量保留在调度器中，下次写入时一并合并。
+        """
+        self._last_stats_flush = time.time()
+        if self.account_manager is None or (self.sharded and self.shard_pool is None):
+            return
+        with self._stats_lock:
+            try:
+                deltas = self.shard_pool.collect_stats() if self.sharded else self.collect_stats_local()
+            except Exception as e:
+                self._log_global(f"  收集账号统计失败: {e}")
+                return
+            for acc_id, delta in deltas.items():
+                unsaved = self._unsaved_stats.get(acc_id)
+                self._unsaved_stats[acc_id] = merge_stats(unsaved, delta) if unsaved else delta
+            if not self._unsaved_stats:
+                return
+            try:
+                self.account_manager.apply_stats(self._unsaved_stats)
+            except Exception as e:
+                self._log_global(f"  写入账号统计失败（{len(self._unsaved_stats)} 个账号的增量保留到下次写入）: {e}")
+                return
+            self._unsaved_stats = {}
+    
+    def reconcile_positions_async(self):
+        """在后台线程中对账（分片收到对账命令时调用，不阻塞命令循环）"""
+        threading.Thread(target=self.reconcile_positions_local, daemon=True, name="position-reconcile").start()
+    
+    def position_book_stats(self) -> Dict:
+        """本进程内各账号本地持仓簿的汇总指标"""
+        books = [bot.position_book.stats() for bot in self.bots.snapshot().values()]
+        return {
+            'accounts': len(books),
+            'tokens': sum(b['tokens'] for b in books),
+            'fills': sum(b['fills'] for b in books),
+            'reconciles': sum(b['reconciles'] for b in books),
+            'drift_events': sum(b['drift_events'] for b in books),
+            'dirty': sum(1 for b in books if b['dirty'])
+        }
+    
+    def sell_planned_local(self, plan: Dict[int, List[Dict]]) -> Dict:
+        """按出售计划并发执行本进程内各账号的出售"""
         total_sold = 0
         total_failed = 0
         account_results = []
         
-        # 使用线程池并发执行出售
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {}
-            for acc_id, bot in list(self.bots.items()):
-                future = executor.submit(self._sell_for_account, acc_id, bot)
-                futures[future] = acc_id
-            
-            # 等待所有任务完成
-            timeout = 60  # 60秒超时
-            try:
-                for future in as_completed(futures, timeout=timeout):
-                    acc_id = futures[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            sold = result.get('sold_count', 0)
-                            failed = result.get('failed_count', 0)
-                            total_sold += sold
-                            total_failed += failed
-                            account_results.append({
-                                'account_id': acc_id,
-                                'sold_count': sold,
-                                'failed_count': failed
-                            })
-                    except Exception as e:
-                        total_failed += 1
-                        bot = self.bots.get(acc_id)
-                        if bot:
-                            bot._log_error(f"出售异常: {e}")
-            except TimeoutError:
-                remaining = len(futures) - len(account_results)
-                if remaining > 0:
-                    total_failed += remaining
-                    self._log_global(f"     ⚠ 警告: {remaining} 个账号出售超时（{timeout}秒）")
-        
-        message = f"并发出售完成: 总成功 {total_sold}, 总失败 {total_failed}, 账号数 {len(self.bots)}"
-        self._log_global(f"     [并发出售完成] {message}")
+        # 使用常驻索取池并发执行出售（与下单池隔离）
+        bots = self.bots.snapshot()
+        futures = {}
+        for acc_id, orders in plan.items():
+            bot = bots.get(acc_id)
+            if bot is None:
+                continue
+            future = self.redeem_pool.submit(self._sell_for_account, acc_id, bot, orders)
+            futures[future] = acc_id
+        
+        # 等待所有任务完成
+        timeout = 60  # 60秒超时
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                acc_id = futures[future]
+                try:
+                    result = future.result()
+                    if result:
+                        sold = result.get('sold_count', 0)
+                        failed = result.get('failed_count', 0)
+                        total_sold += sold
+                        total_failed += failed
+                        account_results.append({
+                            'account_id': acc_id,
+                            'sold_count': sold,
+                            'failed_count': failed,
+                            'resting_size': result.get('resting_size', 0.0),
+                            'token_results': result.get('token_results', [])
+                        })
+                except Exception as e:
+                    total_failed += 1
+                    bot = bots.get(acc_id)
+                    if bot:
+                        bot._log_error(f"出售异常: {e}")
+        except TimeoutError:
+            remaining = len(futures) - len(account_results)
+            if remaining > 0:
+                total_failed += remaining
+                self._log_global(f"     ⚠ 警告: {remaining} 个账号出售超时（{timeout}秒）")
+        
+        resting_size = round(sum(r['resting_size'] for r in account_results), 6)
+        message = (f"并发出售完成: 总成功 {total_sold}, 总失败 {total_failed}, 账号数 {len(futures)}, "
+                   f"挂单未成交 {resting_size}")
         
         return {
             'success': total_sold > 0,
             'sold_count': total_sold,
             'failed_count': total_failed,
-            'account_count': len(self.bots),
+            'resting_size': resting_size,
+            'account_count': len(futures),
             'account_results': account_results,
             'message': message
         }
     
-    def _sell_for_account(self, acc_id: int, bot: TradingBot) -> Optional[Dict]:
-        """为单个账号执行出售（在线程池中执行）"""
+    def _sell_for_account(self, acc_id: int, bot: TradingBot, orders: List[Dict]) -> Optional[Dict]:
+        """按计划为单个账号执行出售（在线程池中执行）"""
         try:
-            return bot.sell_all_positions(verbose=True)
+            return bot.sell_planned(orders, verbose=True)
         except Exception as e:
             bot._log_error(f"出售异常: {e}")
             return {'success': False, 'sold_count': 0, 'failed_count': 0, 'message': f'出售异常: {str(e)}'}
@@ -484,13 +1294,14 @@ class TaskScheduler:
             return {'success': False, 'message': '下单方向必须是YES或NO'}
         
         # 确保选中的账号都已启动
-        missing_accounts = [acc_id for acc_id in account_ids if acc_id not in self.bots]
+        running_ids = set(self._running_account_ids())
+        missing_accounts = [acc_id for acc_id in account_ids if acc_id not in running_ids]
         if missing_accounts:
             return {'success': False, 'message': f'账号 {missing_accounts} 未启动，请先启动账号'}
         
         try:
             # 选择一个bot用于获取市场数据
-            scan_bot = next(iter(self.bots.values()))
+            scan_bot = self._get_scan_bot()
             
             # 获取市场信息
             if market_url:
@@ -509,37 +1320,29 @@ class TaskScheduler:
                 markets = scan_bot.get_eth_15min_markets()
                 if not markets:
                     return {'success': False, 'message': '未找到15分钟预测市场'}
-                market = markets[0]  # 使用第一个市场
-                market_data = scan_bot.fetch_market_detail(market.get("id"))
-                if not market_data:
-                    market_data = market
-            
-            market_id = market_data.get("id")
-            market_id_str = str(market_id)
-            market_question = market_data.get("question", "未知市场")
+                # 使用第一个市场（列表已是完整市场数据，无需再拉取详情）
+                market_data = markets[0]
             
-            # 获取价格和token
-            yes_token_id, no_token_id = scan_bot.get_yes_no_token_ids(market_id, market_data)
-            if not yes_token_id or not no_token_id:
+            # 构建快照（token IDs 与价格只解析一次）
+            snapshot = scan_bot.build_market_snapshot(market_data, with_prices=False)
+            if snapshot is None:
                 return {'success': False, 'message': '无法获取市场token IDs'}
+            market_question = snapshot.question
             
-            yes_price, no_price = scan_bot.get_yes_no_prices_via_clob_spreads(market_id, market_data)
-            if yes_price is None or no_price is None:
+            scan_bot.get_yes_no_prices_via_clob_spreads(snapshot.market_id, snapshot=snapshot)
+            if not snapshot.has_prices:
                 return {'success': False, 'message': '无法获取市场价格'}
             
             # 根据用户选择的方向下单
             if side == 'YES':
                 # YES/UP (绿色)
                 side_label = "YES/UP (绿色)"
-                price_used = yes_price
-                token_used = yes_token_id
                 order_side = "UP"
             else:
                 # NO/DOWN (红色)
                 side_label = "NO/DOWN (红色)"
-                price_used = no_price
-                token_used = no_token_id
                 order_side = "DOWN"
+            price_used = snapshot.ask_for(order_side)
             
             self._log_global(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 手动下单: {market_question[:60]}...")
             self._log_global(f"     市场: {market_question}")
@@ -548,55 +1351,11 @@ class TaskScheduler:
             self._log_global(f"     账号数: {len(account_ids)}")
             
             # 构建订单信息
-            order_amount_usd = self.strategy_config['order_amount_usd']
-            order_size = order_amount_usd / price_used
-            order_info = {
-                "market_id": market_id,
-                "market_question": market_question,
-                "token_id": token_used,
-                "best_ask": price_used,
-                "order_size": order_size,
-                "order_amount_usd": order_amount_usd,
-                "side": order_side
-            }
-            
-            # 并发下单
-            success_count = 0
-            fail_count = 0
+            order_info = snapshot.build_order_info(order_side, self.strategy_config['order_amount_usd'])
             
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = {}
-                for acc_id in account_ids:
-                    bot = self.bots.get(acc_id)
-                    if not bot:
-                        fail_count += 1
-                        continue
-                    future = executor.submit(
-                        self._place_order_for_account,
-                        acc_id, bot, order_info, side_label, market_id_str
-                    )
-                    futures[future] = acc_id
-                
-                timeout = 30
-                try:
-                    for future in as_completed(futures, timeout=timeout):
-                        acc_id = futures[future]
-                        try:
-                            success = future.result()
-                            if success:
-                                success_count += 1
-                            else:
-                                fail_count += 1
-                        except Exception as e:
-                            fail_count += 1
-                            bot = self.bots.get(acc_id)
-                            if bot:
-                                bot._log_error(f"下单异常: {e}")
-                except TimeoutError:
-                    remaining = len(futures) - (success_count + fail_count)
-                    if remaining > 0:
-                        fail_count += remaining
-                        self._log_global(f"     ⚠ 警告: {remaining} 个账号下单超时（{timeout}秒）")
+            # 并发下单（本进程常驻下单池或各分片进程）
+            success_count, fail_count = self._dispatch_orders(snapshot, order_info, side_label, account_ids)
+            self._flush_account_stats()
             
             message = f"手动下单完成 ({side_label}): 成功 {success_count}, 失败 {fail_count}, 总计 {len(account_ids)}"
             self._log_global(f"     [手动下单完成] {message}")
@@ -3,12 +3,13 @@
 """交易机器人核心模块（支持多账号和代理）"""
 import time
 import requests
+from concurrent.futures import wait, FIRST_COMPLETED
 import json
 from datetime import datetime
 from typing import Dict, Optional, Callable, List
 from web3 import Web3
 from py_clob_client.client import ClobClient
-from py_clob_client.clob_types import OrderArgs
+from py_clob_client.clob_types import OrderArgs, ApiCreds, CreateOrderOptions, PostOrdersArgs, OrderType
 from py_clob_client.order_builder.constants import BUY, SELL
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
@@ -18,13 +19,33 @@ requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 try:
     from .config import (
         CLOB_HOST, GAMMA_API_HOST, DATA_API_HOST, CHAIN_ID,
-        USDC_ADDRESS_POLYGON, CTF_ADDRESS, GNOSIS_SAFE_FACTORY, POLYMARKET_PROXY_FACTORY
+        USDC_ADDRESS_POLYGON, CTF_ADDRESS, GNOSIS_SAFE_FACTORY, POLYMARKET_PROXY_FACTORY,
+        ORDER_BATCH_WINDOW, ORDER_BATCH_MAX, SELL_CONCURRENCY_PER_ACCOUNT, LIQUIDATION_FLOOR_PRICE
     )
+    from .market_snapshot import MarketSnapshot, parse_market_end_ts
+    from .clock_sync import exchange_now
+    from .market_data_client import market_data_client
+    from .market_params import market_params
+    from .order_batcher import OrderBatcher
+    from .positions_cache import positions_cache
+    from .position_book import PositionBook, filled_from_result
+    from .order_ledger import order_ledger
+    from .account_stats import AccountStats
 except ImportError:
     from config import (
         CLOB_HOST, GAMMA_API_HOST, DATA_API_HOST, CHAIN_ID,
-        USDC_ADDRESS_POLYGON, CTF_ADDRESS, GNOSIS_SAFE_FACTORY, POLYMARKET_PROXY_FACTORY
+        USDC_ADDRESS_POLYGON, CTF_ADDRESS, GNOSIS_SAFE_FACTORY, POLYMARKET_PROXY_FACTORY,
+        ORDER_BATCH_WINDOW, ORDER_BATCH_MAX, SELL_CONCURRENCY_PER_ACCOUNT, LIQUIDATION_FLOOR_PRICE
     )
+    from market_snapshot import MarketSnapshot, parse_market_end_ts
+    from clock_sync import exchange_now
+    from market_data_client import market_data_client
+    from market_params import market_params
+    from order_batcher import OrderBatcher
+    from positions_cache import positions_cache
+    from position_book import PositionBook, filled_from_result
+    from order_ledger import order_ledger
+    from account_stats import AccountStats
 
 # 从pm.py复制的ABI和常量
 USDC_ABI = [
@@ -71,6 +92,15 @@ class TradingBot:
         self.builder_api_secret = account_data.get('builder_api_secret', '')
         self.builder_api_passphrase = account_data.get('builder_api_passphrase', '')
         self.proxy_ip = proxy_ip or account_data.get('proxy_ip', '')
+        # 已缓存的L2 API凭证（热重启时由调度器传入，跳过重新派生）
+        self.api_creds: Optional[ApiCreds] = None
+        cached_creds = account_data.get('api_creds')
+        if cached_creds:
+            self.api_creds = ApiCreds(
+                api_key=cached_creds['api_key'],
+                api_secret=cached_creds['api_secret'],
+                api_passphrase=cached_creds['api_passphrase']
+            )
         
         # 配置代理
         self.proxies = None
@@ -89,6 +119,30 @@ class TradingBot:
         # 状态回调
         self.status_callback: Optional[Callable] = None
         
+        # 最近一次 post_order 耗时（秒），供调度器调整下单池并发
+        self.last_post_latency: Optional[float] = None
+        
+        # 多进程签名引擎（由调度器注入；为None时在当前线程签名）
+        self.signing_engine = None
+        # 出售时逐 token 卖单使用的常驻线程池（由调度器注入；为None时逐笔顺序出售）
+        self.sell_pool = None
+        self.signature_type: Optional[int] = None
+        self.funder_address: Optional[str] = None
+        # 自动检测到的代理钱包地址（None 表示尚未检测，'' 表示未找到）
+        self._detected_proxy_wallet: Optional[str] = None
+        # 按本账号下单/索取结果增量维护的持仓，定期与 /positions 对账
+        self.position_book = PositionBook()
+        # 下单数/成交额/已实现盈亏等运行统计，由调度器定期合并进账号数据
+        self.stats = AccountStats()
+        
+        # 订单合并提交：短窗口内本账号的多笔订单通过批量下单接口一次提交（提交项为 PostOrdersArgs，各自带订单类型）
+        self.order_batcher = OrderBatcher(
+            post_one=lambda args: self.trading_client.post_order(args.order, args.orderType),
+            post_many=self._post_orders_batch,
+            window=ORDER_BATCH_WINDOW,
+            max_batch=ORDER_BATCH_MAX
+        )
+        
         self._init_clients()
     
     def _init_clients(self):
@@ -110,16 +164,18 @@ class TradingBot:
             
             # 初始化CLOB客户端
             if self.private_key:
-                # 创建临时客户端获取API凭证
-                temp_client = ClobClient(
-                    host=CLOB_HOST,
-                    key=self.private_key,
-                    chain_id=CHAIN_ID,
-                    signature_type=2
-                )
-                
-                # 获取API凭证
-                user_api_creds = temp_client.create_or_derive_api_creds()
+                if self.api_creds is None:
+                    # 创建临时客户端获取API凭证
+                    temp_client = ClobClient(
+                        host=CLOB_HOST,
+                        key=self.private_key,
+                        chain_id=CHAIN_ID,
+                        signature_type=2
+                    )
+                    
+                    # 获取API凭证
+                    self.api_creds = temp_client.create_or_derive_api_creds()
+                user_api_creds = self.api_creds
                 
                 # 确定钱包地址
                 if self.proxy_wallet_address:
@@ -128,6 +184,8 @@ class TradingBot:
                 else:
                     funder_address = self.account.address
                     signature_type = 0  # EOA
+                self.signature_type = signature_type
+                self.funder_address = funder_address
                 
                 # 创建交易客户端
                 self.trading_client = ClobClient(
@@ -150,6 +208,16 @@ class TradingBot:
         except Exception as e:
             self._log_error(f"初始化客户端失败: {e}")
     
+    def export_api_creds(self) -> Optional[Dict]:
+        """导出已派生的L2 API凭证（供调度状态快照缓存）"""
+        if self.api_creds is None:
+            return None
+        return {
+            'api_key': self.api_creds.api_key,
+            'api_secret': self.api_creds.api_secret,
+            'api_passphrase': self.api_creds.api_passphrase
+        }
+    
     def _log_status(self, message: str):
         """记录状态（同时输出到控制台和回调）"""
         log_msg = f"[账号{self.account_id}] {message}"
@@ -268,31 +336,11 @@ class TradingBot:
     def get_market_remaining_seconds(self, market_data):
         """计算市场剩余时间（秒）"""
         try:
-            end_time_fields = [
-                "endDate", "end_date", "endTime", "end_time",
-                "endDateTimestamp", "endDateTimestampSeconds",
-                "resolutionDate", "resolution_date"
-            ]
-            end_time = None
-            for field in end_time_fields:
-                if field in market_data:
-                    end_time = market_data[field]
-                    break
+            end_time = parse_market_end_ts(market_data)
             if end_time is None:
                 return None
             
-            if isinstance(end_time, (int, float)):
-                if end_time > 1e12:
-                    end_time = end_time / 1000.0
-            elif isinstance(end_time, str):
-                try:
-                    from dateutil import parser
-                    dt = parser.parse(end_time)
-                    end_time = dt.timestamp()
-                except:
-                    return None
-            
-            current_time = time.time()
+            current_time = exchange_now()
             remaining = end_time - current_time
             return max(0, remaining)
         except Exception as e:
@@ -363,13 +411,32 @@ class TradingBot:
             self._log_error(f"获取token IDs失败: {e}")
             return None, None
     
-    def get_yes_no_prices_via_clob_spreads(self, market_id, market_data=None):
-        """获取YES/NO价格"""
+    def get_yes_no_prices_via_clob_spreads(self, market_id, market_data=None, snapshot: Optional[MarketSnapshot] = None):
+        """获取YES/NO价格
+        
+        传入 snapshot 时直接使用快照中的 token IDs（不再重复解析市场数据），
+        并把获取到的最优买/卖价回填到快照中。
+        """
         try:
-            yes_id, no_id = self.get_yes_no_token_ids(market_id, market_data)
+            if snapshot is not None:
+                yes_id, no_id = snapshot.yes_token_id, snapshot.no_token_id
+            else:
+                yes_id, no_id = self.get_yes_no_token_ids(market_id, market_data)
             if not yes_id or not no_id:
                 return None, None
             
+            # 本机行情服务可用时直接使用其推送的价格
+            quotes = market_data_client.quotes([yes_id, no_id], 'ask')
+            yes_quote = quotes.get(str(yes_id))
+            no_quote = quotes.get(str(no_id))
+            if yes_quote and no_quote:
+                if snapshot is not None:
+                    snapshot.yes_ask = yes_quote['ask']
+                    snapshot.no_ask = no_quote['ask']
+                    snapshot.yes_bid = yes_quote.get('bid')
+                    snapshot.no_bid = no_quote.get('bid')
+                return yes_quote['ask'], no_quote['ask']
+            
             # 优先使用客户端get_spreads
             spreads = None
             if self.client and hasattr(self.client, 'get_spreads'):
@@ -378,7 +445,7 @@ class TradingBot:
                 except Exception:
                     spreads = None
             
-            def extract(token_id):
+            def extract(token_id, fields=('ask', 'bestAsk', 'sell')):
                 if spreads is None:
                     return None
                 if isinstance(spreads, dict):
@@ -394,14 +461,18 @@ class TradingBot:
                     entry = None
                 
                 if isinstance(entry, dict):
-                    val = entry.get('ask') or entry.get('bestAsk') or entry.get('sell')
+                    val = None
+                    for field in fields:
+                        val = entry.get(field)
+                        if val:
+                            break
                     try:
                         return float(val) if val is not None else None
                     except Exception:
                         return None
-                if hasattr(entry, 'ask'):
+                if hasattr(entry, fields[0]):
                     try:
-                        return float(entry.ask)
+                        return float(getattr(entry, fields[0]))
                     except Exception:
                         return None
                 return None
@@ -476,15 +547,61 @@ class TradingBot:
             if no_price is None:
                 no_price = fetch_best_ask_from_book(no_id)
             
+            if snapshot is not None:
+                bid_fields = ('bid', 'bestBid', 'buy')
+                snapshot.yes_ask = yes_price
+                snapshot.no_ask = no_price
+                snapshot.yes_bid = extract(yes_id, bid_fields)
+                snapshot.no_bid = extract(no_id, bid_fields)
+            
             return yes_price, no_price
         except Exception as e:
             self._log_error(f"获取价格失败: {e}")
             return None, None
     
+    def build_market_snapshot(self, market_data: Dict, with_prices: bool = True) -> Optional[MarketSnapshot]:
+        """根据 Gamma 市场数据构建快照（每个市场每次扫描只构建一次）
+        
+        Args:
+            market_data: get_eth_15min_markets / fetch_market_detail 返回的完整市场数据
+            with_prices: 是否同时获取两侧最优买/卖价
+            
+        Returns:
+            MarketSnapshot，无法获取 token IDs 时返回None
+        """
+        if not isinstance(market_data, dict):
+            return None
+        market_id = market_data.get("id")
+        yes_token_id, no_token_id = self.get_yes_no_token_ids(market_id, market_data)
+        if not yes_token_id or not no_token_id:
+            return None
+        
+        snapshot = MarketSnapshot(
+            market_id=market_id,
+            question=market_data.get("question", "未知市场"),
+            yes_token_id=yes_token_id,
+            no_token_id=no_token_id,
+            end_ts=parse_market_end_ts(market_data)
+        )
+        if with_prices:
+            self.get_yes_no_prices_via_clob_spreads(market_id, market_data, snapshot=snapshot)
+        return snapshot
+    
     def get_eth_15min_markets(self):
         """获取ETH 15分钟市场（使用代理，只返回剩余时间在0-15分钟之间的市场）"""
+        # 本机行情服务可用时使用其发现的市场
+        shared_markets = market_data_client.markets()
+        if shared_markets is not None:
+            markets = []
+            for market in shared_markets:
+                if "eth-updown-15m-" not in market.get("slug", "").lower():
+                    continue
+                remaining_seconds = self.get_market_remaining_seconds(market)
+                if remaining_seconds is not None and 0 < remaining_seconds <= 900:
+                    markets.append(market)
+            return markets
         try:
-            current_time = time.time()
+            current_time = exchange_now()
             interval_start = int(current_time // 900) * 900
             markets = []
             
@@ -697,16 +814,121 @@ class TradingBot:
             traceback.print_exc()
             return False, False, 0.0, 0.0, None
     
-    def place_buy_order(self, order_info: Dict, strategy_config: Dict, auto_confirm=True, skip_balance_check=True, verbose=False) -> Optional[Dict]:
-        """下单（买入YES或NO份额）- 快速模式，跳过所有不必要的检查"""
+    def _create_signed_order(self, token_id: str, price: float, size: float, side: str):
+        """创建并签名订单（配置了签名引擎时在进程池中签名），失败返回None
+        
+        tick size / neg_risk / 手续费率取自进程内共享的参数缓存（通常在发现市场时已预取），
+        一次传入签名，每笔订单只签名一次。
+        """
+        params = market_params.resolve(token_id, self.trading_client)
+        if params is None:
+            # 参数查询失败：交给 create_order 自行查询（仍只签名一次）
+            try:
+                return self.trading_client.create_order(OrderArgs(token_id=token_id, price=price, size=size, side=side))
+            except Exception as e:
+                self._log_error(f"创建订单失败: {e}")
+                return None
+        price = params.clamp_price(price)
+        
+        if self.signing_engine is not None:
+            try:
+                return self.signing_engine.sign(
+                    self.private_key, self.signature_type, self.funder_address, token_id,
+                    price, size, side, tick_size=params.tick_size, neg_risk=params.neg_risk,
+                    fee_rate_bps=params.fee_rate_bps
+                )
+            except Exception as e:
+                self._log_error(f"签名引擎签名失败，回退到本线程签名: {e}")
+        
+        order_args = OrderArgs(
+            token_id=token_id,
+            price=price,
+            size=size,
+            side=side,
+            fee_rate_bps=params.fee_rate_bps,
+        )
+        options = CreateOrderOptions(tick_size=params.tick_size, neg_risk=params.neg_risk)
+        try:
+            # 直接用订单构建器签名（与签名引擎一致），不经 create_order 的网络查询
+            builder = getattr(self.trading_client, 'builder', None)
+            if builder is not None:
+                return builder.create_order(order_args, options)
+            return self.trading_client.create_order(order_args, options)
+        except Exception as e:
+            self._log_error(f"创建订单失败: {e}")
+            return None
+    
+    def create_buy_order(self, token_id: str, order_size: float):
+        """创建并签名买单（不提交），失败返回None
+        
+        供 place_buy_order 和调度器的预签名缓存共用。
+        """
+        if not self.trading_client or not token_id or not order_size:
+            return None
+        
+        market_price = 0.99  # 市价单，确保立即成交
+        return self._create_signed_order(token_id, market_price, order_size, BUY)
+    
+    def _post_orders_batch(self, args: List[PostOrdersArgs]) -> List:
+        """批量下单接口：一次请求提交多笔已签名订单，返回按顺序的结果"""
+        return self.trading_client.post_orders(args)
+    
+    def post_signed_order(self, order, token_id: Optional[str] = None, side: str = BUY,
+                          size: Optional[float] = None, price: Optional[float] = None,
+                          market_id=None) -> Optional[Dict]:
+        """提交已签名订单（立即发送，只与本账号已在排队的订单合并），并记录提交耗时
+        
+        触发买入每个账号只有一笔订单，不等待合并窗口；出售等多笔订单仍按窗口合并。
+        传入 token_id 时按返回结果更新本地持仓簿；每次提交都写入下单流水。
+        """
+        post_start = time.time()
+        try:
+            result = self.order_batcher.post(PostOrdersArgs(order=order, orderType=OrderType.GTC), window=0)
+        except Exception as e:
+            self.last_post_latency = time.time() - post_start
+            self._record_order(token_id, side, price, size, None, self.last_post_latency, market_id, str(e))
+            # 提交异常（超时、批量响应无法对应等）时订单可能已成交，持仓需要对账
+            self.position_book.mark_dirty()
+            raise
+        self.last_post_latency = time.time() - post_start
+        self._record_order(token_id, side, price, size, result, self.last_post_latency, market_id)
+        if token_id is not None:
+            self.position_book.apply_order_result(token_id, side, result, size)
+        if result:
+            self._log_status("下单成功")
+            self.invalidate_positions()
+        else:
+            self._log_error("下单失败")
+        return result if result else None
+    
+    def place_buy_order(self, order_info: Dict, strategy_config: Dict, auto_confirm=True, skip_balance_check=True, verbose=False, signed_order=None) -> Optional[Dict]:
+        """下单（买入YES或NO份额）- 快速模式，跳过所有不必要的检查
+        
+        传入 signed_order（预签名订单）时跳过创建与签名，直接提交。
+        本次没有实际提交（签名失败、参数缺失等）时 last_post_latency 为None。
+        """
+        self.last_post_latency = None
         try:
             if not self.private_key:
                 return None
             
+            # 检查是否有交易客户端
+            if not self.trading_client:
+                return None
+            
             # 快速获取订单参数
             token_id = order_info.get('token_id') or order_info.get('yes_token_id') or order_info.get('condition_id')
             best_ask = order_info.get('best_ask') or order_info.get('yes_price')
             order_size = order_info.get('order_size')
+            market_id = order_info.get('market_id')
+            
+            # 已有预签名订单：只需提交
+            if signed_order is not None:
+                try:
+                    return self.post_signed_order(signed_order, token_id, BUY, order_size, best_ask, market_id)
+                except Exception:
+                    return None
+            
             order_amount_usd = order_info.get('order_amount_usd', strategy_config.get('order_amount_usd', 2.0))
             
             if not token_id or best_ask is None:
@@ -716,49 +938,15 @@ class TradingBot:
             if order_size is None:
                 order_size = order_amount_usd / best_ask
             
-            # 检查是否有交易客户端
-            if not self.trading_client:
-                return None
-            
             # 快速下单：直接创建订单，不检查余额、不获取市场信息
             try:
-                # 使用默认值
-                tick_size = "0.01"
-                neg_risk = True
-                market_price = 0.99  # 市价单，确保立即成交
-                
-                order_args = OrderArgs(
-                    token_id=token_id,
-                    price=market_price,
-                    size=order_size,
-                    side=BUY,
-                )
-                
-                # 创建订单（快速模式：直接创建，失败才尝试options）
-                try:
-                    order = self.trading_client.create_order(order_args)
-                except Exception:
-                    # 如果失败，尝试使用options
-                    class SimpleOptions:
-                        def __init__(self, tick_size, neg_risk):
-                            self.tick_size = tick_size
-                            self.neg_risk = neg_risk
-                    try:
-                        options = SimpleOptions(tick_size, neg_risk)
-                        order = self.trading_client.create_order(order_args, options)
-                    except Exception:
-                        return None
-                
+                order = self.create_buy_order(token_id, order_size)
                 if not order:
+                    self._record_order(token_id, BUY, best_ask, order_size, None, None, market_id, '签名失败')
                     return None
                 
                 # 直接提交订单
-                result = self.trading_client.post_order(order)
-                if result:
-                    self._log_status("下单成功")
-                else:
-                    self._log_error("下单失败")
-                return result if result else None
+                return self.post_signed_order(order, token_id, BUY, order_size, best_ask, market_id)
                     
             except Exception:
                 return None
@@ -827,20 +1015,17 @@ class TradingBot:
             if not self.private_key or not self.w3 or not self.account:
                 return False
             
-            wallet_address = self.proxy_wallet_address or self.account.address
+            # 本地持仓簿已对账且为空时无需查询 /positions
+            if not self.position_book.needs_reconcile() and self.position_book.is_empty():
+                return False
             
-            # 获取可赎回持仓
-            url = f"{DATA_API_HOST}/positions"
-            params = {"user": wallet_address}
-            resp = self._make_request('GET', url, params=params)
+            wallet_address = self.proxy_wallet_address or self.account.address
             
-            if resp.status_code != 200:
+            # 获取可赎回持仓（与出售、状态查询共用持仓缓存）
+            positions_data = self._fetch_positions_data(wallet_address)
+            if positions_data is None:
                 return False
             
-            positions_data = resp.json()
-            if isinstance(positions_data, dict):
-                positions_data = positions_data.get("data", []) or positions_data.get("positions", [])
-            
             redeemable_positions = [p for p in positions_data if p.get("redeemable") == True]
             if not redeemable_positions:
                 return False
@@ -912,6 +1097,11 @@ class TradingBot:
                     response = relayer_client.execute(safe_transactions, "Auto redeem")
                     if response:
                         self._log_status("索取成功")
+                        self.invalidate_positions()
+                        self.position_book.apply_redeem(
+                            p.get("asset") or p.get("tokenId") or p.get("token_id") for p in redeemable_positions
+                        )
+                        self.stats.on_redeem(redeemable_positions)
                         return True
                     else:
                         self._log_error("索取失败")
@@ -927,17 +1117,79 @@ class TradingBot:
             self._log_error(f"自动赎回失败: {e}")
             return False
     
+    def _request_positions(self, wallet_address: str) -> Optional[List[Dict]]:
+        """请求 Data API /positions，返回原始持仓列表；请求失败返回None"""
+        url = f"{DATA_API_HOST}/positions"
+        params = {"user": wallet_address}
+        resp = self._make_request('GET', url, params=params)
+        
+        if resp.status_code != 200:
+            self._log_error(f"查询持仓失败，HTTP {resp.status_code}")
+            try:
+                error_text = resp.text[:200]
+                self._log_error(f"错误响应: {error_text}")
+            except:
+                pass
+            return None
+        
+        positions_data = resp.json()
+        if isinstance(positions_data, dict):
+            # 尝试从字典中提取列表
+            positions_data = positions_data.get("data", []) or positions_data.get("positions", []) or positions_data.get("results", [])
+        if not isinstance(positions_data, list):
+            self._log_error(f"返回数据不是列表格式: {type(positions_data)}")
+            self._log_error(f"原始数据: {str(positions_data)[:500]}")
+            return None
+        return positions_data
+    
+    def _fetch_positions_data(self, wallet_address: str) -> Optional[List[Dict]]:
+        """通过进程内持仓缓存获取钱包的原始持仓列表"""
+        return positions_cache.fetch(wallet_address, lambda: self._request_positions(wallet_address))
+    
+    def invalidate_positions(self):
+        """本账号下单成交或索取后使持仓缓存失效"""
+        positions_cache.invalidate(self.proxy_wallet_address, self._detected_proxy_wallet,
+                                   self.account.address if self.account else None)
+    
     def get_positions(self, verbose=False) -> List[Dict]:
-        """获取当前持仓（使用Data API的/positions端点）
+        """获取当前持仓（使用Data API的/positions端点），并与本地持仓簿对账
         
         Returns:
             持仓列表，每个持仓包含 token_id, balance 等信息
         """
+        positions = self._load_positions(verbose)
+        if positions is None:
+            return []
+        self._reconcile_book(positions)
+        return positions
+    
+    def reconcile_positions(self) -> Optional[List[Dict]]:
+        """查询 /positions 并对账本地持仓簿，返回偏差列表；查询失败返回None"""
+        positions = self._load_positions()
+        if positions is None:
+            return None
+        return self._reconcile_book(positions)
+    
+    def _reconcile_book(self, positions: List[Dict]) -> List[Dict]:
+        self.stats.note_markets(positions)
+        drift = self.position_book.reconcile(positions)
+        if drift:
+            self._log_status(f"本地持仓簿与 /positions 不一致 {len(drift)} 个token，已按 /positions 更新")
+        return drift
+    
+    def get_book_positions(self) -> List[Dict]:
+        """出售/索取使用的持仓：本地持仓簿在对账周期内直接返回，否则先查询 /positions 对账"""
+        if self.position_book.needs_reconcile():
+            return self.get_positions()
+        return self.position_book.positions()
+    
+    def _load_positions(self, verbose=False) -> Optional[List[Dict]]:
+        """查询并解析 /positions，查询失败返回None（与没有持仓区分）"""
         positions = []
         try:
             if not self.w3 or not self.account:
                 self._log_status("获取持仓跳过：账号未正确初始化")
-                return positions
+                return None
             
             # 确定要查询的钱包地址（优先使用代理钱包地址）
             wallet_address = None
@@ -948,7 +1200,10 @@ class TradingBot:
                 self._log_status(f"使用配置的代理钱包地址: {wallet_address}")
             # 2. 如果没有配置，尝试自动检测代理钱包地址
             elif self.account and self.account.address:
-                detected_proxy = self.get_proxy_wallet_address(self.account.address)
+                # 检测结果按账号缓存，避免每次查询持仓都做链上查询
+                if self._detected_proxy_wallet is None:
+                    self._detected_proxy_wallet = self.get_proxy_wallet_address(self.account.address) or ''
+                detected_proxy = self._detected_proxy_wallet
                 if detected_proxy:
                     wallet_address = detected_proxy
                     self._log_status(f"自动检测到代理钱包地址: {wallet_address}")
@@ -959,39 +1214,14 @@ class TradingBot:
             
             if not wallet_address:
                 self._log_error("无法确定钱包地址，无法查询持仓")
-                return positions
+                return None
             
             self._log_status(f"查询持仓，使用地址: {wallet_address}")
             
-            # 使用Data API获取持仓
-            url = f"{DATA_API_HOST}/positions"
-            params = {"user": wallet_address}
-            resp = self._make_request('GET', url, params=params)
-            
-            if resp.status_code != 200:
-                self._log_error(f"查询持仓失败，HTTP {resp.status_code}")
-                try:
-                    error_text = resp.text[:200]
-                    self._log_error(f"错误响应: {error_text}")
-                except:
-                    pass
-                return positions
-            
-            positions_data = resp.json()
-            
-            # 调试：显示原始返回数据
-            self._log_status(f"Data API返回数据类型: {type(positions_data)}")
-            if isinstance(positions_data, dict):
-                self._log_status(f"返回数据键: {list(positions_data.keys())}")
-                # 尝试从字典中提取列表
-                positions_data = positions_data.get("data", []) or positions_data.get("positions", []) or positions_data.get("results", [])
-            elif isinstance(positions_data, list):
-                self._log_status(f"返回列表长度: {len(positions_data)}")
-            
-            if not isinstance(positions_data, list):
-                self._log_error(f"返回数据不是列表格式: {type(positions_data)}")
-                self._log_error(f"原始数据: {str(positions_data)[:500]}")
-                return positions
+            # 使用Data API获取持仓（短时间缓存，同一钱包并发查询只请求一次）
+            positions_data = self._fetch_positions_data(wallet_address)
+            if positions_data is None:
+                return None
             
             self._log_status(f"解析后的持仓列表长度: {len(positions_data)}")
             
@@ -1064,118 +1294,255 @@ class TradingBot:
             self._log_error(f"获取持仓失败: {e}")
             import traceback
             traceback.print_exc()
-            return positions
+            return None
     
-    def sell_all_positions(self, verbose=False) -> Dict:
-        """出售所有持仓（立即卖出）
+    def _record_order(self, token_id, side: str, price: Optional[float], size: Optional[float], result,
+                      latency: Optional[float], market_id=None, error: Optional[str] = None):
+        """写入下单流水（只入队，由后台线程批量写入）并更新账号统计"""
+        if isinstance(result, dict):
+            status = result.get('status')
+            order_id = result.get('orderID') or result.get('order_id') or result.get('id')
+            error = error or result.get('errorMsg') or result.get('error_message') or result.get('error') or None
+        else:
+            status = order_id = None
+        order_ledger.record({
+            'account_id': self.account_id,
+            'market_id': str(market_id) if market_id is not None else None,
+            'token_id': str(token_id) if token_id is not None else None,
+            'side': side,
+            'price': price,
+            'size': round(size, 4) if size is not None else None,
+            'latency': round(latency, 4) if latency is not None else None,
+            'success': error is None and self._order_succeeded(result),
+            'status': status,
+            'order_id': order_id,
+            'filled': filled_from_result(side, result),
+            'error': error
+        })
+        self.stats.on_order(token_id, side, result if error is None else None, price, size)
+    
+    @staticmethod
+    def _order_succeeded(result) -> bool:
+        """根据 post_order / post_orders 返回的单笔结果判断订单是否提交成功"""
+        if not result:
+            return False
+        if isinstance(result, dict):
+            success = result.get('success', True)
+            error_msg = result.get('errorMsg') or result.get('error_message') or result.get('error')
+            status = result.get('status')
+            if not success or error_msg:
+                return False
+            if status and status.lower() in ['filled', 'open', 'pending']:
+                return True
+            return bool(result.get('orderID') or result.get('order_id') or result.get('id'))
+        if hasattr(result, 'success'):
+            return bool(result.success)
+        # 无法识别的响应不计为成功
+        return False
+    
+    def _sell_position(self, token_id: str, balance: float, price: float = 0.01, verbose=False,
+                       market_id=None, order_type: Optional[str] = None) -> Dict:
+        """签名并提交单个 token 的卖单
         
         Args:
-            verbose: 是否输出详细日志
+            order_type: 订单类型，默认 GTC；为 FAK 时（出售计划的清算价部分）立即成交能成交的部分，
+                未成交的部分由交易所撤销，随后按兜底价补卖
+        
+        Returns:
+            {'token_id': str, 'price': float, 'size': float, 'order_type': str, 'success': bool, 'latency': float,
+             'filled': float|None, 'resting': float|None}，失败时附带 'error'；
+            filled / resting 为已成交 / 仍挂在订单簿上的数量（结果未知时为None）。
+            FAK 有未成交部分时附带 'unfilled'（未成交数量）与 'remainder'（按兜底价补卖的结果）
+        """
+        started = time.time()
+        order_type = order_type or OrderType.GTC
+        result = {'token_id': token_id, 'price': price, 'size': balance, 'order_type': order_type, 'success': False}
+        response = None
+        # 提交结果已知（成功或被明确拒绝）；异常/超时时订单可能已成交，结果未知
+        known = False
+        try:
+            order = self._create_signed_order(token_id, price, balance, SELL)
+            if not order:
+                result['error'] = '签名失败'
+                known = True
+            else:
+                try:
+                    response = self.order_batcher.post(PostOrdersArgs(order=order, orderType=order_type))
+                except Exception as e:
+                    # 4xx 为交易所明确拒绝（如 FAK 没有可成交的买单）；其余异常时卖单可能已成交
+                    status_code = getattr(e, 'status_code', None)
+                    known = status_code is not None and 400 <= status_code < 500
+                    if not known:
+                        self.position_book.mark_dirty()
+                    raise
+                known = True
+                # FAK 可能部分成交，结果缺少成交数量时不能按下单数量记账
+                self.position_book.apply_order_result(token_id, SELL, response,
+                                                      balance if order_type == OrderType.GTC else None)
+                result['success'] = self._order_succeeded(response)
+        except Exception as e:
+            result['error'] = str(e)
+            if verbose:
+                self._log_error(f"出售 Token {token_id[:16]}... 时出错: {e}")
+        result['latency'] = round(time.time() - started, 4)
+        self._record_order(token_id, SELL, price, balance, response, result['latency'], market_id, result.get('error'))
+        
+        result['filled'], result['resting'] = self._sell_fill(response, balance, order_type) if known else (None, None)
+        if order_type != OrderType.GTC and result['filled'] is not None:
+            unfilled = balance - result['filled']
+            if unfilled > 1e-6:
+                result['unfilled'] = round(unfilled, 6)
+                remainder = self._sell_position(token_id, unfilled, LIQUIDATION_FLOOR_PRICE, verbose, market_id)
+                result['remainder'] = remainder
+                result['resting'] = remainder['resting']
+                result['success'] = result['success'] or remainder['success']
+        return result
+    
+    def _sell_fill(self, response, size: float, order_type: str) -> tuple:
+        """卖单的 (已成交数量, 挂单数量)；GTC 撮合结果缺少成交数量时视为全部成交，FAK 视为未知(None)"""
+        if not self._order_succeeded(response):
+            return 0.0, 0.0
+        if not isinstance(response, dict):
+            return None, None
+        filled = filled_from_result(SELL, response)
+        status = str(response.get('status') or '').lower()
+        if status == 'matched':
+            if filled is None and order_type == OrderType.GTC:
+                filled = size
+            return filled, 0.0
+        if order_type != OrderType.GTC:
+            # FAK 延迟撮合：成交数量要等对账才知道，不补卖
+            return None, 0.0
+        # GTC 未撮合的部分挂在订单簿上
+        filled = filled or 0.0
+        return filled, round(size - filled, 6)
+    
+    def get_bid_levels(self, token_id: str) -> Optional[List[tuple]]:
+        """通过 /book 接口获取买盘档位 [(price, size)]，按价格从高到低；失败返回None"""
+        try:
+            url = f"{CLOB_HOST}/book?token_id={token_id}"
+            resp = self._make_request('GET', url)
+            if resp.status_code != 200:
+                return None
+            data = resp.json()
+            bids = data.get('bids') if isinstance(data, dict) else None
+            if not isinstance(bids, list):
+                return None
+            levels = []
+            for level in bids:
+                try:
+                    price = float(level.get('price'))
+                    size = float(level.get('size'))
+                except (TypeError, ValueError, AttributeError):
+                    continue
+                if price > 0 and size > 0:
+                    levels.append((price, size))
+            levels.sort(key=lambda level: level[0], reverse=True)
+            return levels
+        except Exception:
+            return None
+    
+    def sell_planned(self, orders: List[Dict], verbose=False, total_count: Optional[int] = None) -> Dict:
+        """按给定的限价与数量出售持仓
+        
+        Args:
+            orders: [{'token_id', 'price', 'size', 'market_id'(可选)}]，由 sell_all_positions 或跨账号出售计划生成
+            total_count: 持仓总数（仅用于日志与返回值），默认等于订单数
             
         Returns:
-            {'success': bool, 'sold_count': int, 'failed_count': int, 'message': str}
+            {'success': bool, 'sold_count': int, 'failed_count': int, 'total_count': int,
+             'resting_size': float, 'token_results': [_sell_position 的返回值], 'message': str}
         """
         try:
             if not self.trading_client:
                 return {'success': False, 'sold_count': 0, 'failed_count': 0, 'message': '交易客户端未初始化'}
+            if total_count is None:
+                total_count = len(orders)
             
-            # 获取持仓
-            positions = self.get_positions(verbose=False)
-            
-            if not positions:
-                return {'success': True, 'sold_count': 0, 'failed_count': 0, 'message': '没有持仓'}
-            
-            sold_count = 0
-            failed_count = 0
+            # 各订单在共用的出售池中并发签名与提交（同时提交的订单由 order_batcher 合并为批量请求），
+            # 单账号同时在池中的订单数不超过 SELL_CONCURRENCY_PER_ACCOUNT，完成一笔再提交下一笔
+            def sell(o):
+                return self._sell_position(o['token_id'], o['size'], o['price'], verbose, o.get('market_id'),
+                                           o.get('order_type'))
             
-            for pos in positions:
-                token_id = pos.get('token_id')
-                balance = pos.get('balance')
+            if self.sell_pool is None:
+                token_results = [sell(o) for o in orders]
+            else:
+                token_results = [None] * len(orders)
+                queued = iter(enumerate(orders))
+                running = {}
                 
-                if not token_id or not balance or balance <= 0:
-                    continue
+                def submit_next():
+                    for index, o in queued:
+                        running[self.sell_pool.submit(sell, o)] = index
+                        return
                 
-                try:
-                    # 快速卖出：直接使用固定低价（市价单）
-                    market_price = 0.01
-                    
-                    order_args = OrderArgs(
-                        token_id=token_id,
-                        price=market_price,
-                        size=balance,
-                        side=SELL,
-                    )
-                    
-                    # 创建订单
-                    order = None
-                    try:
-                        order = self.trading_client.create_order(order_args)
-                    except Exception:
-                        # 尝试使用options
-                        class SimpleOptions:
-                            def __init__(self, tick_size, neg_risk):
-                                self.tick_size = tick_size
-                                self.neg_risk = neg_risk
-                        try:
-                            options = SimpleOptions("0.01", True)
-                            order = self.trading_client.create_order(order_args, options)
-                        except Exception:
-                            failed_count += 1
-                            continue
-                    
-                    if not order:
-                        failed_count += 1
-                        continue
-                    
-                    # 提交订单
-                    result = self.trading_client.post_order(order)
-                    
-                    # 检查结果
-                    if result:
-                        if isinstance(result, dict):
-                            success = result.get('success', True)
-                            error_msg = result.get('errorMsg') or result.get('error_message') or result.get('error')
-                            status = result.get('status')
-                            if not success or error_msg:
-                                failed_count += 1
-                            elif status and status.lower() in ['filled', 'open', 'pending']:
-                                sold_count += 1
-                            elif result.get('orderID') or result.get('order_id') or result.get('id'):
-                                sold_count += 1
-                            else:
-                                failed_count += 1
-                        elif hasattr(result, 'success'):
-                            if result.success:
-                                sold_count += 1
-                            else:
-                                failed_count += 1
-                        else:
-                            sold_count += 1
-                    else:
-                        failed_count += 1
-                        
-                except Exception as e:
-                    failed_count += 1
-                    if verbose:
-                        self._log_error(f"出售 Token {token_id[:16]}... 时出错: {e}")
+                for _ in range(SELL_CONCURRENCY_PER_ACCOUNT):
+                    submit_next()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        token_results[running.pop(future)] = future.result()
+                        submit_next()
+            
+            sold_count = sum(1 for r in token_results if r['success'])
+            failed_count = len(token_results) - sold_count
+            # 仍挂在订单簿上未成交的数量
+            resting_size = round(sum(r.get('resting') or 0.0 for r in token_results), 6)
             
             if sold_count > 0:
-                self._log_status(f"出售成功 {sold_count}/{len(positions)}")
+                self.invalidate_positions()
+                self._log_status(f"出售成功 {sold_count}/{total_count}")
             if failed_count > 0:
-                self._log_error(f"出售失败 {failed_count}/{len(positions)}")
+                self._log_error(f"出售失败 {failed_count}/{total_count}")
+            if resting_size > 0:
+                self._log_status(f"出售挂单未成交 {resting_size}")
             
             return {
                 'success': sold_count > 0,
                 'sold_count': sold_count,
                 'failed_count': failed_count,
-                'total_count': len(positions),
-                'message': f"出售完成: 成功 {sold_count}, 失败 {failed_count}, 总计 {len(positions)}"
+                'total_count': total_count,
+                'resting_size': resting_size,
+                'token_results': token_results,
+                'message': f"出售完成: 成功 {sold_count}, 失败 {failed_count}, 总计 {total_count}, 挂单未成交 {resting_size}"
             }
             
         except Exception as e:
             self._log_error(f"出售持仓失败: {e}")
             return {'success': False, 'sold_count': 0, 'failed_count': 0, 'message': f'出售失败: {str(e)}'}
     
+    def sell_all_positions(self, verbose=False) -> Dict:
+        """出售所有持仓（立即卖出）
+        
+        Args:
+            verbose: 是否输出详细日志
+            
+        Returns:
+            与 sell_planned 相同
+        """
+        try:
+            if not self.trading_client:
+                return {'success': False, 'sold_count': 0, 'failed_count': 0, 'message': '交易客户端未初始化'}
+            
+            # 获取持仓（优先本地持仓簿）
+            positions = self.get_book_positions()
+            
+            if not positions:
+                return {'success': True, 'sold_count': 0, 'failed_count': 0, 'message': '没有持仓'}
+            
+            # 快速卖出：直接使用固定低价（市价单）
+            orders = [
+                {'token_id': pos.get('token_id'), 'market_id': pos.get('market_id'), 'price': 0.01, 'size': pos.get('balance')}
+                for pos in positions
+                if pos.get('token_id') and pos.get('balance') and pos.get('balance') > 0
+            ]
+            return self.sell_planned(orders, verbose=verbose, total_count=len(positions))
+            
+        except Exception as e:
+            self._log_error(f"出售持仓失败: {e}")
+            return {'success': False, 'sold_count': 0, 'failed_count': 0, 'message': f'出售失败: {str(e)}'}
+    
     def _get_best_bid_price(self, token_id: str) -> Optional[float]:
         """获取token的最佳买价（bid price）- 使用和买入时获取卖价相同的逻辑，只是获取bid而不是ask
         
@@ -1186,6 +1553,11 @@ class TradingBot:
             最佳买价，如果获取失败返回None
         """
         try:
+            # 本机行情服务可用时直接使用其推送的买价
+            quote = market_data_client.quote(token_id, 'bid')
+            if quote:
+                return quote['bid']
+            
             # 方法1: 使用get_spreads（和买入时使用相同的客户端方法）
             spreads = None
             if self.client and hasattr(self.client, 'get_spreads'):